@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+import argparse
+from collections import OrderedDict
+import json
+import multiprocessing
+import os
+import platform
+import queue as queues
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from generators import generateEvents, generateRegions, writeBED
+
+# Benchmark harness for blockify. Each (benchmark, size) case runs in a
+# fresh process, so that peak memory usage is attributable to that case
+# alone. For every case, the wall time of the timed call, the peak
+# resident set size of the process, and the number of events processed
+# per second are recorded.
+#
+# Usage (from the top-level directory):
+#   python benchmarks/benchmark.py --sizes 1000 10000 100000 --output results.json
+
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+DEFAULT_TIMEOUT = 3600
+
+# Registry of benchmarks; each entry is (setup, max_size). setup(paths, n)
+# loads the data and returns a callable; only that callable is timed.
+# Benchmarks are skipped for sizes above max_size (if not None).
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, max_size=None):
+    """Register a benchmark, given a setup function that returns the callable to time."""
+
+    def register(setup):
+        BENCHMARKS[name] = (setup, max_size)
+        return setup
+
+    return register
+
+
+def loadCoordinates(paths):
+    from blockify import readers
+
+    return list(readers.readCoordinates(paths["input"]).values())
+
+
+def warmUp(alg):
+    """Segment a few events so that compiled kernels are loaded before timing."""
+    alg.segment(np.arange(10) ** 2)
+
+
+def algorithmBenchmark(name, method, engine, max_size):
+    @benchmark(name, max_size=max_size)
+    def setup(paths, n):
+        from blockify import algorithms
+
+        coordinates = loadCoordinates(paths)
+        alg = algorithms.ALGORITHM_DICT[method](engine=engine)
+        warmUp(alg)
+
+        def run():
+            for t in coordinates:
+                alg.segment(t)
+
+        return run
+
+
+# OP is quadratic, so it is capped at smaller sizes than PELT
+algorithmBenchmark("OP", "OP", "fast", 10 ** 5)
+algorithmBenchmark("OP-legacy", "OP", "legacy", 10 ** 4)
+algorithmBenchmark("PELT", "PELT", "fast", None)
+algorithmBenchmark("PELT-legacy", "PELT", "legacy", 10 ** 5)
+
+
+@benchmark("segment")
+def setupSegment(paths, n):
+    from blockify import algorithms, segmentation
+
+    warmUp(algorithms.PELT())
+
+    def run():
+        segmentation.segment(paths["input"], "PELT", p0=0.05)
+
+    return run
+
+
+@benchmark("normalize")
+def setupNormalize(paths, n):
+    from blockify import normalization
+    from pybedtools import BedTool
+
+    def run():
+        normalization.normalize(BedTool(paths["input"]), BedTool(paths["regions"]), 10 ** 6, None)
+
+    return run
+
+
+@benchmark("annotate")
+def setupAnnotate(paths, n):
+    from blockify import annotation
+    from pybedtools import BedTool
+
+    def run():
+        annotation.annotate(
+            BedTool(paths["input"]),
+            BedTool(paths["regions"]),
+            BedTool(paths["background"]),
+            alpha=0.05,
+            correction="bonferroni",
+        )
+
+    return run
+
+
+@benchmark("downsample")
+def setupDownsample(paths, n):
+    from blockify import downsampling
+
+    def run():
+        downsampling.downsample(pd.read_table(paths["input"], header=None), max(n // 10, 1), seed=0)
+
+    return run
+
+
+def writeInputs(directory, n, args):
+    """Generate input, background, and regions files for a benchmark of size n."""
+    events = generateEvents(n, n_chroms=args.chroms, density=args.density, seed=args.seed)
+    background = generateEvents(
+        n, n_chroms=args.chroms, density=args.density, peak_fraction=0, seed=args.seed + 1
+    )
+    regions = generateRegions(events, max(n // 25, 1))
+    paths = {
+        "input": os.path.join(directory, "input.qbed"),
+        "background": os.path.join(directory, "background.qbed"),
+        "regions": os.path.join(directory, "regions.bed"),
+    }
+    writeBED(events, paths["input"])
+    writeBED(background, paths["background"])
+    writeBED(regions, paths["regions"])
+    return paths
+
+
+def runCase(name, n, paths, repeat, verbose, queue):
+    """Run one benchmark case in the current (child) process and report results on queue."""
+    if not verbose:
+        # Silence per-chromosome progress messages
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stderr.fileno())
+    try:
+        setup, _ = BENCHMARKS[name]
+        run = setup(paths, n)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        wall = min(times)
+        queue.put(
+            {
+                "status": "ok",
+                "wall_time": wall,
+                "events_per_second": n / wall if wall > 0 else float("inf"),
+                # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                / (1024 ** 2 if sys.platform == "darwin" else 1024),
+            }
+        )
+    except Exception as e:
+        queue.put({"status": "error", "error": "{}: {}".format(type(e).__name__, e)})
+
+
+def runBenchmarks(args):
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = writeInputs(directory, n, args)
+            for name in args.benchmarks:
+                _, max_size = BENCHMARKS[name]
+                record = {"benchmark": name, "size": n}
+                if max_size is not None and n > max_size and not args.all:
+                    record.update({"status": "skipped"})
+                else:
+                    queue = context.Queue()
+                    process = context.Process(
+                        target=runCase, args=(name, n, paths, args.repeat, args.verbose, queue)
+                    )
+                    process.start()
+                    process.join(args.timeout)
+                    if process.is_alive():
+                        process.terminate()
+                        process.join()
+                        record.update({"status": "timeout"})
+                    else:
+                        try:
+                            record.update(queue.get(timeout=10))
+                        except queues.Empty:
+                            record.update({"status": "error", "error": "exit code {}".format(process.exitcode)})
+                results.append(record)
+                printRecord(record)
+    return results
+
+
+def printRecord(record):
+    if record["status"] == "ok":
+        print(
+            "{benchmark}\t{size}\t{wall_time:.4f}\t{peak_rss_mb:.1f}\t{events_per_second:.0f}".format(**record),
+            flush=True,
+        )
+    else:
+        print(
+            "{}\t{}\t{}".format(record["benchmark"], record["size"], record.get("error", record["status"])),
+            flush=True,
+        )
+
+
+def metadata():
+    import blockify
+    from blockify import kernels
+
+    return {
+        "blockify": blockify.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": kernels.HAS_NUMBA,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(
+        description="Benchmark blockify on synthetic data",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of events")
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS), help="Benchmarks to run"
+    )
+    parser.add_argument("--chroms", type=int, default=4, help="Number of chromosomes")
+    parser.add_argument("--density", type=float, default=1e-3, help="Background events per base pair")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per case (the fastest is reported)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Timeout per case (seconds)")
+    parser.add_argument("--all", action="store_true", help="Ignore the size cap of quadratic benchmarks")
+    parser.add_argument("--verbose", action="store_true", help="Show progress messages from blockify")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArguments()
+    print("benchmark\tsize\twall_time_s\tpeak_rss_mb\tevents_per_s", flush=True)
+    results = runBenchmarks(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": metadata(), "results": results}, f, indent=2)
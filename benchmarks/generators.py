@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic data generators for benchmarking blockify.
+# Events are drawn from a uniform background plus a number of
+# Gaussian "peaks", and returned as sorted qBED records.
+
+
+def generateEvents(n, n_chroms=4, density=1e-3, peak_fraction=0.2, peak_width=500, seed=0):
+    """Generate a sorted set of qBED records.
+
+    Parameters
+    ----------
+    n: int
+        Total number of events
+    n_chroms: int
+        Number of chromosomes the events are spread over
+    density: float
+        Background events per base pair; sets the chromosome lengths
+    peak_fraction: float
+        Fraction of events that fall in peaks rather than the background
+    peak_width: float
+        Standard deviation (bp) of each peak
+    seed: int
+        Seed for random number generator
+
+    Returns
+    -------
+    events: ``pandas`` DataFrame
+        qBED records (chrom, start, end, value, strand), sorted by chromosome and start
+    """
+
+    rng = np.random.default_rng(seed)
+    chrom_length = max(int(n / n_chroms / density), 1)
+    n_peak = int(n * peak_fraction)
+    n_peaks = max(n_peak // 100, 1)
+    # Background events are uniform along the chromosome
+    background = rng.integers(0, chrom_length, n - n_peak)
+    # Peak events are normally distributed around random centers
+    centers = rng.integers(0, chrom_length, n_peaks)
+    peaks = rng.normal(centers[rng.integers(0, n_peaks, n_peak)], peak_width)
+    starts = np.clip(np.concatenate([background, peaks]).astype(np.int64), 0, chrom_length - 1)
+    chroms = rng.integers(0, n_chroms, n)
+    # Zero-pad chromosome names so that lexicographic and numeric order agree
+    names = np.array(["chr{:0{}d}".format(i + 1, len(str(n_chroms))) for i in range(n_chroms)])
+    order = np.lexsort((starts, chroms))
+    return pd.DataFrame(
+        {
+            "chrom": names[chroms[order]],
+            "start": starts[order],
+            "end": starts[order] + 1,
+            "value": rng.geometric(0.5, n),
+            "strand": rng.choice(["+", "-"], n),
+        }
+    )
+
+
+def generateRegions(events, n_regions):
+    """Generate sorted, non-overlapping regions spanning the chromosomes of a set of events.
+
+    Parameters
+    ----------
+    events: ``pandas`` DataFrame
+        Records from ``generateEvents``
+    n_regions: int
+        Approximate total number of regions
+
+    Returns
+    -------
+    regions: ``pandas`` DataFrame
+        BED3 records (chrom, start, end), sorted by chromosome and start
+    """
+
+    spans = events.groupby("chrom", sort=True)["end"].max()
+    per_chrom = max(n_regions // len(spans), 1)
+    frames = []
+    for chrom, span in spans.items():
+        edges = np.unique(np.linspace(0, span + 1, per_chrom + 1).astype(np.int64))
+        frames.append(pd.DataFrame({"chrom": chrom, "start": edges[:-1], "end": edges[1:]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def writeBED(df, path):
+    """Write records to a tab-separated file without a header.
+
+    Parameters
+    ----------
+    df: ``pandas`` DataFrame
+        Records to write
+    path: str
+        Output path
+    """
+
+    df.to_csv(path, sep="\t", header=False, index=False)
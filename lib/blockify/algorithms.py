@@ -1,4 +1,5 @@
 import numpy as np
+from . import kernels
 # import warnings
 
 # This file enumerates algorithms for segmenting one-dimensional data.
@@ -6,6 +7,9 @@ import numpy as np
 # in particular Jake VanderPlas's implementation of the
 # Bayesian blocks algorithm in Python.
 
+# Engines available for evaluating the dynamic program
+ENGINES = ["fast", "legacy"]
+
 
 class Algorithm(object):
     """Base class for Bayesian blocks algorithm functions
@@ -35,6 +39,16 @@ class Algorithm(object):
       Specify the form of the prior given the false-alarm probability ``p0``
       (See [1]_ for details).
 
+    The ``engine`` parameter selects how the dynamic program is evaluated:
+    ``"fast"`` uses the kernels in :mod:`blockify.kernels`, which work on
+    cumulative counts computed once (and are compiled if numba is installed);
+    ``"legacy"`` uses the original NumPy implementation.
+
+    If ``compress`` is True (the default), runs of adjacent cells with equal
+    density are merged before the dynamic program runs, since no change
+    point can fall inside such a run (see ``_compress``). This does not
+    change the result, only the number of cells the dynamic program visits.
+
     For examples of implemented algorithm functions, see :class:`Events`,
     :class:`RegularEvents`, and :class:`PointMeasures`.
 
@@ -44,12 +58,19 @@ class Algorithm(object):
        http://adsabs.harvard.edu/abs/2012arXiv1207.5578S
     """
 
-    def __init__(self, p0=0.05, gamma=None, ncp_prior=None):
+    def __init__(self, p0=0.05, gamma=None, ncp_prior=None, engine="fast", compress=True):
+        if engine not in ENGINES:
+            raise ValueError("engine must be one of {}".format(ENGINES))
         self.p0 = p0
         self.gamma = gamma
         self.ncp_prior = ncp_prior
+        self.engine = engine
+        self.compress = compress
         self.prior = None
         self.best_fitness = None
+        # Number of cells before and after merging runs of equal density
+        self.n_cells = None
+        self.n_compressed_cells = None
 
     @staticmethod
     def validate_input(t, x=None, sigma=None):
@@ -130,16 +151,17 @@ class Algorithm(object):
     # def _algorithm_args(self):
     #     return signature(self.algorithm).parameters.keys()
 
-    def p0_prior(self, N):
+    def p0_prior(self, N, p0=None):
         """
         Empirical prior, parametrized by the false alarm probability ``p0``
-        See  eq. 21 in Scargle (2012)
+        See  eq. 21 in Scargle (2012). If ``p0`` is given (as a scalar or an
+        array), it is used instead of ``self.p0``.
 
         Note that there was an error in this equation in the original Scargle
         paper (the "log" was missing). The following corrected form is taken
         from http://arxiv.org/abs/1304.2818
         """
-        return 4 - np.log(73.53 * self.p0 * (N ** -0.478))
+        return 4 - np.log(73.53 * np.asarray(self.p0 if p0 is None else p0) * (N ** -0.478))
 
     def compute_ncp_prior(self, N):
         """
@@ -185,9 +207,14 @@ class OptimalPartitioning(Algorithm):
         above, using the definition :math:`{\tt ncp\_prior} = -\ln({\tt
         gamma})`.  If ``ncp_prior`` is specified, ``gamma`` and ``p0`` are
         ignored.
+    engine : str (optional)
+        Either ``"fast"`` (default) or ``"legacy"``; see :class:`Algorithm`.
+    compress : bool (optional)
+        Whether to merge runs of cells with equal density before segmenting
+        (default: True); see :class:`Algorithm`.
     """
 
-    def __init__(self, p0=0.05, gamma=None, ncp_prior=None):
+    def __init__(self, p0=0.05, gamma=None, ncp_prior=None, engine="fast", compress=True):
         # if p0 is not None and gamma is None and ncp_prior is None:
         #     warnings.warn(
         #         "p0 does not seem to accurately represent the false "
@@ -196,7 +223,10 @@ class OptimalPartitioning(Algorithm):
         #         "free noise to calibrate ncp_prior to achieve a "
         #         "desired false positive rate."
         #     )
-        super(OptimalPartitioning, self).__init__(p0, gamma, ncp_prior)
+        super(OptimalPartitioning, self).__init__(p0, gamma, ncp_prior, engine, compress)
+
+    # best_fitness is maximized, so the penalized cost is its negative
+    _cost_sign = -1
 
     def fitness(self, T_k, N_k):
         # Negative log of the Poisson maximum likelihood, given T_k and N_k
@@ -220,23 +250,270 @@ class OptimalPartitioning(Algorithm):
             array containing the (M+1) edges defining the M optimal bins
         """
 
+        edges, block_length, x = self._prepare(t, x, sigma)
+
+        N = len(x)
+
+        # Compute ncp_prior if not defined
+        if self.ncp_prior is None:
+            ncp_prior = self.compute_ncp_prior(N)
+        else:
+            ncp_prior = self.ncp_prior
+            self.prior = self.ncp_prior
+
+        edges, block_length, x = self._compress(edges, block_length, x, ncp_prior)
+        best, last = self._dp(block_length, x, ncp_prior)
+        self.best_fitness = best[-1]
+
+        # Find change points
+        return self.get_change_points(len(x), edges, last)
+
+    def segment_path(self, t, x=None, sigma=None, p0=None, ncp_prior=None):
+        """Fit the Bayesian Blocks model for a grid of penalties.
+
+        The data are validated and preprocessed once. Penalties are then
+        visited in the spirit of CROPS (Haynes et al. 2017): the number of
+        blocks can only decrease as the penalty increases, so if the
+        segmentations at two penalties have the same number of blocks, they
+        are optimal for every penalty in between; and if they differ by one
+        block, the optimal segmentation for a penalty in between is the one
+        of the two with the lower penalized cost. The dynamic program is
+        only run for penalties that cannot be resolved this way, so at most
+        once per grid value, and usually far less often.
+
+        Parameters
+        ----------
+        t : array_like
+            data times (one dimensional, length N)
+        x : array_like (optional)
+            data values
+        sigma : array_like or float (optional)
+            data errors
+        p0 : array_like (optional)
+            Grid of false alarm probabilities, each converted into a prior as in ``p0_prior``
+        ncp_prior : array_like (optional)
+            Grid of priors; if specified, ``p0`` is ignored
+
+        Returns
+        -------
+        edges : list of ndarray
+            Edges of the optimal blocks for each grid value, in the order given.
+            The prior and fitness of each segmentation are stored in
+            ``path_priors`` and ``path_fitness``; the number of times the
+            dynamic program was run is stored in ``path_evaluations``.
+        """
+
+        edges, block_length, x = self._prepare(t, x, sigma)
+        N = len(x)
+
+        if ncp_prior is not None:
+            priors = np.atleast_1d(np.asarray(ncp_prior, dtype=float))
+        elif p0 is not None:
+            priors = np.atleast_1d(self.p0_prior(N, np.asarray(p0, dtype=float)))
+        else:
+            raise ValueError("Either ``p0`` or ``ncp_prior`` must be specified.")
+
+        # Visit penalties in increasing order
+        order = np.argsort(priors, kind="stable")
+        penalties = priors[order]
+        # Cells can only be merged if every penalty allows it
+        edges, block_length, x = self._compress(edges, block_length, x, penalties[0])
+        N = len(x)
+        # For each penalty: the change points, number of blocks, and unpenalized cost of its segmentation
+        change_points = [None] * len(penalties)
+        n_blocks = np.zeros(len(penalties), dtype=int)
+        costs = np.zeros(len(penalties), dtype=float)
+        fitness = np.zeros(len(penalties), dtype=float)
+        self.path_evaluations = 0
+
+        def solve(k):
+            best, last = self._dp(block_length, x, penalties[k])
+            change_points[k] = self.get_change_points(N, edges, last)
+            n_blocks[k] = len(change_points[k]) - 1
+            fitness[k] = best[-1]
+            costs[k] = self._cost_sign * best[-1] - penalties[k] * n_blocks[k]
+            self.path_evaluations += 1
+
+        def borrow(k, j):
+            # Re-use the segmentation at penalty j for penalty k
+            change_points[k] = change_points[j]
+            n_blocks[k] = n_blocks[j]
+            costs[k] = costs[j]
+            fitness[k] = self._cost_sign * (costs[j] + penalties[k] * n_blocks[j])
+
+        n = len(penalties)
+        solve(0)
+        if n > 1:
+            solve(n - 1)
+        # Intervals of grid indexes whose endpoints have been solved
+        intervals = [(0, n - 1)] if n > 2 else []
+        while intervals:
+            i, j = intervals.pop()
+            if n_blocks[i] == n_blocks[j]:
+                for k in range(i + 1, j):
+                    borrow(k, i)
+            elif n_blocks[i] == n_blocks[j] + 1:
+                # Penalty at which both segmentations have the same penalized cost
+                crossing = (costs[j] - costs[i]) / (n_blocks[i] - n_blocks[j])
+                for k in range(i + 1, j):
+                    borrow(k, i if penalties[k] <= crossing else j)
+            else:
+                k = (i + j) // 2
+                solve(k)
+                if k - i > 1:
+                    intervals.append((i, k))
+                if j - k > 1:
+                    intervals.append((k, j))
+
+        # Restore the order of the grid
+        self.path_priors = priors
+        self.path_fitness = np.zeros(n, dtype=float)
+        self.path_fitness[order] = fitness
+        result = [None] * n
+        for k, index in enumerate(order):
+            result[index] = change_points[k]
+        return result
+
+    def segment_genome(self, t, x=None, shared_prior=True):
+        """Fit the Bayesian Blocks model to several chromosomes at once.
+
+        The cells of all chromosomes are found in one vectorized pass, and
+        a change point is forced between chromosomes. If ``shared_prior`` is
+        True, a single prior, computed from the total number of cells,
+        penalizes every block; otherwise, each chromosome gets the prior
+        ``segment`` would compute for it alone, which makes this a cheap way
+        to segment many small chromosomes. Since no block can span two
+        chromosomes, the optimal segmentation is made of the optimal
+        segmentations of each chromosome under its prior, so the edges and
+        the dynamic program are computed on consecutive slices of the
+        shared arrays, in each chromosome's own coordinates.
+
+        Parameters
+        ----------
+        t : list of array_like
+            data times of each chromosome (one dimensional)
+        x : list of array_like (optional)
+            data values of each chromosome; times with a value of 0 are dropped
+        shared_prior : bool (optional)
+            Whether to use a single prior for all chromosomes (default: True)
+
+        Returns
+        -------
+        edges : list of ndarray
+            Edges of the optimal blocks of each chromosome, empty for
+            chromosomes without data. The prior and fitness of each
+            chromosome are stored in ``chrom_priors`` and ``chrom_fitness``,
+            and its number of cells before and after merging runs of equal
+            density in ``chrom_cells`` and ``chrom_compressed_cells``;
+            ``best_fitness``, ``n_cells`` and ``n_compressed_cells`` hold the
+            totals.
+        """
+
+        lengths = np.array([len(_) for _ in t], dtype=np.int64)
+        n_chroms = len(lengths)
+        codes = np.repeat(np.arange(n_chroms), lengths)
+        times = np.concatenate([np.asarray(_, dtype=float) for _ in t]) if n_chroms else np.zeros(0)
+        if x is None:
+            values = np.ones(len(times))
+        else:
+            values = np.concatenate([np.asarray(_, dtype=float) for _ in x]) if n_chroms else np.zeros(0)
+            if values.shape != times.shape:
+                raise ValueError("x does not match shape of t")
+            nonzero = values != 0
+            codes, times, values = codes[nonzero], times[nonzero], values[nonzero]
+
+        # Sort by chromosome, then time, and sum the values of each unique time
+        order = np.lexsort((times, codes))
+        codes, times, values = codes[order], times[order], values[order]
+        first = np.ones(len(times), dtype=bool)
+        first[1:] = (times[1:] != times[:-1]) | (codes[1:] != codes[:-1])
+        starts = np.flatnonzero(first)
+        codes, times = codes[starts], times[starts]
+        x = np.add.reduceat(values, starts) if len(starts) else np.zeros(0)
+        # Cells of each chromosome are x[bounds[i]:bounds[i + 1]]
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n_chroms))])
+
+        self.chrom_cells = np.diff(bounds)
+        if shared_prior:
+            ncp_prior = self.compute_ncp_prior(len(x)) if len(x) else self.ncp_prior
+            self.chrom_priors = np.full(n_chroms, ncp_prior)
+        else:
+            # One scalar at a time, so that each prior is exactly the one ``segment`` computes;
+            # chromosomes without cells are skipped below, so their prior does not matter
+            self.chrom_priors = np.array(
+                [self.compute_ncp_prior(int(n)) if n else np.nan for n in self.chrom_cells], dtype=float
+            )
+
+        result = []
+        self.chrom_fitness = np.zeros(n_chroms)
+        self.chrom_compressed_cells = np.zeros(n_chroms, dtype=np.int64)
+        for i in range(n_chroms):
+            start, end = bounds[i], bounds[i + 1]
+            if start == end:
+                result.append(np.zeros(0))
+                continue
+            chrom_edges, chrom_block_length = self._cell_edges(times[start:end])
+            chrom_edges, chrom_block_length, chrom_x = self._compress(
+                chrom_edges, chrom_block_length, x[start:end], self.chrom_priors[i]
+            )
+            best, last = self._dp(chrom_block_length, chrom_x, self.chrom_priors[i])
+            self.chrom_fitness[i] = best[-1]
+            self.chrom_compressed_cells[i] = len(chrom_x)
+            result.append(self.get_change_points(len(chrom_x), chrom_edges, last))
+        self.best_fitness = self.chrom_fitness.sum()
+        self.n_cells = len(x)
+        self.n_compressed_cells = self.chrom_compressed_cells.sum()
+        return result
+
+    def _prepare(self, t, x, sigma):
         t, x, sigma = self.validate_input(t, x, sigma)
+        edges, block_length = self._cell_edges(t)
+        return edges, block_length, x
 
+    @staticmethod
+    def _cell_edges(t):
         # create length-(N + 1) array of cell edges
         edges = np.concatenate([t[:1], 0.5 * (t[1:] + t[:-1]), t[-1:]])
         block_length = t[-1] - edges
+        return edges, block_length
+
+    def _compress(self, edges, block_length, x, ncp_prior):
+        # Merge runs of adjacent cells with equal density (events per unit
+        # length). The cost of a block, -N_k * log(N_k / T_k), is jointly
+        # concave in (N_k, T_k), so sliding a change point through cells of
+        # equal density changes the cost of its two blocks concavely: the
+        # cost is lowest with the change point at either end of the run,
+        # never strictly inside it. The only exception, both blocks having
+        # that same density, costs one more penalty than merging them; so
+        # with a positive penalty, the optimal segmentation is unchanged.
+        self.n_cells = len(x)
+        if self.compress and ncp_prior > 0 and len(x) > 2:
+            widths = np.diff(edges)
+            # Cells i and i + 1 have equal density if x_i / w_i == x_(i + 1) / w_(i + 1)
+            equal = x[:-1] * widths[1:] == x[1:] * widths[:-1]
+            if equal.any():
+                keep = np.concatenate([[True], ~equal, [True]])
+                edges = edges[keep]
+                block_length = block_length[keep]
+                x = np.add.reduceat(x, np.flatnonzero(keep[:-1]))
+        self.n_compressed_cells = len(x)
+        return edges, block_length, x
+
+    def _dp(self, block_length, x, ncp_prior):
+        if self.engine == "fast":
+            return self._fast_dp(block_length, x, ncp_prior)
+        else:
+            return self._legacy_dp(block_length, x, ncp_prior)
+
+    def _fast_dp(self, block_length, x, ncp_prior):
+        return kernels.optimal_partitioning(block_length, x, ncp_prior)
 
+    def _legacy_dp(self, block_length, x, ncp_prior):
         # arrays to store the best configuration
-        N = len(t)
+        N = len(x)
         best = np.zeros(N, dtype=float)
         last = np.zeros(N, dtype=int)
 
-        # Compute ncp_prior if not defined
-        if self.ncp_prior is None:
-            ncp_prior = self.compute_ncp_prior(N)
-        else:
-            ncp_prior = self.ncp_prior
-            self.prior = self.ncp_prior
         # ----------------------------------------------------------------
         # Start with first data cell; add one cell at each iteration
         # ----------------------------------------------------------------
@@ -258,10 +535,7 @@ class OptimalPartitioning(Algorithm):
             i_max = np.argmax(A_R)
             last[R] = i_max
             best[R] = A_R[i_max]
-        self.best_fitness = best[R]
-
-        # Find change points
-        return self.get_change_points(N, edges, last)
+        return best, last
 
     @staticmethod
     def get_change_points(N, edges, last):
@@ -306,8 +580,8 @@ class BayesianBlocks(OptimalPartitioning):
         If ``ncp_prior`` is specified, ``gamma`` and ``p0`` is ignored.
     """
 
-    def __init__(self, p0=0.05, gamma=None, ncp_prior=None):
-        super(BayesianBlocks, self).__init__(p0, gamma, ncp_prior)
+    def __init__(self, p0=0.05, gamma=None, ncp_prior=None, engine="fast", compress=True):
+        super(BayesianBlocks, self).__init__(p0, gamma, ncp_prior, engine, compress)
 
     def fitness(self, N_k, T_k):
         # eq. 19 from Scargle 2012
@@ -330,51 +604,27 @@ class PELT(OptimalPartitioning):
         ignored.
     """
 
-    def __init__(self, p0=0.05, gamma=None, ncp_prior=None):
-        super(PELT, self).__init__(p0, gamma, ncp_prior)
+    def __init__(self, p0=0.05, gamma=None, ncp_prior=None, engine="fast", compress=True):
+        super(PELT, self).__init__(p0, gamma, ncp_prior, engine, compress)
+
+    # best_fitness is the penalized cost itself
+    _cost_sign = 1
 
     def fitness(self, N_k, T_k):
         # eq. 19 from Scargle 2012
         return -N_k * (np.log(N_k) - np.log(T_k))
 
-    def segment(self, t, x=None, sigma=None):
-        """Fit the Bayesian Blocks model given the specified algorithm function.
-
-        Parameters
-        ----------
-        t : array_like
-            data times (one dimensional, length N)
-        x : array_like (optional)
-            data values
-        sigma : array_like or float (optional)
-            data errors
-
-        Returns
-        -------
-        edges : ndarray
-            array containing the (M+1) edges defining the M optimal bins
-        """
-
-        t, x, sigma = self.validate_input(t, x, sigma)
-
-        # create length-(N + 1) array of cell edges
-        edges = np.concatenate([t[:1], 0.5 * (t[1:] + t[:-1]), t[-1:]])
-        block_length = t[-1] - edges
+    def _fast_dp(self, block_length, x, ncp_prior):
+        return kernels.pelt(block_length, x, ncp_prior)
 
+    def _legacy_dp(self, block_length, x, ncp_prior):
         # arrays to store the best configuration
-        N = len(t)
+        N = len(x)
         best = np.zeros(N + 1, dtype=float)
         last = np.zeros(N, dtype=int)
 
-        # Compute ncp_prior if not defined
-        if self.ncp_prior is None:
-            ncp_prior = self.compute_ncp_prior(N)
-        else:
-            ncp_prior = self.ncp_prior
-            self.prior = self.ncp_prior
-
         K = 0
-        unpruned = np.array([], dtype=np.int)
+        unpruned = np.array([], dtype=int)
         lastPruned = -1
 
         # ----------------------------------------------------------------
@@ -416,10 +666,193 @@ class PELT(OptimalPartitioning):
                         t_max = unpruned[i_max]
                         unpruned = np.delete(unpruned, np.arange(i_max + 1))
                         lastPruned = t_max
-        self.best_fitness = best[R + 1]
+        return best, last
 
-        # Find change points
-        return self.get_change_points(N, edges, last)
+
+class OnlinePELT(PELT):
+    r"""PELT for events that arrive in sorted batches, e.g. from a running sequencer
+
+    Events are added with ``update``, and the dynamic program is extended
+    by the new cells only, carrying ``best``, ``last`` and the unpruned
+    candidates over from one batch to the next. Every future segmentation
+    is the optimal segmentation ending at one of the unpruned candidates,
+    so the change points shared by all of them can no longer change; the
+    blocks up to the last of these are returned as soon as they are known,
+    and the state before it is dropped. Memory is therefore bounded by the
+    stretch of cells since that change point, rather than by the whole
+    input. Once every event has been added, ``finalize`` returns the
+    remaining blocks; together with those returned by ``update``, they are
+    the blocks ``PELT.segment`` finds on the whole input.
+
+    The prior is needed before the first event arrives, so it cannot be
+    computed from the final number of cells; if neither ``ncp_prior`` nor
+    ``gamma`` is given, the expected number of cells ``N`` is required to
+    compute it from ``p0``.
+
+    Parameters
+    ----------
+    p0 : float (optional)
+        False alarm probability, used with ``N`` to compute the prior on
+        :math:`N_{\rm blocks}` (see eq. 21 of Scargle 2012).
+    gamma : float (optional)
+        If specified, the prior is :math:`-\ln({\tt gamma})`.
+    ncp_prior : float (optional)
+        Explicit prior; if specified, ``gamma``, ``p0`` and ``N`` are ignored.
+    N : int (optional)
+        Expected number of cells (unique coordinates), used with ``p0``.
+    """
+
+    def __init__(self, p0=0.05, gamma=None, ncp_prior=None, N=None, engine="fast", compress=True):
+        super(OnlinePELT, self).__init__(p0, gamma, ncp_prior, engine, compress)
+        if engine != "fast":
+            raise ValueError("OnlinePELT only supports the fast engine")
+        if ncp_prior is None and gamma is None:
+            if N is None:
+                raise ValueError("``N`` must be specified to compute the prior from ``p0``")
+            self.prior = self.p0_prior(N)
+        else:
+            self.compute_ncp_prior(N)
+        self._reset()
+
+    def _reset(self):
+        # Cell edges, cumulative counts and best costs, from the last
+        # finalized change point (local index 0) onwards
+        self._edges = np.zeros(0, dtype=float)
+        self._cum_x = np.zeros(0, dtype=float)
+        self._best = np.zeros(1, dtype=float)
+        # Start of the last block of the best segmentation ending at each cell, as local indexes
+        self._last = np.zeros(0, dtype=np.int64)
+        # Unpruned candidates, as local indexes
+        self._candidates = np.zeros(0, dtype=np.int64)
+        # The last coordinate seen, and its count; its cell is only added
+        # once the next coordinate (and hence the cell's right edge) is known
+        self._pending_t = None
+        self._pending_x = 0.0
+        # Whether the first edge has been returned
+        self._started = False
+        # Total number of cells added
+        self.n_cells = 0
+
+    def update(self, t, x=None):
+        """Add a batch of events.
+
+        Parameters
+        ----------
+        t : array_like
+            Sorted event coordinates, none of which precede those of earlier batches
+        x : array_like (optional)
+            Non-negative weight of each event; if None, each event counts once
+
+        Returns
+        -------
+        edges : ndarray
+            Edges of the blocks that were finalized by this batch, continuing those returned before
+        """
+
+        t = np.asarray(t, dtype=float)
+        x = np.ones(len(t)) if x is None else np.asarray(x, dtype=float)
+        if len(t) == 0:
+            return np.zeros(0, dtype=float)
+        if np.any(t[1:] < t[:-1]) or (self._pending_t is not None and t[0] < self._pending_t):
+            raise ValueError("coordinates must be sorted, across batches as well")
+        if np.any(x < 0):
+            raise ValueError("weights must be non-negative")
+        # Sum the counts of repeated coordinates, dropping events of zero weight
+        t, inverse = np.unique(t[x > 0], return_inverse=True)
+        x = np.bincount(inverse, weights=x[x > 0])
+        if len(t) == 0:
+            return np.zeros(0, dtype=float)
+        if self._pending_t is not None:
+            if t[0] == self._pending_t:
+                x[0] += self._pending_x
+            else:
+                t = np.concatenate([[self._pending_t], t])
+                x = np.concatenate([[self._pending_x], x])
+        # Hold back the last coordinate, whose right edge is not known yet
+        self._pending_t, self._pending_x = t[-1], x[-1]
+        if len(t) == 1:
+            return np.zeros(0, dtype=float)
+        self._extend(0.5 * (t[1:] + t[:-1]), x[:-1], t[0])
+        return self._emit(self._common_ancestor())
+
+    def finalize(self):
+        """Add the last cell, and return the remaining blocks. The segmenter is then ready for a new input.
+
+        The prior and fitness of the whole segmentation are stored in
+        ``prior`` and ``best_fitness``.
+
+        Returns
+        -------
+        edges : ndarray
+            Edges of the remaining blocks, continuing those returned by ``update``
+        """
+
+        if self._pending_t is None:
+            return np.zeros(0, dtype=float)
+        # The right edge of the last cell is its own coordinate
+        self._extend(np.array([self._pending_t]), np.array([self._pending_x]), self._pending_t)
+        self.best_fitness = self._best[-1]
+        edges = self._emit(len(self._last))
+        if self.n_cells == 1:
+            # As in ``PELT.segment``, a single cell yields a single edge, and no block
+            edges = edges[:1]
+        n_cells = self.n_cells
+        self._reset()
+        self.n_cells = n_cells
+        return edges
+
+    def _extend(self, right_edges, x, first):
+        # Add cells with the given right edges and counts, then run the dynamic program over them
+        start = len(self._last)
+        if len(self._edges) == 0:
+            # The first cell starts at the first coordinate
+            self._edges = np.array([first], dtype=float)
+            self._cum_x = np.zeros(1, dtype=float)
+        self._edges = np.concatenate([self._edges, right_edges])
+        # Continue the running sum, so that it matches a single pass over all cells
+        self._cum_x = np.concatenate([self._cum_x, np.cumsum(np.concatenate([self._cum_x[-1:], x]))[1:]])
+        self._best = np.concatenate([self._best, np.zeros(len(x))])
+        self._last = np.concatenate([self._last, np.zeros(len(x), dtype=np.int64)])
+        n = len(self._candidates)
+        candidates = np.empty(n + len(x), dtype=np.int64)
+        candidates[:n] = self._candidates
+        # Distances to any fixed point past the last edge give the same block lengths
+        n = kernels.pelt_update(-self._edges, self._cum_x, self.prior, self._best, self._last, candidates, n, start)
+        self._candidates = candidates[:n]
+        self.n_cells += len(x)
+
+    def _common_ancestor(self):
+        # Segmentations ending at each candidate form a tree, in which the
+        # parent of a change point i is the change point before it,
+        # last[i - 1]. Every future segmentation goes through one of the
+        # candidates, or through the next cell, so through their lowest
+        # common ancestor.
+        nodes = set(self._candidates.tolist())
+        nodes.add(len(self._last))
+        while len(nodes) > 1:
+            i = max(nodes)
+            nodes.remove(i)
+            nodes.add(int(self._last[i - 1]))
+        return nodes.pop()
+
+    def _emit(self, c):
+        # Return the edges of the blocks up to change point c, then drop the state before it
+        change_points = [c]
+        while change_points[-1] > 0:
+            change_points.append(int(self._last[change_points[-1] - 1]))
+        change_points = change_points[::-1]
+        if self._started:
+            # The finalized change point at local index 0 has been returned already
+            change_points = change_points[1:]
+        self._started = True
+        edges = self._edges[change_points]
+        if c > 0:
+            self._edges = self._edges[c:]
+            self._cum_x = self._cum_x[c:]
+            self._best = self._best[c:]
+            self._last = self._last[c:] - c
+            self._candidates = self._candidates - c
+        return edges
 
 
 ALGORITHM_DICT = {
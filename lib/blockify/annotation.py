@@ -1,11 +1,19 @@
+from . import cache as caching
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import os
 import pandas as pd
 from pybedtools import BedTool
+from . import counting
+from . import profiling
+from . import readers
 from . import segmentation
-import scipy.stats as stats
+from . import statistics
 import statsmodels.stats.multitest as multitest
 import sys
 from . import utilities
+from . import writers
 import warnings
 
 # Suppress certain warnings
@@ -71,9 +79,6 @@ def validateAnnotationArguments(
     ), "background file must be sorted"
     # Check that measure is a valid parameter
     assert measure in ["enrichment", "depletion"], "measurement must be either 'enrichment' or 'depletion'"
-    # If regions has been supplied, check that they are also sorted
-    if regions_bed:
-        assert utilities.isSortedBEDFile(regions_bed), "regions BED file must be sorted"
     # Check that alpha or pValueCutoff are valid
     if alpha:
         assert 0 <= alpha <= 1, "--alpha should be between 0 and 1, inclusive"
@@ -128,6 +133,48 @@ def tighten(data):
     return BedTool.from_dataframe(refined)
 
 
+def labelConsecutiveBlocks(df):
+    """Label runs of consecutive blocks, i.e. blocks on the same chromosome where each starts at the end of the previous one.
+
+    Parameters
+    ----------
+    df: ``pandas`` DataFrame
+        Input set of blocks as a DataFrame, with blocks on the same chromosome in contiguous rows
+
+    Returns
+    -------
+    labels: ``numpy`` array
+        Run of each block, numbered from 0 in order
+    """
+
+    if len(df) == 0:
+        return np.zeros(0, dtype=np.int64)
+    chroms = df["chrom"].astype(str).values
+    # A new run starts at each change of chromosome, and wherever a block does not start at the end of the previous one
+    breaks = (chroms[1:] != chroms[:-1]) | (df["start"].values[1:] != df["end"].values[:-1])
+    return np.concatenate([[0], np.cumsum(breaks)])
+
+
+def sortByChromosome(df):
+    """Stably sort blocks by chromosome, unless they already are.
+
+    Parameters
+    ----------
+    df: ``pandas`` DataFrame
+        Input set of blocks as a DataFrame
+
+    Returns
+    -------
+    df: ``pandas`` DataFrame
+        Blocks sorted by chromosome, keeping the order of blocks on the same chromosome
+    """
+
+    chroms = df["chrom"].astype(str).values
+    if np.all(chroms[1:] >= chroms[:-1]):
+        return df
+    return df.iloc[np.argsort(chroms, kind="stable")]
+
+
 def parcelConsecutiveBlocks(df):
     """Concatenates consecutive blocks into a DataFrame. If there are multiple non-contiguous sets of consecutive blocks, creates one DataFrame per set.
 
@@ -148,20 +195,11 @@ def parcelConsecutiveBlocks(df):
     chroms = np.unique(df.chrom)
     for chrom in chroms:
         chrom_rows = df[df.chrom == chrom].reset_index()
-        for i, row in chrom_rows.iterrows():
-            i = int(i)
-            if i == 0:
-                # Start of a new chromosome
-                outlist.append([row])
-            else:
-                # Check if this block is adjacent to the previous block
-                if chrom_rows.iloc[i].start == chrom_rows.iloc[i - 1].end:
-                    # If so, append to the previous list
-                    outlist[-1].append(row)
-                else:
-                    # If not, create a new list
-                    outlist.append([row])
-    return [pd.DataFrame(_) for _ in outlist]
+        labels = labelConsecutiveBlocks(chrom_rows)
+        bounds = np.flatnonzero(np.diff(labels)) + 1
+        for i, j in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(labels)]])):
+            outlist.append(chrom_rows.iloc[i:j])
+    return outlist
 
 
 def getPeakSummits(df, metric="pValue"):
@@ -190,7 +228,11 @@ def getPeakSummits(df, metric="pValue"):
         # Something unexpected happened
         print("Unexpected error:", sys.exc_info()[0])
         raise
-    return pd.concat([_[_[column] == _[column].max()] for _ in parcelConsecutiveBlocks(df)]).reset_index().drop(columns=["level_0", "index"])
+    # Keep the blocks of each run of consecutive blocks that attain the maximum of the run (all of them, if tied)
+    df = sortByChromosome(df)
+    values = df[column]
+    maxima = values.groupby(labelConsecutiveBlocks(df)).transform("max")
+    return df[(values == maxima).values].reset_index(drop=True)
 
 
 def sizeFilter(bed, min_size, max_size):
@@ -212,7 +254,32 @@ def sizeFilter(bed, min_size, max_size):
     """
 
     # For size filter, convert to DataFrame, filter, and go back to BED
-    df = bed.to_dataframe()
+    return BedTool.from_dataframe(sizeFilterDF(bed.to_dataframe(), min_size, max_size))
+
+
+def sizeFilterDF(df, min_size, max_size):
+    """Filter peaks by size, as ``sizeFilter`` does, without converting to and from a BedTool object.
+
+    Parameters
+    ----------
+    df: ``pandas`` DataFrame
+        Peaks with ``chrom``, ``start``, and ``end`` columns
+    min_size: int
+        Lower bound for peak size
+    max_size: int
+        Upper bound for peak size
+
+    Returns
+    -------
+    filtered_peaks: ``pandas`` DataFrame
+        Peaks after size selection, in BED6 format
+    """
+
+    columns = ["chrom", "start", "end", "name", "score", "strand"]
+    # No peaks were called
+    if len(df) == 0:
+        return pd.DataFrame(columns=columns)
+    df = df.copy()
     df["size"] = df["end"] - df["start"]
     df = df[df["size"] <= max_size]
     df = df[df["size"] >= min_size]
@@ -220,7 +287,7 @@ def sizeFilter(bed, min_size, max_size):
     df["name"] = "peak_" + df.index.astype(str)
     df["score"] = 1
     df["strand"] = "."
-    return BedTool.from_dataframe(df[["chrom", "start", "end", "name", "score", "strand"]])
+    return df[columns]
 
 
 def annotate(
@@ -238,6 +305,8 @@ def annotate(
     pseudocount=1,
     tight=False,
     summit=False,
+    backend="native",
+    callback=None,
 ):
     """Core annotation and peak calling method.
 
@@ -271,101 +340,128 @@ def annotate(
         Whether to tighten the regions in ``regions_bed``
     summit: bool
         Whether to return peak summits instead of full peaks
+    backend: str
+        Backend used to count events per region; either "native" or "bedtools"
+    callback: function, optional
+        If specified, called with the peaks of each chromosome, as a ``pandas`` DataFrame (see ``blockify.writers``), instead of returning them
 
     Returns
     -------
-    out_bed: BedTool object
-        Set of peaks in BED6 format
+    out_bed: BedTool object or None
+        Set of peaks in BED6 format; None if callback is specified
     df: ``pandas`` DataFrame or None
-        If ``intermediate`` specified, DataFrame containing intermediate calculations during peak calling
+        If ``intermediate`` specified, DataFrame containing intermediate calculations during peak calling;
+        p-values that underflow are reported as 1 / FLOAT_MAX, but -log10 p-values are exact
     """
 
     # input_file, regions, and background_file are BedTool objects
     # Validate annotation arguments
-    validateAnnotationArguments(
-        input_file,
-        regions_bed,
-        background_file,
-        measure,
-        alpha,
-        correction,
-        p_value,
-        distance,
-        min_size,
-        max_size,
-        pseudocount,
-    )
+    with profiling.stage("annotation.validate"):
+        validateAnnotationArguments(
+            input_file,
+            regions_bed,
+            background_file,
+            measure,
+            alpha,
+            correction,
+            p_value,
+            distance,
+            min_size,
+            max_size,
+            pseudocount,
+        )
     # Calculate scaling factor
-    scalingFactor = len(input_file.to_dataframe()) / len(background_file.to_dataframe())
+    with profiling.stage("annotation.library_size"):
+        scalingFactor = utilities.countEvents(input_file) / utilities.countEvents(background_file)
+
+    with profiling.stage("annotation.to_dataframe"):
+        regions_df = regions_bed.to_dataframe()
 
     # Pull region edges to the nearest event in input, if specified
     if tight:
-        data = regions_bed.intersect(input_file, wa=True, wb=True, sorted=True)
-        regions_bed = tighten(data)
-
-    # Intersect regions with the input file
-    data = regions_bed.intersect(input_file, c=True, sorted=True).intersect(background_file, c=True, sorted=True)
-    # Convert to DataFrame
-    df = data.to_dataframe()
-    df = df.rename(index=str, columns={df.columns[-2]: "Input", df.columns[-1]: "Background"})
-
-    # Calculate the normalized background (Normed_bg) number of events
-    # by multiplying Background by scalingFactor. Then add the pseudocount,
-    # in the case of Normed_bg; and the floor of the pseudocount to Input.
-    # This preserves log-fold change if Background is 0, and keeps the value
-    # added to Input an integer (if pseudocount is a float).
-    df["Input"] += np.floor(pseudocount)
-    df["Normed_bg"] = df["Background"] * scalingFactor + pseudocount
-
-    # Calculate density of insertions in each block
-    df["Net_density"] = (df["Input"] - df["Normed_bg"]) / (df["end"] - df["start"])
-
-    if measure == "enrichment":
-        # Calculate the one-tail Poisson p-value of observing Input or more number of events
-        # given a lambda of Normed_bg. Use the survival function (sf), which is 1 - CDF.
-        # Need to specify Input - 1 because for discrete distributions, 1 - cdf(x) is p(X ≥ x + 1);
-        # sf(x - 1) is thus p(X ≥ x).
-        df["pValue"] = stats.poisson.sf(df["Input"] - 1, df["Normed_bg"])
-    elif measure == "depletion":
-        # Calculate the one-tail Poisson p-value of observing Input or fewer number of events
-        # given a lambda of Normed_bg. Use the cumulative distribution function (cdf).
-        # cdf(x) is  p(X ≤ x).
-        df["pValue"] = stats.poisson.cdf(df["Input"], df["Normed_bg"])
-    else:
-        # Something unexpected happened
-        print("Unexpected error:", sys.exc_info()[0])
-        raise
-    # Replace 0's with 1/FLOAT_MAX to obtain finite -log10(pValue)
-    df.replace(to_replace=0, value=1 / utilities.FLOAT_MAX, inplace=True)
-    df["negLog10pValue"] = -np.log10(df["pValue"])
-
-    # If p_value has been provided, filter by it; else, perform multiple hypothesis correction
-    if p_value:
-        df["rejected"] = df["pValue"] <= p_value
-        out_df = df[df["pValue"] <= p_value]
+        with profiling.stage("annotation.tighten"):
+            if backend == "bedtools":
+                data = regions_bed.intersect(utilities.toTextBEDObject(input_file), wa=True, wb=True, sorted=True)
+                regions_df = tighten(data).to_dataframe()
+            else:
+                regions_df = counting.tightenRegions(regions_df, input_file)
+
+    # Count the input and background events in each region
+    with profiling.stage("annotation.intersect"):
+        input_counts = counting.countOverlaps(regions_df, input_file, backend=backend)
+        background_counts = counting.countOverlaps(regions_df, background_file, backend=backend)
+
+    with profiling.stage("annotation.statistics"):
+        # Calculate the normalized background (Normed_bg) number of events
+        # by multiplying Background by scalingFactor. Then add the pseudocount,
+        # in the case of Normed_bg; and the floor of the pseudocount to Input.
+        # This preserves log-fold change if Background is 0, and keeps the value
+        # added to Input an integer (if pseudocount is a float).
+        input_counts = input_counts + np.floor(pseudocount)
+        normed_bg = background_counts * scalingFactor + pseudocount
+
+        # Calculate density of insertions in each block
+        lengths = regions_df["end"].values - regions_df["start"].values
+        net_density = (input_counts - normed_bg) / lengths
+
+        # p-values are computed as natural logarithms, so they never underflow (see ``blockify.statistics``)
+        if measure == "enrichment":
+            # Calculate the one-tail Poisson p-value of observing Input or more number of events
+            # given a lambda of Normed_bg, p(X ≥ Input)
+            log_p = statistics.logPoissonUpperTail(input_counts, normed_bg)
+        elif measure == "depletion":
+            # Calculate the one-tail Poisson p-value of observing Input or fewer number of events
+            # given a lambda of Normed_bg, p(X ≤ Input)
+            log_p = statistics.logPoissonLowerTail(input_counts, normed_bg)
+        else:
+            # Something unexpected happened
+            print("Unexpected error:", sys.exc_info()[0])
+            raise
+
+    with profiling.stage("annotation.multiple_testing"):
+        # If p_value has been provided, filter by it; else, perform multiple hypothesis correction
+        if p_value:
+            rejected = log_p <= np.log(p_value)
+            log_corrected = None
+        else:
+            rejected, log_corrected = statistics.correct(log_p, alpha, correction)
+
+    # Columns of intermediate calculations; only those of rejected regions
+    # are needed to call peaks, unless all of them are requested
+    columns = OrderedDict(
+        [
+            ("Input", input_counts),
+            ("Background", background_counts),
+            ("Normed_bg", normed_bg),
+            ("Net_density", net_density),
+            ("pValue", statistics.pValues(log_p)),
+            ("negLog10pValue", statistics.negLog10(log_p)),
+            ("rejected", rejected),
+        ]
+    )
+    if log_corrected is not None:
+        columns["corrected_pValue"] = statistics.pValues(log_corrected)
+        columns["negLog10corrected"] = statistics.negLog10(log_corrected)
+    if intermediate:
+        df = regions_df.assign(**columns)
+        out_df = df[rejected]
     else:
-        df["rejected"], df[
-            "corrected_pValue"
-        ], alphacSidak, alphacBonf = multitest.multipletests(
-            df["pValue"],
-            alpha=alpha,
-            method=correction,
-            is_sorted=False,
-            returnsorted=False,
-        )
-        df["negLog10corrected"] = -np.log10(df["corrected_pValue"])
-        out_df = df[df["rejected"]]
+        df = None
+        out_df = regions_df[rejected].assign(**{name: values[rejected] for name, values in columns.items()})
 
     # Return peak summits, if specified
     if summit:
-        out_df = getPeakSummits(out_df)
+        with profiling.stage("annotation.summits"):
+            out_df = getPeakSummits(out_df)
 
     # Convert out_df to out_bed
-    out_bed = BedTool.from_dataframe(out_df)
+    with profiling.stage("annotation.to_bed"):
+        out_bed = BedTool.from_dataframe(out_df)
 
     # Merge peaks within distance, if specified
     if distance is not None:
-        out_bed = out_bed.merge(d=distance)
+        with profiling.stage("annotation.merge"):
+            out_bed = out_bed.merge(d=distance)
 
     # Filter by minimum and/or maximum size, if specified
     if min_size:
@@ -377,27 +473,38 @@ def annotate(
         maxSize = max_size
     else:
         maxSize = np.inf
-    out_bed = sizeFilter(out_bed, minSize, maxSize)
+    with profiling.stage("annotation.size_filter"):
+        out_df = sizeFilterDF(out_bed.to_dataframe(), minSize, maxSize)
+
+    # Multiple hypothesis correction needs every region, so peaks can only
+    # be handed over once all of them are called; still, this saves
+    # writing them to a BedTool and parsing them back
+    if callback is not None:
+        for peaks in writers.iterChromosomeFrames(out_df):
+            callback(peaks)
+        out_bed = None
+    else:
+        with profiling.stage("annotation.to_bed"):
+            out_bed = BedTool.from_dataframe(out_df)
 
     # Return out_bed and intermediate file, if any
-    if intermediate:
-        return out_bed, df
-    else:
-        return out_bed, None
+    return out_bed, df
 
 
-def annotate_from_command_line(args):
+def annotate_from_command_line(args, callback=None):
     """Wrapper function for the command line function ``blockify call``
 
     Parameters
     ----------
     args: ``argparse.Namespace`` object
         Input from command line
+    callback: function, optional
+        Called with the peaks of each chromosome (see ``annotate``)
 
     Returns
     -------
-    out_bed: BedTool object
-        Set of peaks in BED6 format
+    out_bed: BedTool object or None
+        Set of peaks in BED6 format; None if callback is specified
     df: ``pandas`` DataFrame or None
         If ``intermediate`` specified, DataFrame containing intermediate calculations during peak calling
     """
@@ -408,9 +515,7 @@ def annotate_from_command_line(args):
         regions_bed = BedTool(args.regions)
     # otherwise, segment the file
     else:
-        region_segmentation = segmentation.segment(
-            input_file, args.method, p0=args.p0, prior=args.prior
-        )
+        region_segmentation = segmentation.segment_from_command_line(args)
         regions_bed = BedTool.from_dataframe(region_segmentation.df)
     background_file = BedTool(args.background)
 
@@ -429,4 +534,206 @@ def annotate_from_command_line(args):
         pseudocount=args.pseudocount,
         tight=args.tight,
         summit=args.summit,
+        backend=args.backend,
+        callback=callback,
+    )
+
+
+# Background shared by the samples of a batch (see ``annotateBatch``); set
+# once in each worker process, so that it is never sent along with a sample
+_shared_background = None
+
+
+def setSharedBackground(background):
+    """Set the background against which the samples of a batch are called.
+
+    Parameters
+    ----------
+    background: ``blockify.counting.EventIndex`` or str
+        Background events already loaded into memory, or the path to the background file
+
+    Returns
+    -------
+    None: None
+    """
+
+    global _shared_background
+    _shared_background = BedTool(background) if isinstance(background, str) else background
+
+
+def readManifest(path):
+    """Read a manifest of samples for batch peak calling (``blockify call --inputs``).
+
+    Each line holds a sample name and the path to its input file, separated by a tab, optionally followed by the path to the regions of the sample. Blank lines and lines starting with "#" are ignored.
+
+    Parameters
+    ----------
+    path: str
+        Path to the manifest (TSV format)
+
+    Returns
+    -------
+    samples: list of tuples
+        (name, input, regions) for each sample, with regions None if not specified
+    """
+
+    samples = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            assert len(fields) in (2, 3), "each line of the manifest should hold a name, an input file and optionally a regions file"
+            samples.append((fields[0], fields[1], fields[2] if len(fields) == 3 and fields[2] else None))
+    names = [name for name, _, _ in samples]
+    assert len(set(names)) == len(names), "sample names in the manifest should be unique"
+    return samples
+
+
+def annotateSample(name, input_path, regions, output, segmentation_options, annotation_options):
+    """Call the peaks of one sample of a batch against the shared background (see ``setSharedBackground``).
+
+    Parameters
+    ----------
+    name: str
+        Name of the sample
+    input_path: str
+        Path to the input file of the sample
+    regions: str or None
+        Path to the regions of the sample; if None, the input file is segmented
+    output: str
+        Path to the peak file of the sample
+    segmentation_options: dict
+        Keyword arguments of ``blockify.segmentation.segment``
+    annotation_options: dict
+        Keyword arguments of ``annotate``
+
+    Returns
+    -------
+    summary: tuple
+        (name, output, number of peaks)
+    """
+
+    input_file = BedTool(input_path)
+    if regions:
+        regions_bed = BedTool(regions)
+    else:
+        regions_bed = BedTool.from_dataframe(segmentation.segment(input_path, **segmentation_options).df)
+    npeaks = 0
+    with writers.BEDWriter(output) as writer:
+
+        def write(peaks):
+            nonlocal npeaks
+            npeaks += len(peaks)
+            writer.write(peaks)
+
+        annotate(input_file, regions_bed, _shared_background, callback=write, **annotation_options)
+    profiling.logger.info("Called %d peaks in %s", npeaks, name, extra={"sample": name, "peaks": npeaks})
+    return name, output, npeaks
+
+
+def annotateBatch(
+    samples, background_file, output_dir=".", regions=None, workers=1, segmentation_options=None, **annotation_options
+):
+    """Call the peaks of several samples against a shared background, writing one peak file per sample.
+
+    The background is loaded, validated and counted once for the whole
+    batch, and samples are called in parallel, each in a single process.
+
+    Parameters
+    ----------
+    samples: list of tuples
+        (name, input, regions) for each sample (see ``readManifest``)
+    background_file: str
+        Path to the background file
+    output_dir: str
+        Directory in which the peaks of each sample are written, to NAME.bed
+    regions: str or None
+        Path to the regions of samples that do not specify their own; if None, these samples are segmented
+    workers: int
+        Number of samples called in parallel
+    segmentation_options: dict, optional
+        Keyword arguments of ``blockify.segmentation.segment``, other than workers. Default: PELT with p0 = 0.05
+    annotation_options:
+        Keyword arguments of ``annotate``, other than intermediate and callback
+
+    Returns
+    -------
+    summaries: list of tuples
+        (name, output, number of peaks) for each sample, in the order of samples
+    """
+
+    assert workers >= 1, "--threads should be a positive integer"
+    assert "intermediate" not in annotation_options, "intermediate calculations cannot be returned in batch mode"
+    if segmentation_options is None:
+        segmentation_options = {"method": "PELT", "p0": 0.05}
+    # Each sample is segmented in a single process; samples run in parallel instead
+    segmentation_options = dict(segmentation_options, workers=1)
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [
+        (name, input_path, sample_regions or regions, os.path.join(output_dir, name + ".bed"))
+        for name, input_path, sample_regions in samples
+    ]
+
+    # Load the background once, unless it has a count index to count from
+    # (see ``blockify precount``); bedtools reads it from its file instead
+    with profiling.stage("annotation.background"):
+        if annotation_options.get("backend", "native") == "bedtools" or readers.findCountIndex(background_file) is not None:
+            background = background_file
+        else:
+            background = counting.EventIndex(BedTool(background_file))
+
+    if workers == 1:
+        setSharedBackground(background)
+        try:
+            return [annotateSample(*job, segmentation_options, annotation_options) for job in jobs]
+        finally:
+            setSharedBackground(None)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=setSharedBackground, initargs=(background,)
+    ) as executor:
+        futures = [executor.submit(annotateSample, *job, segmentation_options, annotation_options) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def annotate_batch_from_command_line(args):
+    """Wrapper function for the command line function ``blockify call --inputs``
+
+    Parameters
+    ----------
+    args: ``argparse.Namespace`` object
+        Input from command line
+
+    Returns
+    -------
+    summaries: list of tuples
+        (name, output, number of peaks) for each sample of the manifest
+    """
+
+    assert not args.intermediate, "--intermediate cannot be used with --inputs"
+    return annotateBatch(
+        readManifest(args.inputs),
+        args.background,
+        output_dir=args.outdir,
+        regions=args.regions,
+        workers=args.threads,
+        segmentation_options={
+            "method": args.method,
+            "p0": args.p0,
+            "prior": args.prior,
+            "cache": caching.cache_from_command_line(args),
+            "weighted": args.weighted,
+            "genome_wide": args.genome_wide,
+        },
+        measure=args.measure,
+        alpha=args.alpha,
+        p_value=args.pValueCutoff,
+        correction=args.correction,
+        distance=args.distance,
+        min_size=args.min,
+        max_size=args.max,
+        pseudocount=args.pseudocount,
+        tight=args.tight,
+        summit=args.summit,
+        backend=args.backend,
     )
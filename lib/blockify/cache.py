@@ -0,0 +1,201 @@
+import hashlib
+import numpy as np
+import os
+import tempfile
+
+# On-disk cache of segmentations. Entries are keyed by a hash of the
+# content of the input file together with the segmentation parameters,
+# so re-running ``blockify call`` or ``blockify normalize`` on the same
+# input (e.g. to sweep --alpha or --pseudocount) re-uses the blocks
+# instead of segmenting again. Each entry is a NumPy .npz archive of
+# plain arrays (no pickles). The total size of the cache is bounded;
+# least recently used entries are evicted first.
+
+# Default bound on the total size of the cache, in megabytes
+DEFAULT_CACHE_SIZE = 1024
+
+# Bump whenever the stored format or the segmentation results change
+CACHE_VERSION = 2
+
+# Number of bytes read at a time while hashing input files
+HASH_BLOCKSIZE = 2 ** 20
+
+# Extension of cache entries
+EXTENSION = ".npz"
+
+
+def hashFile(path):
+    """Hash the content of a file.
+
+    Parameters
+    ----------
+    path: str
+        Path to file
+
+    Returns
+    -------
+    digest: str
+        Hexadecimal digest of the file's content
+    """
+
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCKSIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SegmentationCache(object):
+    """A size-bounded, on-disk cache of segmentations."""
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        """
+        Parameters
+        ----------
+        directory: str
+            Directory in which entries are stored; created if it does not exist
+        max_size: float
+            Bound on the total size of the cache, in megabytes
+        """
+
+        assert max_size >= 0, "--cache-size should be non-negative"
+        # Directory in which entries are stored
+        self.directory = directory
+        # Bound on the total size of the cache, in bytes
+        self.max_size = max_size * 2 ** 20
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path, method, p0, prior, weighted=False, genome_wide=False):
+        """Compute the key of a segmentation.
+
+        Parameters
+        ----------
+        path: str
+            Path to the input file
+        method: str
+            Segmentation method
+        p0: float or None
+        prior: float or None
+        weighted: bool
+            Whether events are weighted by the value column
+        genome_wide: bool
+            Whether all chromosomes are segmented with a single prior
+
+        Returns
+        -------
+        key: str
+        """
+
+        parameters = "{}|{}|{!r}|{!r}|{!r}".format(
+            CACHE_VERSION, getattr(method, "__name__", method), p0, prior, bool(weighted)
+        )
+        # Only genome-wide segmentations carry the flag, so the keys of existing entries are unchanged
+        if genome_wide:
+            parameters += "|genome"
+        return "{}-{}".format(
+            hashFile(path), hashlib.blake2b(parameters.encode(), digest_size=8).hexdigest()
+        )
+
+    def path(self, key):
+        """Path of the entry with the given key."""
+        return os.path.join(self.directory, key + EXTENSION)
+
+    def load(self, key):
+        """Load an entry, marking it as recently used.
+
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        arrays: dict or None
+            Arrays stored under key, or None on a cache miss
+        """
+
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except (OSError, ValueError):
+            # Missing, partially written or corrupt entries are misses
+            return None
+        os.utime(path)
+        return arrays
+
+    def save(self, key, arrays):
+        """Store an entry, then evict entries until the cache fits its size bound.
+
+        Parameters
+        ----------
+        key: str
+        arrays: dict
+            NumPy arrays to store, keyed by name
+        """
+
+        # Write to a temporary file first, so that concurrent readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def entries(self):
+        """List the entries of the cache, least recently used first.
+
+        Returns
+        -------
+        entries: list of tuples
+            (path, size in bytes) of each entry
+        """
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return [(path, size) for _, path, size in sorted(entries)]
+
+    def size(self):
+        """Total size of the cache, in bytes."""
+        return sum(size for _, size in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size bound."""
+        entries = self.entries()
+        total = sum(size for _, size in entries)
+        for path, size in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+def cache_from_command_line(args):
+    """Build the segmentation cache requested on the command line, if any.
+
+    Parameters
+    ----------
+    args: ``argparse.Namespace`` object
+        Input from command line
+
+    Returns
+    -------
+    cache: SegmentationCache or None
+    """
+
+    if args.cache_dir is None:
+        return None
+    return SegmentationCache(args.cache_dir, args.cache_size)
@@ -0,0 +1,432 @@
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from . import readers
+from . import utilities
+
+# Counts the number of events overlapping each of a set of regions.
+# Since inputs are required to be sorted, the events overlapping a
+# region can be counted with two binary searches per region on the
+# chromosome's start and end coordinates, rather than by running
+# ``bedtools intersect -c`` and re-parsing its text output. Overlap
+# semantics follow bedtools: intervals are half-open, an overlap of a
+# single base counts, and zero-length intervals are treated as one
+# base long. If a file has a count index stored alongside it (see
+# ``blockify precount``), the two binary searches run on the index
+# instead, and the file is not read at all.
+#
+# Regions are tightened (``blockify call --tight``) the same way, finding
+# the first and last event in each region by binary search instead of
+# joining every region to every event it overlaps.
+
+# Available backends; "native" is the default
+BACKENDS = ["native", "bedtools"]
+
+
+def validateBackend(backend):
+    """Checks that a counting backend is valid.
+
+    Parameters
+    ----------
+    backend: str
+        Name of the backend
+
+    Returns
+    -------
+    None: None
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError("backend must be one of {}".format(", ".join(BACKENDS)))
+
+
+class EventIndex(object):
+    """Sorted events held in memory, one chromosome at a time, so that they can be counted against many sets of regions.
+
+    An EventIndex can be passed to ``countOverlaps`` (with the native
+    backend), ``iterOverlaps`` and ``tightenRegions`` in place of a BedTool
+    object, e.g. to load a background shared by several samples only once.
+    """
+
+    def __init__(self, bed_object):
+        """
+        Parameters
+        ----------
+        bed_object: BedTool object
+            Sorted BedTool object (instantiated from pybedtools) of events
+        """
+
+        # Streaming a file checks that it is sorted; other objects are checked up front
+        if not utilities.isFileBasedBEDObject(bed_object):
+            assert utilities.isSortedBEDObject(bed_object), "events must be sorted"
+        # Start and end coordinates of the events, keyed by chromosome
+        self.intervals = OrderedDict((chrom, (starts, ends)) for chrom, starts, ends in iterIntervals(bed_object))
+        # Events were sorted, so checks of sortedness can be skipped (see ``utilities.isSortedBEDObject``)
+        setattr(self, utilities.SORTED_ATTRIBUTE, True)
+
+    def __len__(self):
+        return sum(len(starts) for starts, _ in self.intervals.values())
+
+    def iterIntervals(self):
+        """Iterate over the intervals, one chromosome at a time (see ``iterIntervals``)."""
+        for chrom, (starts, ends) in self.intervals.items():
+            yield chrom, starts, ends
+
+
+def iterIntervals(bed_object):
+    """Iterate over the intervals of a sorted BedTool object, one chromosome at a time.
+
+    File-based objects (including packed event stores) are streamed from disk; other objects are converted to a DataFrame.
+
+    Parameters
+    ----------
+    bed_object: BedTool object or EventIndex
+        Sorted BedTool object (instantiated from pybedtools), or events already loaded into an EventIndex
+
+    Returns
+    -------
+    intervals: iterator of tuples
+        (chrom, start, end) for each chromosome, with start and end as NumPy arrays
+    """
+
+    if isinstance(bed_object, EventIndex):
+        yield from bed_object.iterIntervals()
+    elif utilities.isFileBasedBEDObject(bed_object):
+        for events in readers.iterChromosomes(bed_object.fn):
+            yield events.chrom, events.start, events.end
+    else:
+        df = bed_object.to_dataframe()
+        chroms = df["chrom"].astype(str).values
+        starts = df["start"].values.astype(np.int64)
+        ends = df["end"].values.astype(np.int64)
+        breaks = np.flatnonzero(chroms[1:] != chroms[:-1]) + 1
+        for i, j in zip(np.concatenate([[0], breaks]), np.concatenate([breaks, [len(df)]])):
+            yield chroms[i], starts[i:j], ends[i:j]
+
+
+def chromosomeBounds(regions_df):
+    """Row bounds of each chromosome's regions, in a DataFrame sorted by chromosome.
+
+    Parameters
+    ----------
+    regions_df: ``pandas`` DataFrame
+        Sorted regions with a ``chrom`` column
+
+    Returns
+    -------
+    bounds: list of tuples
+        (i, j) for each chromosome, such that its regions are ``regions_df.iloc[i:j]``
+    """
+
+    chroms = regions_df["chrom"].astype(str).values
+    breaks = np.flatnonzero(chroms[1:] != chroms[:-1]) + 1
+    return list(zip(np.concatenate([[0], breaks]).astype(int), np.concatenate([breaks, [len(chroms)]]).astype(int)))
+
+
+def iterSortedRegions(regions_df, bed_object):
+    """Pair each chromosome of sorted regions with the events on that chromosome.
+
+    Regions and events are walked in lockstep, so at most one chromosome of events is held in memory.
+
+    Parameters
+    ----------
+    regions_df: ``pandas`` DataFrame
+        Sorted regions with a ``chrom`` column
+    bed_object: BedTool object or EventIndex
+        Sorted BedTool object (instantiated from pybedtools) of events, or an EventIndex
+
+    Returns
+    -------
+    regions: iterator of tuples
+        (i, j, events) for each chromosome, where events is a tuple of the start and end coordinates of
+        the events on the chromosome of ``regions_df.iloc[i:j]``, or None if there are none
+    """
+
+    chroms = regions_df["chrom"].astype(str).values
+    intervals = iterIntervals(bed_object)
+    current = next(intervals, None)
+    for i, j in chromosomeBounds(regions_df):
+        chrom = chroms[i]
+        # Chromosomes are sorted, so skip those of events without any region
+        while current is not None and current[0] < chrom:
+            current = next(intervals, None)
+        if current is not None and current[0] == chrom:
+            yield i, j, current[1:]
+        else:
+            yield i, j, None
+
+
+def countSortedOverlaps(starts, ends, region_starts, region_ends):
+    """Count the intervals overlapping each region on a single chromosome.
+
+    Parameters
+    ----------
+    starts: ``numpy`` array
+        Start coordinates of the intervals, sorted in ascending order
+    ends: ``numpy`` array
+        End coordinates of the intervals
+    region_starts: ``numpy`` array
+        Start coordinates of the regions
+    region_ends: ``numpy`` array
+        End coordinates of the regions
+
+    Returns
+    -------
+    counts: ``numpy`` array
+        Number of intervals overlapping each region
+    """
+
+    # Zero-length intervals cover one base
+    ends = np.where(ends == starts, ends + 1, ends)
+    region_ends = np.where(region_ends == region_starts, region_ends + 1, region_ends)
+    # Ends are only sorted if no interval is nested within another
+    if np.any(ends[1:] < ends[:-1]):
+        ends = np.sort(ends)
+    # An interval overlaps a region if it starts before the region ends,
+    # and does not end at or before the region starts. Every interval
+    # that ends before the region starts also starts before it ends.
+    return np.searchsorted(starts, region_ends, side="left") - np.searchsorted(ends, region_starts, side="right")
+
+
+def findCountIndex(bed_object):
+    """Find the up-to-date count index stored alongside the file of a BedTool object, if any (see ``readers.CountIndex``).
+
+    Parameters
+    ----------
+    bed_object: BedTool object or EventIndex
+        BedTool object (instantiated from pybedtools) of events, or an EventIndex
+
+    Returns
+    -------
+    index: ``readers.CountIndex`` or None
+    """
+
+    if isinstance(bed_object, EventIndex) or not utilities.isFileBasedBEDObject(bed_object):
+        return None
+    return readers.findCountIndex(bed_object.fn)
+
+
+def countIndexedOverlaps(index, chrom, region_starts, region_ends):
+    """Count the events overlapping each region on a single chromosome with a count index.
+
+    Parameters
+    ----------
+    index: ``readers.CountIndex``
+        Count index of the events
+    chrom: str
+        Chromosome of the regions
+    region_starts: ``numpy`` array
+        Start coordinates of the regions
+    region_ends: ``numpy`` array
+        End coordinates of the regions
+
+    Returns
+    -------
+    counts: ``numpy`` array
+        Number of events overlapping each region
+    """
+
+    arrays = index.chromosome(chrom)
+    if arrays is None:
+        return np.zeros(len(region_starts), dtype=np.int64)
+    starts, start_counts, ends, end_counts = arrays
+    region_ends = np.where(region_ends == region_starts, region_ends + 1, region_ends)
+    # Events that start before the region ends, minus those that end at or before it starts (see ``countSortedOverlaps``)
+    return start_counts[np.searchsorted(starts, region_ends, side="left")] - end_counts[
+        np.searchsorted(ends, region_starts, side="right")
+    ]
+
+
+def countOverlaps(regions_df, bed_object, backend="native"):
+    """Count the events in a BedTool object overlapping each region, as ``bedtools intersect -c`` would.
+
+    Parameters
+    ----------
+    regions_df: ``pandas`` DataFrame
+        Regions with ``chrom``, ``start``, and ``end`` columns
+    bed_object: BedTool object or EventIndex
+        Sorted BedTool object (instantiated from pybedtools) of events, or an EventIndex
+    backend: str
+        Either "native" (binary search on sorted coordinates) or "bedtools"
+
+    Returns
+    -------
+    counts: ``numpy`` array
+        Number of events overlapping each region, in the order of ``regions_df``
+    """
+
+    validateBackend(backend)
+    if backend == "bedtools":
+        from pybedtools import BedTool
+
+        if isinstance(bed_object, EventIndex):
+            raise ValueError("events loaded into an EventIndex can only be counted with the native backend")
+
+        regions_bed = BedTool.from_dataframe(regions_df[["chrom", "start", "end"]])
+        return (
+            regions_bed.intersect(utilities.toTextBEDObject(bed_object), c=True, sorted=True)
+            .to_dataframe()
+            .iloc[:, -1]
+            .values.astype(np.int64)
+        )
+
+    counts = np.zeros(len(regions_df), dtype=np.int64)
+    chroms = regions_df["chrom"].astype(str).values
+    region_starts = regions_df["start"].values.astype(np.int64)
+    region_ends = regions_df["end"].values.astype(np.int64)
+    # Row indexes of the regions on each chromosome, grouped in a single pass
+    # so that assemblies with many contigs do not scan every region per contig
+    codes, uniques = pd.factorize(chroms)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))])
+    rows = OrderedDict((chrom, order[bounds[k]:bounds[k + 1]]) for k, chrom in enumerate(uniques))
+    index = findCountIndex(bed_object)
+    if index is not None:
+        for chrom, chrom_rows in rows.items():
+            counts[chrom_rows] = countIndexedOverlaps(index, chrom, region_starts[chrom_rows], region_ends[chrom_rows])
+        return counts
+    # Stream events one chromosome at a time
+    for chrom, starts, ends in iterIntervals(bed_object):
+        if chrom in rows:
+            index = rows[chrom]
+            counts[index] = countSortedOverlaps(starts, ends, region_starts[index], region_ends[index])
+    return counts
+
+
+def iterOverlaps(regions_df, bed_object, backend="native"):
+    """Count the events overlapping each region, one chromosome of regions at a time.
+
+    Unlike ``countOverlaps``, the counts of each chromosome are yielded as
+    soon as they are known, and at most one chromosome of events is held in
+    memory. Regions and events must both be sorted.
+
+    Parameters
+    ----------
+    regions_df: ``pandas`` DataFrame
+        Sorted regions with ``chrom``, ``start``, and ``end`` columns
+    bed_object: BedTool object or EventIndex
+        Sorted BedTool object (instantiated from pybedtools) of events, or an EventIndex
+    backend: str
+        Either "native" (binary search on sorted coordinates) or "bedtools"
+
+    Returns
+    -------
+    counts: iterator of tuples
+        (i, j, counts) for each chromosome, where counts is the number of events overlapping each of the regions ``regions_df.iloc[i:j]``
+    """
+
+    validateBackend(backend)
+    if backend == "bedtools":
+        # bedtools counts every region in one go
+        counts = countOverlaps(regions_df, bed_object, backend=backend)
+        for i, j in chromosomeBounds(regions_df):
+            yield i, j, counts[i:j]
+        return
+
+    region_starts = regions_df["start"].values.astype(np.int64)
+    region_ends = regions_df["end"].values.astype(np.int64)
+    index = findCountIndex(bed_object)
+    if index is not None:
+        chroms = regions_df["chrom"].astype(str).values
+        for i, j in chromosomeBounds(regions_df):
+            yield i, j, countIndexedOverlaps(index, chroms[i], region_starts[i:j], region_ends[i:j])
+        return
+    for i, j, events in iterSortedRegions(regions_df, bed_object):
+        if events is not None:
+            yield i, j, countSortedOverlaps(events[0], events[1], region_starts[i:j], region_ends[i:j])
+        else:
+            yield i, j, np.zeros(j - i, dtype=np.int64)
+
+
+def tightenSortedRegions(starts, ends, region_starts, region_ends):
+    """Find the first and last interval overlapping each region on a single chromosome.
+
+    Parameters
+    ----------
+    starts: ``numpy`` array
+        Start coordinates of the intervals, sorted in ascending order
+    ends: ``numpy`` array
+        End coordinates of the intervals
+    region_starts: ``numpy`` array
+        Start coordinates of the regions
+    region_ends: ``numpy`` array
+        End coordinates of the regions
+
+    Returns
+    -------
+    overlapped: ``numpy`` array
+        Whether any interval overlaps each region
+    tight_starts: ``numpy`` array
+        Start coordinate of the first interval overlapping each region
+    tight_ends: ``numpy`` array
+        End coordinate of the last interval overlapping each region (among those starting last, the one ending last)
+    """
+
+    # Zero-length intervals cover one base, but keep their own coordinates
+    covered_ends = np.where(ends == starts, ends + 1, ends)
+    region_ends = np.where(region_ends == region_starts, region_ends + 1, region_ends)
+    # Intervals [lo, hi) start before each region ends, from the first one
+    # that ends after the region starts; the running maximum of ends makes
+    # this a binary search even if some intervals are nested within others
+    lo = np.searchsorted(np.maximum.accumulate(covered_ends), region_starts, side="right")
+    hi = np.searchsorted(starts, region_ends, side="left")
+    overlapped = lo < hi
+    tight_starts = np.zeros(len(region_starts), dtype=np.int64)
+    tight_ends = np.zeros(len(region_starts), dtype=np.int64)
+    if not overlapped.any():
+        return overlapped, tight_starts, tight_ends
+    lo, hi = lo[overlapped], hi[overlapped]
+    tight_starts[overlapped] = starts[lo]
+    # Latest end among the intervals sharing each start coordinate
+    first = np.flatnonzero(np.concatenate([[True], starts[1:] != starts[:-1]]))
+    latest_ends = np.repeat(np.maximum.reduceat(ends, first), np.diff(np.append(first, len(starts))))
+    last = hi - 1
+    tight_ends[overlapped] = latest_ends[last]
+    # The last interval to start may end before the region starts, if it is
+    # nested within an earlier one; these regions are resolved one by one
+    rows = np.flatnonzero(overlapped)
+    for k in np.flatnonzero(starts[last] < region_starts[rows]):
+        hits = np.flatnonzero(covered_ends[lo[k]:hi[k]] > region_starts[rows[k]]) + lo[k]
+        latest = starts[hits] == starts[hits[-1]]
+        tight_ends[rows[k]] = ends[hits[latest]].max()
+    return overlapped, tight_starts, tight_ends
+
+
+def tightenRegions(regions_df, bed_object):
+    """Pull the edges of each region in to the first and last event overlapping it, without joining regions to events.
+
+    Regions without any overlapping event are dropped, and duplicate regions
+    are only kept once, as with ``bedtools intersect -wa -wb`` followed by
+    ``blockify.annotation.tighten``.
+
+    Parameters
+    ----------
+    regions_df: ``pandas`` DataFrame
+        Sorted regions with ``chrom``, ``start``, and ``end`` columns
+    bed_object: BedTool object or EventIndex
+        Sorted BedTool object (instantiated from pybedtools) of events, or an EventIndex
+
+    Returns
+    -------
+    tight_df: ``pandas`` DataFrame
+        Tightened regions, with ``chrom``, ``start``, and ``end`` columns
+    """
+
+    regions_df = regions_df[["chrom", "start", "end"]].drop_duplicates()
+    region_starts = regions_df["start"].values.astype(np.int64)
+    region_ends = regions_df["end"].values.astype(np.int64)
+    overlapped = np.zeros(len(regions_df), dtype=bool)
+    tight_starts = np.zeros(len(regions_df), dtype=np.int64)
+    tight_ends = np.zeros(len(regions_df), dtype=np.int64)
+    for i, j, events in iterSortedRegions(regions_df, bed_object):
+        if events is not None:
+            overlapped[i:j], tight_starts[i:j], tight_ends[i:j] = tightenSortedRegions(
+                events[0], events[1], region_starts[i:j], region_ends[i:j]
+            )
+    return pd.DataFrame(
+        {
+            "chrom": regions_df["chrom"].values[overlapped],
+            "start": tight_starts[overlapped],
+            "end": tight_ends[overlapped],
+        }
+    )
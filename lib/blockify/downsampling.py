@@ -1,29 +1,158 @@
 import numpy as np
 import pandas as pd
 from pybedtools import BedTool
+from . import profiling
+from . import readers
+from . import writers
 
+# Downsamples BED-like files, optionally in proportion to the value
+# column. The default "exponential" engine implements the weighted
+# sampling without replacement of Efraimidis and Spirakis: each row
+# draws a key E / w, with E exponentially distributed and w the row's
+# weight, and the n rows with the smallest keys are kept. Keys are
+# independent of each other, so the file is sampled in a single pass,
+# one chunk at a time, holding only the n rows kept so far in memory.
+# The "legacy" engine is the original ``np.random.choice`` sampler,
+# which reads the whole file at once; its samples for a given seed are
+# those of earlier versions.
 
-def downsample(input_file, n, seed=None, naive=False):
-    """Core downsampling method
+# Available engines; "exponential" is the default
+ENGINES = ["exponential", "legacy"]
+
+
+def validateEngine(engine):
+    """Checks that a downsampling engine is valid.
+
+    Parameters
+    ----------
+    engine: str
+        Name of the engine
+
+    Returns
+    -------
+    None: None
+    """
+
+    if engine not in ENGINES:
+        raise ValueError("engine must be one of {}".format(", ".join(ENGINES)))
+
+
+def iterInputChunks(path, chunksize=readers.DEFAULT_CHUNKSIZE):
+    """Read a BED-like file in chunks, keeping every column.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed, or to a packed event store
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    chunks: iterator of ``pandas`` DataFrames
+        Rows of the file with integer column labels, as if read with ``pd.read_table(path, header=None)``
+    """
+
+    if readers.isPacked(path):
+        # Packed stores keep the first four columns only, one chromosome at a time
+        packed = readers.PackedEvents(path)
+        # Integer values (e.g. read counts) are written as integers, as by ``PackedEvents.toDataFrame``
+        integral = all(np.array_equal(_.value, np.round(_.value)) for _ in packed.iterChromosomes(value=True))
+        for events in packed.iterChromosomes(value=True):
+            yield pd.DataFrame(
+                {
+                    0: events.chrom,
+                    1: events.start.astype(np.int64),
+                    2: events.end.astype(np.int64),
+                    3: events.value.astype(np.int64) if integral else np.array(events.value),
+                }
+            )
+        return
+    yield from pd.read_table(
+        path,
+        header=None,
+        compression="gzip" if readers.isGzipped(path) else None,
+        chunksize=chunksize,
+    )
+
+
+def sampleExponential(chunks, n, rng, naive=False):
+    """Draw a weighted sample without replacement in a single pass over chunks of rows (Efraimidis-Spirakis).
+
+    Parameters
+    ----------
+    chunks: iterable of ``pandas`` DataFrames
+        Rows to sample from, with weights in column 3 (unless naive)
+    n: int
+        Number of rows to sample
+    rng: ``numpy.random.Generator``
+        Source of randomness
+    naive: bool
+        Whether to sample each row with equal probability, ignoring weights
+
+    Returns
+    -------
+    sample: ``pandas`` DataFrame
+        The sampled rows, in their original order
+    """
+
+    # Rows kept so far, their keys and their positions in the input
+    kept = None
+    keys = np.zeros(0)
+    positions = np.zeros(0, dtype=np.int64)
+    offset = 0
+    for chunk in chunks:
+        size = len(chunk)
+        if naive:
+            chunk_keys = rng.standard_exponential(size)
+        else:
+            weights = chunk[3].values.astype(np.float64)
+            assert np.all(weights >= 0), "weights in the value column should be non-negative"
+            # Rows with a weight of 0 are never sampled
+            with np.errstate(divide="ignore"):
+                chunk_keys = rng.standard_exponential(size) / weights
+        chunk_positions = np.arange(offset, offset + size)
+        offset += size
+        # Once n rows are kept, only rows with smaller keys than the largest kept one can enter
+        if len(keys) == n and n:
+            candidates = np.flatnonzero(chunk_keys < keys.max())
+            chunk, chunk_keys, chunk_positions = chunk.iloc[candidates], chunk_keys[candidates], chunk_positions[candidates]
+        if len(chunk) == 0:
+            continue
+        kept = chunk if kept is None else pd.concat([kept, chunk])
+        keys = np.concatenate([keys, chunk_keys])
+        positions = np.concatenate([positions, chunk_positions])
+        if len(keys) > n:
+            smallest = np.argpartition(keys, n - 1)[:n]
+            kept, keys, positions = kept.iloc[smallest], keys[smallest], positions[smallest]
+    assert len(keys) == n and np.all(np.isfinite(keys)), "--number cannot exceed the number of rows with positive weight"
+    if kept is None:
+        return pd.DataFrame()
+    # Restore the order of the input
+    order = np.argsort(positions, kind="stable")
+    return kept.iloc[order].reset_index(drop=True)
+
+
+def sampleLegacy(input_file, n, seed=None, naive=False):
+    """Draw a weighted sample without replacement with ``np.random.choice``, as earlier versions did.
 
     Parameters
     ----------
     input_file: ``pandas`` DataFrame
-        Input data (e.g. BED, qBED, CCF) as a ``pandas`` DataFrame
+        Rows to sample from, with weights in column 3 (unless naive)
     n: int
-        Number of entries to sample
+        Number of rows to sample
     seed: int
-        Seed for random number generator
+        Seed for the global NumPy random number generator
     naive: bool
-        Choose whether to sample each entry with equal probability (True) or weighted by the value in the fourth column (if supplied)
+        Whether to sample each row with equal probability, ignoring weights
 
     Returns
     -------
-    downsampled_file: BedTool object
-        Input file after downsampling
+    sample: ``pandas`` DataFrame
+        The sampled rows, in their original order
     """
 
-    # input_file is a pandas DataFrame
     total = np.sum(input_file[3])  # total
     if naive:
         # Select rows with equal likelihood
@@ -33,29 +162,71 @@ def downsample(input_file, n, seed=None, naive=False):
         p = input_file[3] / total
     if seed is not None:  # set random seed if provided
         np.random.seed(seed)
-    # Sample rows
     indexes = np.random.choice(np.arange(len(input_file)), size=n, replace=False, p=p)
     indexes.sort()
-    downsampled_file = input_file.iloc[indexes]
-    return BedTool.from_dataframe(downsampled_file)
+    return input_file.iloc[indexes]
+
+
+def downsample(input_file, n, seed=None, naive=False, engine="exponential", callback=None):
+    """Core downsampling method
+
+    Parameters
+    ----------
+    input_file: ``pandas`` DataFrame or iterable of ``pandas`` DataFrames
+        Input data (e.g. BED, qBED, CCF) as a ``pandas`` DataFrame, or as consecutive chunks of one (see ``iterInputChunks``)
+    n: int
+        Number of entries to sample
+    seed: int or ``numpy.random.Generator``
+        Seed for random number generator
+    naive: bool
+        Choose whether to sample each entry with equal probability (True) or weighted by the value in the fourth column (if supplied)
+    engine: str
+        Either "exponential" (single-pass Efraimidis-Spirakis sampling) or "legacy" (``np.random.choice``)
+    callback: function, optional
+        If specified, called with the sampled entries of each chromosome, as a ``pandas`` DataFrame (see ``blockify.writers``), instead of returning them
+
+    Returns
+    -------
+    downsampled_file: BedTool object or None
+        Input file after downsampling; None if callback is specified
+    """
+
+    validateEngine(engine)
+    assert n >= 0, "--number should be non-negative"
+    chunks = [input_file] if isinstance(input_file, pd.DataFrame) else input_file
+    # Sample rows
+    with profiling.stage("downsampling.sample"):
+        if engine == "legacy":
+            downsampled_file = sampleLegacy(pd.concat(list(chunks)), n, seed=seed, naive=naive)
+        else:
+            downsampled_file = sampleExponential(chunks, n, np.random.default_rng(seed), naive=naive)
+    if callback is not None:
+        for entries in writers.iterChromosomeFrames(downsampled_file):
+            callback(entries)
+        return None
+    with profiling.stage("downsampling.to_bed"):
+        return BedTool.from_dataframe(downsampled_file)
 
 
 # Downsample a qBED file from the command line
 # Thin wrapper for downsample()
-def downsample_from_command_line(args):
+def downsample_from_command_line(args, callback=None):
     """Wrapper function for the command line function ``blockify downsample``
 
     Parameters
     ----------
     args: ``argparse.Namespace`` object
         Input from command line
+    callback: function, optional
+        If specified, called with the sampled entries of each chromosome instead of returning them (see ``downsample``)
 
     Returns
     -------
-    downsampled_file: BedTool
-        Downsampled command line data
+    downsampled_file: BedTool or None
+        Downsampled command line data; None if callback is specified
     """
 
-    input_file = pd.read_table(args.input, header=None)
-    # Segment the input file
-    return downsample(input_file, args.number, seed=args.seed, naive=args.naive)
+    # The input file is read as it is sampled
+    return downsample(
+        iterInputChunks(args.input), args.number, seed=args.seed, naive=args.naive, engine=args.engine, callback=callback
+    )
@@ -0,0 +1,252 @@
+import numpy as np
+
+# This file contains the dynamic programming kernels used by the
+# segmentation algorithms in algorithms.py. The kernels work on
+# cumulative counts that are computed once per segmentation, so the
+# cost of each iteration does not depend on re-summing the data,
+# and they write into preallocated buffers instead of allocating
+# new arrays at every step. If numba is installed, the PELT kernel
+# is compiled to machine code; otherwise, an equivalent NumPy
+# implementation is used.
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def cumulative_counts(x):
+    """Compute the cumulative number of events preceding each cell.
+
+    Parameters
+    ----------
+    x: array_like
+        Number of events (or weights) in each cell
+
+    Returns
+    -------
+    cum_x: ndarray
+        Length-(N + 1) float array, where ``cum_x[i]`` is the number of events in cells ``0`` to ``i - 1``
+    """
+
+    cum_x = np.zeros(len(x) + 1, dtype=float)
+    np.cumsum(x, out=cum_x[1:])
+    return cum_x
+
+
+def _op_kernel(block_length, cum_x, ncp_prior, best, last):
+    # Preallocate work buffers; each iteration writes into views of these
+    N = len(best)
+    T_k = np.empty(N, dtype=float)
+    N_k = np.empty(N, dtype=float)
+    A_R = np.empty(N, dtype=float)
+    for R in range(N):
+        n = R + 1
+        # T_k: width/duration of each block
+        np.subtract(block_length[:n], block_length[R + 1], out=T_k[:n])
+        # N_k: number of elements in each block
+        np.subtract(cum_x[R + 1], cum_x[:n], out=N_k[:n])
+        # Fitness of the putative last block, N_k * (log(N_k) - log(T_k))
+        np.log(T_k[:n], out=T_k[:n])
+        np.log(N_k[:n], out=A_R[:n])
+        np.subtract(A_R[:n], T_k[:n], out=A_R[:n])
+        np.multiply(N_k[:n], A_R[:n], out=A_R[:n])
+        A_R[:n] -= ncp_prior
+        A_R[1:n] += best[:R]
+
+        i_max = np.argmax(A_R[:n])
+        last[R] = i_max
+        best[R] = A_R[i_max]
+
+
+def _pelt_kernel_numpy(block_length, cum_x, ncp_prior, best, last, candidates, n, start):
+    # Preallocate work buffers; the candidate buffer holds the first n
+    # (unpruned) candidates, and has room for one more per cell from start
+    N = len(last)
+    size = len(candidates)
+    T_k = np.empty(size, dtype=float)
+    N_k = np.empty(size, dtype=float)
+    fit_vec = np.empty(size, dtype=float)
+    A_R = np.empty(size, dtype=float)
+    for R in range(start, N):
+        # Consider everything unpruned until proven otherwise
+        candidates[n] = R
+        n += 1
+        unpruned = candidates[:n]
+
+        # T_k: width/duration of each block
+        np.take(block_length, unpruned, out=T_k[:n])
+        T_k[:n] -= block_length[R + 1]
+        # N_k: number of elements in each block
+        np.take(cum_x, unpruned, out=N_k[:n])
+        np.subtract(cum_x[R + 1], N_k[:n], out=N_k[:n])
+        # Fitness of the putative last block, -N_k * (log(N_k) - log(T_k))
+        np.log(T_k[:n], out=T_k[:n])
+        np.log(N_k[:n], out=fit_vec[:n])
+        np.subtract(fit_vec[:n], T_k[:n], out=fit_vec[:n])
+        np.negative(N_k[:n], out=N_k[:n])
+        np.multiply(N_k[:n], fit_vec[:n], out=fit_vec[:n])
+        np.add(fit_vec[:n], ncp_prior, out=A_R[:n])
+        np.take(best, unpruned, out=T_k[:n])
+        A_R[:n] += T_k[:n]
+
+        i_min = np.argmin(A_R[:n])
+        last[R] = unpruned[i_min]
+        best[R + 1] = A_R[i_min]
+
+        # Pruning step: drop every candidate that can never be optimal again
+        T_k[:n] += fit_vec[:n]
+        keep = T_k[:n] <= best[R + 1]
+        m = np.count_nonzero(keep)
+        if m < n:
+            candidates[:m] = unpruned[keep]
+            n = m
+    return n
+
+
+def _pelt_kernel_loop(block_length, cum_x, ncp_prior, best, last, candidates, n, start):
+    N = len(last)
+    fit_vec = np.empty(len(candidates), dtype=np.float64)
+    for R in range(start, N):
+        # Consider everything unpruned until proven otherwise
+        candidates[n] = R
+        n += 1
+        end_length = block_length[R + 1]
+        total = cum_x[R + 1]
+        i_min = 0
+        A_min = 0.0
+        for j in range(n):
+            i = candidates[j]
+            T_k = block_length[i] - end_length
+            N_k = total - cum_x[i]
+            fit = -N_k * (np.log(N_k) - np.log(T_k))
+            fit_vec[j] = fit
+            A = fit + ncp_prior + best[i]
+            if j == 0 or A < A_min:
+                i_min = j
+                A_min = A
+        last[R] = candidates[i_min]
+        best[R + 1] = A_min
+
+        # Pruning step: drop every candidate that can never be optimal again,
+        # compacting the survivors to the front of the buffer
+        m = 0
+        for j in range(n):
+            i = candidates[j]
+            if best[i] + fit_vec[j] <= A_min:
+                candidates[m] = i
+                m += 1
+        n = m
+    return n
+
+
+if HAS_NUMBA:
+    _pelt_kernel = njit(cache=True, nogil=True)(_pelt_kernel_loop)
+else:
+    _pelt_kernel = _pelt_kernel_numpy
+
+
+def optimal_partitioning(block_length, x, ncp_prior):
+    """Optimal partitioning (OP) dynamic program over cumulative counts.
+
+    Parameters
+    ----------
+    block_length: ndarray
+        Length-(N + 1) array of distances from each cell edge to the last data point
+    x: ndarray
+        Length-N array with the number of events in each cell
+    ncp_prior: float
+        Prior on the number of change points
+
+    Returns
+    -------
+    best: ndarray
+        Length-N array of the best fitness of a segmentation ending at each cell
+    last: ndarray
+        Length-N array of the start of the last block in each best segmentation
+    """
+
+    N = len(x)
+    best = np.zeros(N, dtype=float)
+    last = np.zeros(N, dtype=np.int64)
+    _op_kernel(
+        np.ascontiguousarray(block_length, dtype=float),
+        cumulative_counts(x),
+        float(ncp_prior),
+        best,
+        last,
+    )
+    return best, last
+
+
+def pelt(block_length, x, ncp_prior):
+    """Pruned exact linear time (PELT) dynamic program over cumulative counts.
+
+    Parameters
+    ----------
+    block_length: ndarray
+        Length-(N + 1) array of distances from each cell edge to the last data point
+    x: ndarray
+        Length-N array with the number of events in each cell
+    ncp_prior: float
+        Prior on the number of change points
+
+    Returns
+    -------
+    best: ndarray
+        Length-(N + 1) array of the best cost of a segmentation of the first ``i`` cells
+    last: ndarray
+        Length-N array of the start of the last block in each best segmentation
+    """
+
+    N = len(x)
+    best = np.zeros(N + 1, dtype=float)
+    last = np.zeros(N, dtype=np.int64)
+    pelt_update(block_length, cumulative_counts(x), ncp_prior, best, last, np.empty(N, dtype=np.int64), 0, 0)
+    return best, last
+
+
+def pelt_update(block_length, cum_x, ncp_prior, best, last, candidates, n, start):
+    """Extend a PELT dynamic program by the cells from ``start`` onwards, in place.
+
+    The state of the dynamic program (``best``, ``last``, and the unpruned
+    candidates) for the cells before ``start`` is taken as given, so cells
+    can be added in batches as they arrive (see ``algorithms.OnlinePELT``).
+
+    Parameters
+    ----------
+    block_length: ndarray
+        Length-(N + 1) array of distances from each cell edge to a fixed point past the last edge; only differences are used
+    cum_x: ndarray
+        Length-(N + 1) array of cumulative counts (see ``cumulative_counts``)
+    ncp_prior: float
+        Prior on the number of change points
+    best: ndarray
+        Length-(N + 1) array of best costs; entries up to ``start`` must be filled in
+    last: ndarray
+        Length-N array of the starts of the last blocks; entries before ``start`` must be filled in
+    candidates: ndarray
+        int64 buffer whose first n entries are the unpruned candidates; must have room for n + N - start entries
+    n: int
+        Number of unpruned candidates
+    start: int
+        First cell to add
+
+    Returns
+    -------
+    n: int
+        Number of unpruned candidates after the last cell, stored at the front of ``candidates``
+    """
+
+    return _pelt_kernel(
+        np.ascontiguousarray(block_length, dtype=float),
+        np.ascontiguousarray(cum_x, dtype=float),
+        float(ncp_prior),
+        best,
+        last,
+        candidates,
+        int(n),
+        int(start),
+    )
@@ -1,4 +1,7 @@
+import pandas as pd
 from pybedtools import BedTool
+from . import counting
+from . import profiling
 from . import segmentation
 from . import utilities
 import warnings
@@ -41,8 +44,8 @@ def validateNormalizationArguments(input_file, regions_bed, libraryFactor, lengt
         assert lengthFactor > 0, "--lengthFactor should be a positive number"
 
 
-def normalize(input_file, regions_bed, libraryFactor, lengthFactor):
-    """Core normalization method
+def iterNormalize(input_file, regions_bed, libraryFactor, lengthFactor, backend="native"):
+    """Compute normalized rates of events one chromosome at a time, as ``normalize`` does.
 
     Parameters
     ----------
@@ -54,56 +57,102 @@ def normalize(input_file, regions_bed, libraryFactor, lengthFactor):
         Scalar to normalize by input_file's library size.
     lengthFactor: float or None
         Scalar to normalize by each block's length. If None, no length normalization is performed.
+    backend: str
+        Backend used to count events per region; either "native" or "bedtools"
 
     Returns
     -------
-    bedgraph: BedTool
-        A BedTool object in bedGraph format, using the intervals supplied in regions_bed
+    bedgraphs: iterator of ``pandas`` DataFrame
+        The bedGraph of each chromosome, using the intervals supplied in regions_bed
     """
 
     # input_file and regions_bed are BedTool objects
     # Calculate library scaling constant, which is the total number
     # Validate normalization arguments
-    validateNormalizationArguments(input_file, regions_bed, libraryFactor, lengthFactor)
+    with profiling.stage("normalization.validate"):
+        validateNormalizationArguments(input_file, regions_bed, libraryFactor, lengthFactor)
     # of events in input BED divided by the library factor
-    library_scaling_constant = len(input_file.to_dataframe()) / libraryFactor
+    with profiling.stage("normalization.library_size"):
+        library_scaling_constant = utilities.countEvents(input_file) / libraryFactor
 
     # For each interval in regions, count the number of events;
     # normalize the count by library_scaling_constant.
-    # The last call to .iloc should be able to accomodate region BED files with arbitrary numbers of fields
-    intersect_df = regions_bed.intersect(input_file, c=True, sorted=True).to_dataframe().iloc[:, [0, 1, 2, -1]]
-    intersect_df.columns = ["chrom", "start", "end", "rawCount"]
-    intersect_df["normCount"] = intersect_df["rawCount"] / library_scaling_constant
+    # The call to .iloc should be able to accomodate region BED files with arbitrary numbers of fields
+    with profiling.stage("normalization.intersect"):
+        regions_df = regions_bed.to_dataframe().iloc[:, [0, 1, 2]]
+        regions_df.columns = ["chrom", "start", "end"]
+        overlaps = counting.iterOverlaps(regions_df, input_file, backend=backend)
+    # Counts are computed, and returned, one chromosome at a time
+    while True:
+        with profiling.stage("normalization.intersect"):
+            chunk = next(overlaps, None)
+        if chunk is None:
+            break
+        i, j, counts = chunk
+        intersect_df = regions_df.iloc[i:j].copy()
+        intersect_df["rawCount"] = counts
+        intersect_df["normCount"] = intersect_df["rawCount"] / library_scaling_constant
+
+        # If lengthFactor has been provided, calculate normalized rates of events
+        if lengthFactor:
+            intersect_df["normRate"] = intersect_df["normCount"] / (
+                (intersect_df["end"] - intersect_df["start"]) / lengthFactor
+            )
+            yield intersect_df[["chrom", "start", "end", "normRate"]]
+        else:
+            yield intersect_df[["chrom", "start", "end", "normCount"]]
+
+
+def normalize(input_file, regions_bed, libraryFactor, lengthFactor, backend="native", callback=None):
+    """Core normalization method
+
+    Parameters
+    ----------
+    input_file: BedTool object
+        BedTool object (instantiated from pybedtools) for input data
+    regions_bed: BedTool object
+        BedTool object (instantiated from pybedtools) for regions over which we are normalizing input_file
+    libraryFactor: float
+        Scalar to normalize by input_file's library size.
+    lengthFactor: float or None
+        Scalar to normalize by each block's length. If None, no length normalization is performed.
+    backend: str
+        Backend used to count events per region; either "native" or "bedtools"
+    callback: function, optional
+        If specified, called with the bedGraph of each chromosome, as a ``pandas`` DataFrame, as soon as it is computed (see ``blockify.writers``); nothing is returned
 
-    # If lengthFactor has been provided, calculate normalized rates of events
-    if lengthFactor:
-        intersect_df["normRate"] = intersect_df["normCount"] / (
-            (intersect_df["end"] - intersect_df["start"]) / lengthFactor
-        )
+    Returns
+    -------
+    bedgraph: BedTool or None
+        A BedTool object in bedGraph format, using the intervals supplied in regions_bed; None if callback is specified
+    """
+
+    bedgraphs = iterNormalize(input_file, regions_bed, libraryFactor, lengthFactor, backend=backend)
+    if callback is not None:
+        for bedgraph in bedgraphs:
+            callback(bedgraph)
+        return None
 
     # Return a BedTool object
-    if lengthFactor:
-        return BedTool.from_dataframe(
-            intersect_df[["chrom", "start", "end", "normRate"]]
-        )
-    else:
-        return BedTool.from_dataframe(
-            intersect_df[["chrom", "start", "end", "normCount"]]
-        )
+    bedgraphs = list(bedgraphs)
+    with profiling.stage("normalization.to_bed"):
+        return BedTool.from_dataframe(pd.concat(bedgraphs) if bedgraphs else pd.DataFrame())
 
 
-def normalize_from_command_line(args):
+def normalize_from_command_line(args, callback=None):
     """Wrapper function for the command line function ``blockify normalize``
 
     Parameters
     ----------
     args: ``argparse.Namespace`` object
         Input from command line
+    callback: function, optional
+        Called with the bedGraph of each chromosome as soon as it is computed (see ``normalize``)
 
     Returns
     -------
-    bedgraph: BedTool
-        Normalized command line data in bedGraph format
+    bedgraph: BedTool or None
+        Normalized command line data in bedGraph format; None if callback is specified
     """
 
     input_file = BedTool(args.input)
@@ -112,8 +161,8 @@ def normalize_from_command_line(args):
         regions_bed = BedTool(args.regions)
     # otherwise, segment the file
     else:
-        region_segmentation = segmentation.segment(
-            input_file, args.method, p0=args.p0, prior=args.prior
-        )
+        region_segmentation = segmentation.segment_from_command_line(args)
         regions_bed = BedTool.from_dataframe(region_segmentation.df)
-    return normalize(input_file, regions_bed, args.libraryFactor, args.lengthFactor)
+    return normalize(
+        input_file, regions_bed, args.libraryFactor, args.lengthFactor, backend=args.backend, callback=callback
+    )
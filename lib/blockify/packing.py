@@ -0,0 +1,124 @@
+import os
+from . import profiling
+from . import readers
+
+# Converts sorted BED/qBED/CCF files into packed event stores: per-chromosome
+# arrays of start and end coordinates and values, plus a chromosome table.
+# Every subcommand memory-maps packed stores instead of parsing text, which
+# pays off for inputs used over and over, e.g. a reference background.
+# Only the first four columns (chrom, start, end, value) are kept.
+
+# Also precomputes count indexes (see ``readers.CountIndex``), stored
+# alongside a file, from which ``blockify call`` takes the library size
+# and the number of events in each region without reading the file.
+
+
+def pack(input_path, output_path, chunksize=readers.DEFAULT_CHUNKSIZE):
+    """Core packing method.
+
+    Parameters
+    ----------
+    input_path: str
+        Path to a sorted (optionally gzipped) BED/qBED/CCF file
+    output_path: str
+        Path to the packed event store to write
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    packed: PackedEvents
+        The packed event store, memory-mapped from output_path
+    """
+
+    assert not readers.isPacked(input_path), "input file is already packed"
+    # Values default to 1 if the file has no numeric fourth column (e.g. BED3 or BED6)
+    weighted = readers.hasValueColumn(input_path)
+    try:
+        with profiling.stage("packing.write"):
+            readers.writePacked(
+                readers.iterChromosomes(input_path, value=weighted, chunksize=chunksize),
+                output_path,
+                weighted,
+            )
+    except BaseException:
+        # Do not leave a partial store behind, e.g. if the input is unsorted
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    packed = readers.PackedEvents(output_path)
+    profiling.logger.info(
+        "Packed %d events on %d chromosomes", len(packed), len(packed.table),
+        extra={"events": len(packed), "chroms": len(packed.table)},
+    )
+    return packed
+
+
+def pack_from_command_line(args):
+    """Wrapper function for the command line function ``blockify pack``
+
+    Parameters
+    ----------
+    args: ``argparse.Namespace`` object
+        Input from command line
+
+    Returns
+    -------
+    packed: PackedEvents
+        The packed event store
+    """
+
+    return pack(args.input, args.output)
+
+
+def precount(input_path, chunksize=readers.DEFAULT_CHUNKSIZE):
+    """Core count indexing method; the index is written alongside the input (see ``readers.countIndexPath``).
+
+    Parameters
+    ----------
+    input_path: str
+        Path to a sorted (optionally gzipped) BED/qBED/CCF file, or to a packed event store
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    index: CountIndex
+        The count index, memory-mapped from alongside input_path
+    """
+
+    output_path = readers.countIndexPath(input_path)
+    # Write to a temporary file first, so that a partial index is never picked up
+    tmp = output_path + ".tmp"
+    try:
+        with profiling.stage("packing.precount"):
+            readers.writeCountIndex(readers.iterChromosomes(input_path, chunksize=chunksize), tmp, input_path)
+        os.replace(tmp, output_path)
+    except BaseException:
+        # Do not leave a partial index behind, e.g. if the input is unsorted
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    index = readers.CountIndex(output_path)
+    profiling.logger.info(
+        "Indexed %d events on %d chromosomes", len(index), len(index.table),
+        extra={"events": len(index), "chroms": len(index.table)},
+    )
+    return index
+
+
+def precount_from_command_line(args):
+    """Wrapper function for the command line function ``blockify precount``
+
+    Parameters
+    ----------
+    args: ``argparse.Namespace`` object
+        Input from command line
+
+    Returns
+    -------
+    index: CountIndex
+        The count index
+    """
+
+    return precount(args.input)
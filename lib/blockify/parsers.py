@@ -9,6 +9,10 @@ DEFAULT_NORMALIZATION_LENGTH_FACTOR = None
 DEFAULT_MULTIPLE_HYPOTHESIS_CORRECTION = "bonferroni"
 DEFAULT_PSEUDOCOUNT = 1
 DEFAULT_MEASUREMENT = "enrichment"
+DEFAULT_THREADS = 1
+DEFAULT_BACKEND = "native"
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_DOWNSAMPLING_ENGINE = "exponential"
 
 # Top-most parser
 blockify_parser = argparse.ArgumentParser(
@@ -36,6 +40,27 @@ input_parser.add_argument(
     required=True,
     help="Input file"
 )
+runtime_parser = argparse.ArgumentParser(
+    add_help=False,
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+runtime_parser.add_argument(
+    "--profile",
+    action="store_true",
+    default=False,
+    help="Print the time spent in each stage to stderr",
+)
+runtime_parser.add_argument(
+    "--timings-json",
+    required=False,
+    help="Write the time spent in each stage, and the number of events processed per chromosome, to a JSON file",
+)
+runtime_parser.add_argument(
+    "--quiet",
+    action="store_true",
+    default=False,
+    help="Do not report progress to stderr",
+)
 regions_parser = argparse.ArgumentParser(
     add_help=False,
     formatter_class=argparse.ArgumentDefaultsHelpFormatter,
@@ -46,22 +71,17 @@ regions_parser.add_argument(
     required=False,
     help="Regions over which to normalize event counts; should be supplied as a BED file. If not provided, the input file will be segmented using Bayesian blocks.",
 )
-
-# Segmentation sub-command
-segment = subcommands.add_parser(
-    name="segment",
-    description="Segment a BED/qBED file using Bayesian blocks",
-    help="Segment a BED/qBED file using Bayesian blocks",
-    parents=[input_parser],
+regions_parser.add_argument(
+    "--backend",
+    choices=["native", "bedtools"],
+    default=DEFAULT_BACKEND,
+    help="Count events per region natively or with bedtools intersect (default: %(default)s)",
 )
-segment.add_argument(
-    "-o",
-    "--output",
-    required=False,
-    default=sys.stdout,
-    help="Output file (BED format); default: stdout"
+segmentation_parser = argparse.ArgumentParser(
+    add_help=False,
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
 )
-prior_group = segment.add_mutually_exclusive_group(
+prior_group = segmentation_parser.add_mutually_exclusive_group(
     required=False
 )
 prior_group.add_argument(
@@ -76,12 +96,56 @@ prior_group.add_argument(
 # prior_group.add_argument("--gamma",
 #                          type=float,
 #                          help="False positive rate of default prior rate")
-segment.add_argument(
+segmentation_parser.add_argument(
     "--method",
     choices=["OP", "PELT"],
     default="PELT",
     help="Segment using the optimal partitioning (OP) or pruned exact linear time (PELT) algorithm (default: %(default)s)",
 )
+segmentation_parser.add_argument(
+    "--threads",
+    type=int,
+    default=DEFAULT_THREADS,
+    help="Number of processes used to segment chromosomes in parallel (default: %(default)s)",
+)
+segmentation_parser.add_argument(
+    "--weighted",
+    action="store_true",
+    default=False,
+    help="Weight each event by the value (fourth) column of the qBED file, e.g. the number of reads supporting an insertion",
+)
+segmentation_parser.add_argument(
+    "--genome-wide",
+    action="store_true",
+    default=False,
+    help="Segment all chromosomes in a single pass, with one prior for the whole genome rather than one per chromosome",
+)
+segmentation_parser.add_argument(
+    "--cache-dir",
+    required=False,
+    help="Directory in which to cache segmentations, keyed by the content of the input file and the segmentation parameters",
+)
+segmentation_parser.add_argument(
+    "--cache-size",
+    type=float,
+    default=DEFAULT_CACHE_SIZE,
+    help="Maximum size of the segmentation cache (MB); least recently used entries are evicted first (default: %(default)s)",
+)
+
+# Segmentation sub-command
+segment = subcommands.add_parser(
+    name="segment",
+    description="Segment a BED/qBED file using Bayesian blocks",
+    help="Segment a BED/qBED file using Bayesian blocks",
+    parents=[input_parser, runtime_parser, segmentation_parser],
+)
+segment.add_argument(
+    "-o",
+    "--output",
+    required=False,
+    default=sys.stdout,
+    help="Output file (BED format); default: stdout"
+)
 # segment.add_argument("-t",
 #                      "--time",
 #                      action="store_true",
@@ -123,8 +187,13 @@ annotate = subcommands.add_parser(
     name="call",
     description="Call peaks in a qBED file",
     help="Call peaks in a qBED file",
-    parents=[segment, regions_parser],
-    conflict_handler="resolve",
+    parents=[runtime_parser, segmentation_parser, regions_parser],
+)
+annotate.add_argument(
+    "output",
+    nargs="?",
+    default=sys.stdout,
+    help="Output file (BED format); default: stdout"
 )
 annotate.add_argument(
     "-bg",
@@ -133,6 +202,26 @@ annotate.add_argument(
     help="Background qBED file",
     required=True
 )
+# Peaks are called for either a single input or a manifest of inputs
+input_group = annotate.add_mutually_exclusive_group(
+    required=True
+)
+input_group.add_argument(
+    "-i",
+    "--input",
+    help="Input file"
+)
+input_group.add_argument(
+    "--inputs",
+    type=str,
+    help="Instead of --input, call peaks for every sample of this manifest (TSV: name, input file and, optionally, regions file) against the shared background, writing one peak file per sample to --outdir; --threads samples are called in parallel",
+)
+annotate.add_argument(
+    "--outdir",
+    type=str,
+    default=".",
+    help="With --inputs, directory in which the peaks of each sample are written, to NAME.bed (default: %(default)s)",
+)
 annotate.add_argument(
     "--intermediate",
     type=str,
@@ -212,12 +301,35 @@ annotate.add_argument(
     help="Perform a one-tailed test for either enrichment or depletion relative to the background file (default: %(default)s)",
 )
 
+# Penalty sweep options; these are added after normalize has copied the
+# arguments of segment, so they only apply to segment
+grid_group = segment.add_mutually_exclusive_group(
+    required=False
+)
+grid_group.add_argument(
+    "--p0-grid",
+    type=float,
+    nargs="+",
+    help="Segment for each of these p0 values in a single pass, and write the number of blocks and fitness for each to the output file",
+)
+grid_group.add_argument(
+    "--prior-grid",
+    type=float,
+    nargs="+",
+    help="Segment for each of these explicit priors in a single pass, and write the number of blocks and fitness for each to the output file",
+)
+segment.add_argument(
+    "--grid-prefix",
+    required=False,
+    help="With --p0-grid or --prior-grid, also write the blocks for each value to PREFIX.p0_VALUE.bed (or PREFIX.prior_VALUE.bed)",
+)
+
 # Downsample sub-command
 downsample = subcommands.add_parser(
     name="downsample",
     description="Downsample a qBED file in proportion to the value column",
     help="Downsample a qBED file in proportion to the value column",
-    parents=[input_parser],
+    parents=[input_parser, runtime_parser],
 )
 downsample.add_argument(
     "-n",
@@ -237,6 +349,12 @@ downsample.add_argument(
     action="store_true",
     help="Sample every row with equal likelihood"
 )
+downsample.add_argument(
+    "--engine",
+    choices=["exponential", "legacy"],
+    default=DEFAULT_DOWNSAMPLING_ENGINE,
+    help="Sample in a single streaming pass with exponential keys (Efraimidis-Spirakis), or load the whole file and use numpy.random.choice as earlier versions did (default: %(default)s)",
+)
 downsample.add_argument(
     "-o",
     "--output",
@@ -244,3 +362,26 @@ downsample.add_argument(
     default=sys.stdout,
     help="Output file (BED/qBED format); default: stdout"
 )
+
+# Pack sub-command
+pack = subcommands.add_parser(
+    name="pack",
+    aliases=["index"],
+    description="Convert a sorted BED/qBED/CCF file into a packed, memory-mapped event store that every other subcommand accepts as input",
+    help="Convert a sorted BED/qBED/CCF file into a packed event store",
+    parents=[input_parser, runtime_parser],
+)
+pack.add_argument(
+    "-o",
+    "--output",
+    required=True,
+    help="Output file (packed event store)"
+)
+
+# Count index sub-command
+precount = subcommands.add_parser(
+    name="precount",
+    description="Precompute a cumulative-count index of a sorted BED/qBED/CCF file (e.g. a background), stored alongside it as INPUT.bci; blockify call then takes the library size and the number of events in each region from the index instead of reading the file",
+    help="Precompute a cumulative-count index of a sorted BED/qBED/CCF file",
+    parents=[input_parser, runtime_parser],
+)
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import logging
+import sys
+import time
+
+# Lightweight instrumentation for blockify. Code paths mark named stages
+# with ``stage`` and report the number of events processed per chromosome
+# with ``count``; both are no-ops unless a profile has been activated with
+# ``profiled``. Progress messages are emitted through the "blockify"
+# logger, so they are only shown if logging has been configured (as the
+# command line interface does, unless --quiet is given).
+
+# Logger for structured progress messages
+logger = logging.getLogger("blockify")
+
+# Stack of active profiles; stages are recorded into each of them
+_ACTIVE = []
+
+
+class Profile(object):
+    """A class to store the timings of named stages and the number of events processed per chromosome."""
+
+    def __init__(self):
+        # Cumulative wall time (seconds) spent in each stage, keyed by stage name
+        self.timings = OrderedDict()
+        # Number of times each stage was entered, keyed by stage name
+        self.calls = OrderedDict()
+        # Number of events processed per chromosome, keyed by stage name and then chromosome
+        self.events = OrderedDict()
+        # Wall time (seconds) of the whole profiled block
+        self.total = 0
+
+    def add(self, name, seconds):
+        """Add the wall time of one call of a stage."""
+        self.timings[name] = self.timings.get(name, 0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, chrom, n):
+        """Add the number of events processed on a chromosome during a stage."""
+        events = self.events.setdefault(name, OrderedDict())
+        events[chrom] = events.get(chrom, 0) + int(n)
+
+    def toDict(self):
+        """Convert the profile to a JSON-serializable dict.
+
+        Returns
+        -------
+        profile: dict
+        """
+
+        return {
+            "total": self.total,
+            "stages": [
+                {"name": name, "calls": self.calls[name], "seconds": seconds}
+                for name, seconds in self.timings.items()
+            ],
+            "events": self.events,
+        }
+
+    def save(self, path):
+        """Write the profile to a JSON file.
+
+        Parameters
+        ----------
+        path: str
+            Output filename
+        """
+
+        with open(path, "w") as f:
+            json.dump(self.toDict(), f, indent=2)
+
+    def report(self, file=sys.stderr):
+        """Print a human-readable summary of the profile.
+
+        Parameters
+        ----------
+        file: file object
+            Where to print the summary; default: stderr
+        """
+
+        print("{:<40}{:>8}{:>12}{:>8}".format("stage", "calls", "seconds", "%"), file=file)
+        for name, seconds in self.timings.items():
+            print(
+                "{:<40}{:>8}{:>12.4f}{:>8.1f}".format(
+                    name, self.calls[name], seconds, 100 * seconds / self.total if self.total else 0
+                ),
+                file=file,
+            )
+        print("{:<40}{:>8}{:>12.4f}".format("total", "", self.total), file=file)
+        for name, events in self.events.items():
+            n = sum(events.values())
+            seconds = self.timings.get(name, 0)
+            print(
+                "{}: {} events on {} chromosomes ({:.0f} events/s)".format(
+                    name, n, len(events), n / seconds if seconds else float("inf")
+                ),
+                file=file,
+            )
+
+
+@contextmanager
+def profiled():
+    """Collect timings of every stage run within a ``with`` block.
+
+    Returns
+    -------
+    profile: Profile
+        Profile of the block; complete once the block exits
+    """
+
+    profile = Profile()
+    _ACTIVE.append(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.total = time.perf_counter() - start
+        _ACTIVE.remove(profile)
+
+
+@contextmanager
+def stage(name):
+    """Time a named stage, if a profile is active.
+
+    Parameters
+    ----------
+    name: str
+        Name of the stage, e.g. ``"segmentation.validate"``
+    """
+
+    if not _ACTIVE:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for profile in _ACTIVE:
+            profile.add(name, elapsed)
+
+
+def count(name, chrom, n):
+    """Record the number of events processed on a chromosome, if a profile is active.
+
+    Parameters
+    ----------
+    name: str
+        Name of the stage
+    chrom: str
+        Chromosome
+    n: int
+        Number of events
+    """
+
+    for profile in _ACTIVE:
+        profile.count(name, chrom, n)
@@ -0,0 +1,741 @@
+from collections import namedtuple, OrderedDict
+import functools
+import gzip
+import json
+import numpy as np
+import os
+import pandas as pd
+import struct
+
+# Streaming readers for sorted BED-like files (BED, qBED, CCF).
+# Files are parsed in chunks and returned one chromosome at a time
+# as NumPy arrays, so callers never hold more than one chromosome
+# (plus one chunk) of parsed text in memory. Sortedness is checked
+# while reading, so no separate validation pass is required.
+
+# Files packed with ``blockify pack`` are read through memory maps
+# instead (see ``PackedEvents``), so no parsing is needed at all.
+# Likewise, the count index that ``blockify precount`` stores alongside
+# a file (see ``CountIndex``) gives the number of events overlapping any
+# region without reading the file itself.
+
+# Number of rows parsed per chunk
+DEFAULT_CHUNKSIZE = 2 ** 20
+
+# Number of bytes read at a time while counting records
+COUNT_BLOCKSIZE = 2 ** 20
+
+# Lines starting with these are headers rather than records
+HEADER_PREFIXES = (b"#", b"track", b"browser")
+
+# First two bytes of a gzip stream
+GZIP_MAGIC = b"\x1f\x8b"
+
+# First eight bytes of a packed event store
+PACKED_MAGIC = b"BLKPACK\x01"
+
+# Version of the packed format
+PACKED_VERSION = 1
+
+# Arrays in a packed event store start at multiples of this many bytes
+PACKED_ALIGNMENT = 8
+
+# Last sixteen bytes of a packed event store: offset and length of its chromosome table
+PACKED_TRAILER = struct.Struct("<QQ")
+
+# First eight bytes of a count index
+COUNT_INDEX_MAGIC = b"BLKCIDX\x01"
+
+# Version of the count index format
+COUNT_INDEX_VERSION = 1
+
+# Count indexes are stored alongside the file they index, with this extension appended to its name
+COUNT_INDEX_EXTENSION = ".bci"
+
+# Coordinates are stored as int32 if they are all below this bound, so that
+# the sum of a start and an end (see ``readCoordinates``) cannot overflow
+INT32_BOUND = 2 ** 30
+
+# One chromosome's worth of records
+ChromosomeEvents = namedtuple("ChromosomeEvents", ["chrom", "start", "end", "value"])
+
+
+def isGzipped(path):
+    """Tests whether a file is gzip-compressed by checking its magic number.
+
+    Parameters
+    ----------
+    path: str
+        Path to file
+
+    Returns
+    -------
+    is_gzipped: bool
+    """
+
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def isPacked(path):
+    """Tests whether a file is a packed event store by checking its magic number.
+
+    Parameters
+    ----------
+    path: str
+        Path to file
+
+    Returns
+    -------
+    is_packed: bool
+    """
+
+    with open(path, "rb") as f:
+        return f.read(len(PACKED_MAGIC)) == PACKED_MAGIC
+
+
+def hasValueColumn(path):
+    """Tests whether the first record of a BED-like file has a numeric fourth (value) column.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed
+
+    Returns
+    -------
+    has_value: bool
+    """
+
+    for chunk in pd.read_csv(
+        path,
+        sep="\t",
+        header=None,
+        comment="#",
+        skiprows=countHeaderLines(path),
+        compression="gzip" if isGzipped(path) else None,
+        nrows=1,
+        chunksize=1,
+    ):
+        return chunk.shape[1] >= 4 and pd.api.types.is_numeric_dtype(chunk[3])
+    return False
+
+
+class PackedEvents(object):
+    """A memory-mapped event store written by ``writePacked``.
+
+    The store holds, for each chromosome, int32 or int64 arrays of start and
+    end coordinates and a float64 array of values (weights), followed by a
+    JSON table of chromosomes and the byte offsets of their arrays. Arrays
+    are views of the memory-mapped file, so nothing is copied on loading.
+    """
+
+    def __init__(self, path):
+        # Path to the store
+        self.path = path
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        assert bytes(data[:len(PACKED_MAGIC)]) == PACKED_MAGIC, "{} is not a packed event store".format(path)
+        offset, length = PACKED_TRAILER.unpack(bytes(data[-PACKED_TRAILER.size:]))
+        table = json.loads(bytes(data[offset:offset + length]).decode())
+        assert table["version"] == PACKED_VERSION, "{} was packed with an unsupported version".format(path)
+        self._data = data
+        # Whether values were read from the input, or set to 1
+        self.weighted = table["weighted"]
+        # Chromosome table: name, number of events, coordinate dtype, and byte offset of each chromosome
+        self.table = table["chroms"]
+
+    def __len__(self):
+        return sum(entry["n"] for entry in self.table)
+
+    @property
+    def chroms(self):
+        return [entry["chrom"] for entry in self.table]
+
+    def chromosome(self, entry, value=True):
+        """Memory-mapped arrays of one chromosome.
+
+        Parameters
+        ----------
+        entry: dict
+            Entry of the chromosome table
+        value: bool
+            Whether to also return the value array
+
+        Returns
+        -------
+        events: ChromosomeEvents
+        """
+
+        n = entry["n"]
+        dtype = np.dtype(entry["dtype"])
+        start = entry["offset"]
+        end = start + n * dtype.itemsize
+        values = end + n * dtype.itemsize
+        return ChromosomeEvents(
+            entry["chrom"],
+            self._data[start:end].view(dtype),
+            self._data[end:values].view(dtype),
+            self._data[values:values + n * 8].view(np.float64) if value else None,
+        )
+
+    def iterChromosomes(self, value=False):
+        """Iterate over the chromosomes of the store, in sorted order.
+
+        Parameters
+        ----------
+        value: bool
+            Whether to also return the value arrays
+
+        Returns
+        -------
+        chromosomes: iterator of ChromosomeEvents
+        """
+
+        for entry in self.table:
+            yield self.chromosome(entry, value=value)
+
+    def toDataFrame(self):
+        """Copy the store into a ``pandas`` DataFrame with columns 0 to 3 (chrom, start, end, value), as if read with ``pd.read_table(path, header=None)``.
+
+        Returns
+        -------
+        df: ``pandas`` DataFrame
+        """
+
+        chromosomes = list(self.iterChromosomes(value=True))
+        if not chromosomes:
+            return pd.DataFrame({0: [], 1: [], 2: [], 3: []})
+        # Integer values (e.g. read counts) are returned as integers
+        values = np.concatenate([_.value for _ in chromosomes])
+        return pd.DataFrame(
+            {
+                0: pd.Categorical.from_codes(
+                    np.repeat(np.arange(len(chromosomes)), [len(_.start) for _ in chromosomes]),
+                    categories=[_.chrom for _ in chromosomes],
+                ).astype(str),
+                1: np.concatenate([_.start for _ in chromosomes]).astype(np.int64),
+                2: np.concatenate([_.end for _ in chromosomes]).astype(np.int64),
+                3: values.astype(np.int64) if np.array_equal(values, np.round(values)) else values,
+            }
+        )
+
+
+def writePacked(chromosomes, path, weighted):
+    """Write chromosomes of events to a packed event store (see ``PackedEvents``).
+
+    Parameters
+    ----------
+    chromosomes: iterator of ChromosomeEvents
+        Events of each chromosome, in sorted order; values may be None, in which case they are set to 1
+    path: str
+        Output filename
+    weighted: bool
+        Whether the values were read from the input
+
+    Returns
+    -------
+    None: None
+    """
+
+    table = []
+    with open(path, "wb") as f:
+        f.write(PACKED_MAGIC)
+        for events in chromosomes:
+            n = len(events.start)
+            # Use 32-bit coordinates whenever they fit
+            small = n == 0 or (events.start.min() >= 0 and events.end.max() < INT32_BOUND)
+            dtype = np.dtype(np.int32 if small else np.int64).newbyteorder("<")
+            f.write(b"\0" * (-f.tell() % PACKED_ALIGNMENT))
+            table.append({"chrom": str(events.chrom), "n": n, "dtype": dtype.str, "offset": f.tell()})
+            f.write(np.ascontiguousarray(events.start, dtype=dtype).tobytes())
+            f.write(np.ascontiguousarray(events.end, dtype=dtype).tobytes())
+            values = np.ones(n) if events.value is None else events.value
+            f.write(np.ascontiguousarray(values, dtype="<f8").tobytes())
+        f.write(b"\0" * (-f.tell() % PACKED_ALIGNMENT))
+        offset = f.tell()
+        blob = json.dumps({"version": PACKED_VERSION, "weighted": bool(weighted), "chroms": table}).encode()
+        f.write(blob)
+        f.write(PACKED_TRAILER.pack(offset, len(blob)))
+
+
+def countIndexPath(path):
+    """Path of the count index stored alongside a file."""
+    return path + COUNT_INDEX_EXTENSION
+
+
+def sourceStamp(path):
+    """Size and modification time of a file, recorded in its count index to tell whether the index is up to date."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class CountIndex(object):
+    """A memory-mapped cumulative-count index written by ``writeCountIndex``.
+
+    For each chromosome, the index holds the distinct start coordinates of
+    events with the number of events starting before each, and likewise for
+    end coordinates (zero-length events end one base after they start),
+    followed by a JSON table of chromosomes and the byte offsets of their
+    arrays. The number of events overlapping a region then follows from one
+    binary search in each of the start and end arrays.
+    """
+
+    def __init__(self, path):
+        # Path to the index
+        self.path = path
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        assert bytes(data[:len(COUNT_INDEX_MAGIC)]) == COUNT_INDEX_MAGIC, "{} is not a count index".format(path)
+        offset, length = PACKED_TRAILER.unpack(bytes(data[-PACKED_TRAILER.size:]))
+        table = json.loads(bytes(data[offset:offset + length]).decode())
+        assert table["version"] == COUNT_INDEX_VERSION, "{} was written with an unsupported version".format(path)
+        self._data = data
+        # Total number of events
+        self.total = table["total"]
+        # Size and modification time of the indexed file when the index was written
+        self.source = table["source"]
+        # Chromosome table, keyed by chromosome: numbers of distinct starts and ends, coordinate dtype, and byte offset
+        self.table = OrderedDict((entry["chrom"], entry) for entry in table["chroms"])
+
+    def __len__(self):
+        return self.total
+
+    def chromosome(self, chrom):
+        """Memory-mapped arrays of one chromosome.
+
+        Parameters
+        ----------
+        chrom: str
+            Chromosome name
+
+        Returns
+        -------
+        arrays: tuple or None
+            Distinct start coordinates, numbers of events starting before each start coordinate (and, last, in total),
+            distinct end coordinates, and numbers of events ending before each end coordinate (and, last, in total);
+            None if there are no events on chrom
+        """
+
+        entry = self.table.get(chrom)
+        if entry is None:
+            return None
+        dtype = np.dtype(entry["dtype"])
+        arrays = []
+        offset = entry["offset"]
+        for n in (entry["starts"], entry["ends"]):
+            coordinates = self._data[offset:offset + n * dtype.itemsize].view(dtype)
+            offset += n * dtype.itemsize
+            offset += -offset % PACKED_ALIGNMENT
+            counts = self._data[offset:offset + (n + 1) * 8].view("<i8")
+            offset += (n + 1) * 8
+            arrays += [coordinates, counts]
+        return tuple(arrays)
+
+
+def writeCountIndex(chromosomes, path, source):
+    """Write the cumulative-count index of chromosomes of events (see ``CountIndex``).
+
+    Parameters
+    ----------
+    chromosomes: iterator of ChromosomeEvents
+        Events of each chromosome, in sorted order
+    path: str
+        Output filename
+    source: str
+        Path to the indexed file
+
+    Returns
+    -------
+    None: None
+    """
+
+    table = []
+    total = 0
+    with open(path, "wb") as f:
+        f.write(COUNT_INDEX_MAGIC)
+        for events in chromosomes:
+            total += len(events.start)
+            # Zero-length events cover one base
+            ends = np.where(events.end == events.start, events.end + 1, events.end)
+            starts, start_counts = np.unique(events.start, return_counts=True)
+            ends, end_counts = np.unique(ends, return_counts=True)
+            # Use 32-bit coordinates whenever they fit
+            small = len(starts) == 0 or (starts[0] >= 0 and ends[-1] < INT32_BOUND)
+            dtype = np.dtype(np.int32 if small else np.int64).newbyteorder("<")
+            f.write(b"\0" * (-f.tell() % PACKED_ALIGNMENT))
+            table.append({"chrom": str(events.chrom), "starts": len(starts), "ends": len(ends), "dtype": dtype.str, "offset": f.tell()})
+            for coordinates, counts in ((starts, start_counts), (ends, end_counts)):
+                f.write(np.ascontiguousarray(coordinates, dtype=dtype).tobytes())
+                f.write(b"\0" * (-f.tell() % PACKED_ALIGNMENT))
+                f.write(np.concatenate([[0], np.cumsum(counts)]).astype("<i8").tobytes())
+        f.write(b"\0" * (-f.tell() % PACKED_ALIGNMENT))
+        offset = f.tell()
+        blob = json.dumps(
+            {"version": COUNT_INDEX_VERSION, "total": int(total), "source": sourceStamp(source), "chroms": table}
+        ).encode()
+        f.write(blob)
+        f.write(PACKED_TRAILER.pack(offset, len(blob)))
+
+
+def findCountIndex(path):
+    """Open the count index stored alongside a file, if there is one and the file has not changed since it was written.
+
+    Parameters
+    ----------
+    path: str
+        Path to an indexed file
+
+    Returns
+    -------
+    index: CountIndex or None
+    """
+
+    index_path = countIndexPath(path)
+    if not os.path.isfile(index_path):
+        return None
+    try:
+        index = CountIndex(index_path)
+    except (AssertionError, ValueError, KeyError, struct.error):
+        # Indexes that cannot be read are ignored, like missing ones
+        return None
+    if index.source != sourceStamp(path):
+        return None
+    return index
+
+
+def iterChunks(path, value=False, chunksize=DEFAULT_CHUNKSIZE):
+    """Parse the first three (or four) columns of a BED-like file in chunks, skipping its header lines.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed
+    value: bool
+        Whether to also parse the fourth (value) column
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    chunks: iterator of ``pandas`` DataFrames
+        DataFrames with columns ``chrom``, ``start``, ``end`` (and ``value``)
+    """
+
+    names = ["chrom", "start", "end", "value"] if value else ["chrom", "start", "end"]
+    dtype = {"chrom": str, "start": np.int64, "end": np.int64, "value": np.float64}
+    return pd.read_csv(
+        path,
+        sep="\t",
+        header=None,
+        names=names,
+        usecols=range(len(names)),
+        dtype={name: dtype[name] for name in names},
+        comment="#",
+        # UCSC track and browser lines may only come before the first record
+        skiprows=countHeaderLines(path),
+        compression="gzip" if isGzipped(path) else None,
+        chunksize=chunksize,
+    )
+
+
+def iterChromosomes(path, value=False, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream a sorted BED-like file one chromosome at a time.
+
+    Raises an ``AssertionError`` as soon as the file is found to be unsorted, i.e. if chromosomes are not in lexicographic order or start coordinates decrease within a chromosome. Packed event stores are memory-mapped instead of parsed; they are sorted by construction.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed, or to a packed event store
+    value: bool
+        Whether to also return the fourth (value) column
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    chromosomes: iterator of ChromosomeEvents
+        Start, end (and value) arrays for each chromosome, in file order
+    """
+
+    if isPacked(path):
+        yield from PackedEvents(path).iterChromosomes(value=value)
+        return
+    # Pieces of the chromosome that is still being read
+    chrom = None
+    pending = []
+    for chunk in iterChunks(path, value=value, chunksize=chunksize):
+        if chunk.empty:
+            continue
+        chroms = chunk["chrom"].values
+        starts = chunk["start"].values
+        ends = chunk["end"].values
+        values = chunk["value"].values if value else None
+        # Indexes at which a new chromosome begins within this chunk
+        breaks = np.flatnonzero(chroms[1:] != chroms[:-1]) + 1
+        # Start coordinates must not decrease within a chromosome
+        decreasing = np.flatnonzero(starts[1:] < starts[:-1]) + 1
+        assert np.isin(decreasing, breaks).all(), "{} must be sorted".format(path)
+
+        for i, j in zip(np.concatenate([[0], breaks]), np.concatenate([breaks, [len(chunk)]])):
+            if chroms[i] == chrom:
+                # The chromosome continues from the previous chunk
+                assert pending[-1][0][-1] <= starts[i], "{} must be sorted".format(path)
+            else:
+                # Chromosomes must be in sorted order
+                if chrom is not None:
+                    assert chroms[i] > chrom, "{} must be sorted".format(path)
+                    yield mergePieces(chrom, pending, value)
+                chrom = chroms[i]
+                pending = []
+            pending.append((starts[i:j], ends[i:j], values[i:j] if value else None))
+    if chrom is not None:
+        yield mergePieces(chrom, pending, value)
+
+
+def mergePieces(chrom, pieces, value):
+    """Concatenate the chunked pieces of a single chromosome.
+
+    Parameters
+    ----------
+    chrom: str
+        Chromosome name
+    pieces: list of tuples
+        (start, end, value) arrays for each chunk of the chromosome
+    value: bool
+        Whether value arrays are present
+
+    Returns
+    -------
+    events: ChromosomeEvents
+    """
+
+    if len(pieces) == 1:
+        start, end, values = pieces[0]
+    else:
+        start = np.concatenate([_[0] for _ in pieces])
+        end = np.concatenate([_[1] for _ in pieces])
+        values = np.concatenate([_[2] for _ in pieces]) if value else None
+    return ChromosomeEvents(chrom, start, end, values)
+
+
+def readCoordinates(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Read event coordinates, keyed by chromosome, from a sorted BED-like file.
+
+    As in ``segmentation.segment``, the coordinate of each event is the floor of the mean of its start and end.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    coordinates: OrderedDict
+        Arrays of event coordinates, keyed by chromosome in file order
+    """
+
+    coordinates = OrderedDict()
+    for events in iterChromosomes(path, chunksize=chunksize):
+        coordinates[events.chrom] = (events.start + events.end) // 2
+    return coordinates
+
+
+def readWeightedCoordinates(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Read event coordinates and weights, keyed by chromosome, from a sorted qBED file.
+
+    The weight of each event is the value (fourth) column of the file, e.g. the number of reads supporting an insertion.
+
+    Parameters
+    ----------
+    path: str
+        Path to qBED data file, optionally gzip-compressed
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    coordinates: OrderedDict
+        Arrays of event coordinates, keyed by chromosome in file order
+    weights: OrderedDict
+        Arrays of event weights, keyed by chromosome in file order
+    """
+
+    coordinates = OrderedDict()
+    weights = OrderedDict()
+    for events in iterChromosomes(path, value=True, chunksize=chunksize):
+        coordinates[events.chrom] = (events.start + events.end) // 2
+        weights[events.chrom] = events.value
+    return coordinates, weights
+
+
+def isSortedFile(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Tests whether a BED-like file is sorted, in a single streaming pass.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    is_sorted: bool
+    """
+
+    try:
+        for _ in iterChromosomes(path, chunksize=chunksize):
+            pass
+    except AssertionError:
+        return False
+    return True
+
+
+def skipHeaderLines(f):
+    """Read past the header (``track``, ``browser``), comment and blank lines at the top of a BED-like file.
+
+    Parameters
+    ----------
+    f: file object
+        File opened in binary mode, at its beginning
+
+    Returns
+    -------
+    skipped: int
+        Number of lines skipped
+    line: bytes
+        First line that is not skipped; empty at the end of the file
+    """
+
+    skipped = 0
+    line = f.readline()
+    while line and (line.startswith(HEADER_PREFIXES) or not line.strip()):
+        skipped += 1
+        line = f.readline()
+    return skipped, line
+
+
+def countHeaderLines(path):
+    """Count the header (``track``, ``browser``), comment and blank lines at the top of a BED-like file.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed
+
+    Returns
+    -------
+    skipped: int
+        Number of lines to skip before the first record
+    """
+
+    with (gzip.open if isGzipped(path) else open)(path, "rb") as f:
+        skipped, _ = skipHeaderLines(f)
+    return skipped
+
+
+def countRecords(path, blocksize=COUNT_BLOCKSIZE):
+    """Count the records of a BED-like file, reading it in blocks rather than parsing it.
+
+    Leading header (``track``, ``browser``) lines, comment lines starting with "#", and blank lines are not records.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed
+    blocksize: int
+        Number of bytes read at a time
+
+    Returns
+    -------
+    n: int
+        Number of records
+    """
+
+    with (gzip.open if isGzipped(path) else open)(path, "rb") as f:
+        # Skip the header lines that precede the records
+        _, line = skipHeaderLines(f)
+        if not line:
+            return 0
+        # Count the lines whose first byte is neither a newline nor "#"
+        records = 1
+        line_start = line.endswith(b"\n")
+        for block in iter(lambda: f.read(blocksize), b""):
+            data = np.frombuffer(block, dtype=np.uint8)
+            first = data[np.flatnonzero(data[:-1] == ord("\n")) + 1]
+            if line_start:
+                first = np.concatenate([data[:1], first])
+            records += np.count_nonzero((first != ord("\n")) & (first != ord("\r")) & (first != ord("#")))
+            line_start = data[-1] == ord("\n")
+    return records
+
+
+def sumValues(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Sum the value (fourth) column of a BED-like file, e.g. the total number of reads of a qBED file.
+
+    Parameters
+    ----------
+    path: str
+        Path to qBED data file, optionally gzip-compressed
+    chunksize: int
+        Number of rows parsed per chunk
+
+    Returns
+    -------
+    total: float
+    """
+
+    chunks = pd.read_csv(
+        path,
+        sep="\t",
+        header=None,
+        usecols=[3],
+        dtype={3: np.float64},
+        comment="#",
+        skiprows=countHeaderLines(path),
+        compression="gzip" if isGzipped(path) else None,
+        chunksize=chunksize,
+    )
+    return float(sum(chunk[3].sum() for chunk in chunks))
+
+
+def librarySize(path, weighted=False):
+    """Library size of a BED-like file: its number of events, or the sum of their values.
+
+    Results are cached for as long as the file does not change, so that every
+    subcommand can ask for them freely. Packed event stores and files with a
+    count index are not read at all.
+
+    Parameters
+    ----------
+    path: str
+        Path to BED/qBED/CCF data file, optionally gzip-compressed, or to a packed event store
+    weighted: bool
+        Whether to sum the values (fourth column) of events rather than count them
+
+    Returns
+    -------
+    size: int or float
+        Number of events, or sum of their values if weighted
+    """
+
+    size, mtime = sourceStamp(path)
+    return cachedLibrarySize(os.path.abspath(path), size, mtime, bool(weighted))
+
+
+@functools.lru_cache(maxsize=None)
+def cachedLibrarySize(path, size, mtime, weighted):
+    """Library size of a file, cached by path, size and modification time (see ``librarySize``)."""
+    if isPacked(path):
+        packed = PackedEvents(path)
+        if weighted:
+            return float(sum(events.value.sum() for events in packed.iterChromosomes(value=True)))
+        return len(packed)
+    if weighted:
+        return sumValues(path)
+    index = findCountIndex(path)
+    if index is not None:
+        return len(index)
+    return countRecords(path)
@@ -1,16 +1,28 @@
 from . import algorithms
-from io import StringIO
+from . import cache as caching
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 from pybedtools import BedTool
-import sys
+from . import profiling
+from . import readers
 from . import utilities
+from . import writers
 import warnings
 
 # Suppress certain warnings
 warnings.simplefilter("ignore", category=FutureWarning)
 warnings.simplefilter("ignore", category=ResourceWarning)
 
+# Consecutive chromosomes with fewer events than SMALL_CHROMOSOME_EVENTS
+# are segmented together, in batches of up to about BATCH_EVENTS events, so
+# that assemblies with thousands of tiny contigs do not pay the overhead of
+# a separate pass (and output write) for every contig. Larger chromosomes
+# are segmented, and streamed, on their own.
+SMALL_CHROMOSOME_EVENTS = 2 ** 8
+BATCH_EVENTS = 2 ** 16
+
 
 class SegmentationRecord(object):
     """A class to store a single Bayesian block genomic segmentation."""
@@ -27,47 +39,191 @@ class SegmentationRecord(object):
         # dict to store fitness values from segmentation of each chromosome
         self.fitness = {}
         # The actual segmentation itself, stored as a pandas DataFrame
+        # with a categorical chromosome column and int64 start and end columns
         self.df = pd.DataFrame()
-        # The segmentation as a BedTool object
-        self.blocks = None
+        # The segmentation as a BedTool object, built on first use (see ``blocks``)
+        self._blocks = None
         # total_priors is sum of values in priors
         self.total_priors = 0
         # total_blocks is sum of values in nblocks
         self.total_blocks = 0
         # total_fitness is sum of values in fitness
         self.total_fitness = 0
+        # dicts to store the number of cells of each chromosome, before and
+        # after merging runs of equal density (see ``Algorithm.segment``)
+        self.cells = {}
+        self.compressed_cells = {}
+        # Ratio of the total number of cells before and after merging
+        self.compression_ratio = 1.0
+        # Block boundaries of each chromosome, pending conversion into df
+        self._boundaries = OrderedDict()
+
+    def addChromosome(self, chrom, block_boundaries, prior, fitness, cells=None):
+        """Store the segmentation of a single chromosome.
+
+        Parameters
+        ----------
+        chrom: str
+            String specifying the chromosome
+        block_boundaries: array
+            Array whose entries specify the coordinates of block boundaries
+        prior: float
+            Prior used for the segmentation
+        fitness: float
+            Fitness of the segmentation
+        cells: tuple, optional
+            Number of cells before and after merging runs of equal density
+        """
+
+        if cells is not None:
+            self.cells[chrom], self.compressed_cells[chrom] = cells
+        self.priors[chrom] = prior
+        self.fitness[chrom] = fitness
+        self._boundaries[chrom] = np.asarray(block_boundaries).astype(np.int64)
+        self.nblocks[chrom] = len(block_boundaries) - 1
 
     def finalize(self):
         """Store post hoc summary statistics of the segmentation."""
         self.total_priors = np.sum(list(self.priors.values()))
         self.total_blocks = np.sum(list(self.nblocks.values()))
         self.total_fitness = np.sum(list(self.fitness.values()))
-        self.blocks = BedTool.from_dataframe(self.df)
+        total_compressed_cells = np.sum(list(self.compressed_cells.values()))
+        if total_compressed_cells > 0:
+            self.compression_ratio = np.sum(list(self.cells.values())) / total_compressed_cells
+        # Build the block table once, from every chromosome's boundaries
+        if self._boundaries:
+            self.df = boundariesToDF(self._boundaries)
+            self._boundaries = OrderedDict()
+        self._blocks = None
+
+    @property
+    def blocks(self):
+        """The segmentation as a BedTool object. It is only written to disk when first used, since streamed outputs never need it."""
+        if self._blocks is None:
+            self._blocks = BedTool.from_dataframe(self.df)
+        return self._blocks
+
+    def toArrays(self):
+        """Convert the segmentation to plain arrays, e.g. for caching. The inverse of ``recordFromArrays``.
+
+        Returns
+        -------
+        arrays: dict
+            ``numpy`` arrays, keyed by name
+        """
+
+        chroms = list(self.priors)
+        if len(self.df):
+            starts = self.df[1].values
+            # Each chromosome's boundaries are its block starts, plus the end of its last block
+            ends = self.df[2].values
+            codes = self.df[0].cat.codes.values
+            last = np.flatnonzero(np.append(codes[1:] != codes[:-1], True))
+            boundaries = np.insert(starts, last + 1, ends[last])
+        else:
+            boundaries = np.array([], dtype=np.int64)
+        return {
+            "chroms": np.array(chroms, dtype=str),
+            "nblocks": np.array([self.nblocks[chrom] for chrom in chroms], dtype=np.int64),
+            "boundaries": boundaries.astype(np.int64),
+            "priors": np.array([self.priors[chrom] for chrom in chroms], dtype=np.float64),
+            "fitness": np.array([self.fitness[chrom] for chrom in chroms], dtype=np.float64),
+            "cells": np.array([self.cells.get(chrom, 0) for chrom in chroms], dtype=np.int64),
+            "compressed_cells": np.array([self.compressed_cells.get(chrom, 0) for chrom in chroms], dtype=np.int64),
+            "p0": np.array(np.nan if self.p0 is None else self.p0, dtype=np.float64),
+        }
+
+
+def recordFromArrays(arrays):
+    """Rebuild a SegmentationRecord from the output of ``SegmentationRecord.toArrays``.
+
+    Parameters
+    ----------
+    arrays: dict
+        ``numpy`` arrays, keyed by name
+
+    Returns
+    -------
+    segmentation: SegmentationRecord
+    """
+
+    segmentation = SegmentationRecord()
+    p0 = float(arrays["p0"])
+    if not np.isnan(p0):
+        segmentation.p0 = p0
+    # Each chromosome has one more boundary than blocks
+    offsets = np.concatenate([[0], np.cumsum(arrays["nblocks"] + 1)])
+    for i, chrom in enumerate(arrays["chroms"]):
+        segmentation.addChromosome(
+            str(chrom),
+            arrays["boundaries"][offsets[i]:offsets[i + 1]],
+            float(arrays["priors"][i]),
+            float(arrays["fitness"][i]),
+            (int(arrays["cells"][i]), int(arrays["compressed_cells"][i])),
+        )
+    segmentation.finalize()
+    return segmentation
 
 
-def validateSegmentationArguments(input_file, p0, prior):
+def validateSegmentationArguments(input_file, p0, prior, workers=1):
     """Validates parameters passed via the command line.
 
     Parameters
     ----------
-    input_file: BedTool object
-        BedTool object (instantiated from pybedtools) for input data
+    input_file: BedTool object or str
+        BedTool object (instantiated from pybedtools) or path for input data
     p0: float
     prior: float
+    workers: int
 
     Returns
     -------
     None: None
     """
 
-    # Check that input_file is sorted
-    assert utilities.isSortedBEDObject(input_file), "input file must be sorted"
+    # Check that input_file is sorted; files read from a path
+    # are checked for sortedness while they are streamed
+    if not isinstance(input_file, str):
+        assert utilities.isSortedBEDObject(input_file), "input file must be sorted"
     # If prior has been provided, check that it is positive
     if prior:
         assert prior >= 0, "--prior should be non-negative"
     # If p0 has been provided, check that it is between 0 and 1
     if p0:
         assert 0 <= p0 <= 1, "--p0 should be between 0 and 1, inclusive"
+    # Check that the number of workers is a positive integer
+    assert workers >= 1, "--threads should be a positive integer"
+
+
+def boundariesToDF(boundaries):
+    """Convert block boundaries on one or more chromosomes to a columnar ``pandas`` DataFrame.
+
+    Parameters
+    ----------
+    boundaries: dict
+        Arrays whose entries specify the coordinates of block boundaries, keyed by chromosome
+
+    Returns
+    -------
+    output: ``pandas`` DataFrame
+        Blocks, with a categorical chromosome column and int64 start and end columns
+    """
+
+    # Chromosomes need at least two events at different positions
+    # to be able to report a block. If there are no blocks,
+    # return an empty DataFrame.
+    chroms = [chrom for chrom, ranges in boundaries.items() if len(ranges) > 1]
+    if not chroms:
+        return pd.DataFrame()
+    ranges = [np.asarray(boundaries[chrom], dtype=np.int64) for chrom in chroms]
+    codes = np.repeat(np.arange(len(chroms)), [len(_) - 1 for _ in ranges])
+    return pd.DataFrame(
+        {
+            0: pd.Categorical.from_codes(codes, categories=chroms),
+            1: np.concatenate([_[:-1] for _ in ranges]),
+            2: np.concatenate([_[1:] for _ in ranges]),
+        }
+    )
 
 
 def blocksToDF(chrom, ranges):
@@ -85,33 +241,356 @@ def blocksToDF(chrom, ranges):
     output: ``pandas`` DataFrame
     """
 
-    output = ""
-    # Chromosomes need at least two events at different positions
-    # to be able to report a block. If output is empty,
-    # return an emtpy DataFrame.
-    for i in range(len(ranges) - 1):
-        interval = "{}\t{}\t{}\n".format(chrom, ranges[i], ranges[i + 1])
-        output += interval
-    if output:
-        return pd.read_csv(StringIO(output), header=None, sep="\t")
-    else:
-        return pd.DataFrame()
+    return boundariesToDF({chrom: ranges})
+
+
+def readInputCoordinates(input_file, weighted=False):
+    """Read the coordinates (and weights) of the events to segment, keyed by chromosome.
+
+    The coordinate of each event is the floor of the mean of its start and end.
+
+    Parameters
+    ----------
+    input_file: BedTool object or str
+        BedTool object (instantiated from pybedtools) for input data, or the path to a (optionally gzipped) BED/qBED/CCF file or packed event store
+    weighted: bool, optional
+        Whether to also read the value (fourth) column as event weights. Default: False
+
+    Returns
+    -------
+    coordinates: OrderedDict
+        Arrays of event coordinates, keyed by chromosome in file order
+    weights: OrderedDict or None
+        Arrays of event weights, keyed by chromosome in file order; None if not weighted
+    """
+
+    if not isinstance(input_file, str) and utilities.isPackedBEDObject(input_file):
+        # Memory-map packed event stores rather than converting them with pybedtools
+        input_file = input_file.fn
+    if isinstance(input_file, str):
+        # Stream coordinates straight from the file
+        if weighted:
+            return readers.readWeightedCoordinates(input_file)
+        return readers.readCoordinates(input_file), None
+    # Open input file as DataFrame
+    input_df = input_file.to_dataframe()
+    # Pre-process coordinates by taking the floor of the mean of the start and end values
+    input_df["coordinate"] = (input_df["start"] + input_df["end"]) // 2
+    # The input is sorted, so each chromosome is a contiguous slice of the DataFrame
+    chroms = input_df["chrom"].astype(str).values
+    breaks = np.concatenate([[0], np.flatnonzero(chroms[1:] != chroms[:-1]) + 1, [len(chroms)]])
+    assert len(set(chroms[breaks[:-1]])) == len(breaks) - 1, "input file must be sorted"
+    values = input_df["coordinate"].values
+    coordinates = OrderedDict(
+        (chroms[i], values[i:j]) for i, j in zip(breaks[:-1], breaks[1:])
+    )
+    if not weighted:
+        return coordinates, None
+    # The value column is the fourth column, which pybedtools names "name"
+    values = input_df["name"].values.astype(float)
+    weights = OrderedDict(
+        (chroms[i], values[i:j]) for i, j in zip(breaks[:-1], breaks[1:])
+    )
+    return coordinates, weights
+
+
+def aggregateWeights(coordinates, weights):
+    """Sum the weights of events sharing a coordinate, dropping events of zero weight.
+
+    Parameters
+    ----------
+    coordinates: array
+        Event coordinates on a chromosome
+    weights: array
+        Non-negative weight of each event
+
+    Returns
+    -------
+    coordinates: array
+        Sorted, unique event coordinates
+    weights: array
+        Total weight at each coordinate
+    """
+
+    weights = np.asarray(weights, dtype=float)
+    assert np.all(weights >= 0), "event weights must be non-negative"
+    nonzero = weights > 0
+    coordinates, inverse = np.unique(np.asarray(coordinates)[nonzero], return_inverse=True)
+    return coordinates, np.bincount(inverse, weights=weights[nonzero])
+
+
+def segmentChromosome(alg, coordinates, weights=None):
+    """Segment the events on a single chromosome.
+
+    Parameters
+    ----------
+    alg: Algorithm object
+        Instantiated segmentation algorithm (see ``blockify.algorithms``)
+    coordinates: array
+        Event coordinates on the chromosome
+    weights: array, optional
+        Weight of each event; if None, each event counts once
+
+    Returns
+    -------
+    block_boundaries: array
+        Array whose entries specify the coordinates of block boundaries
+    prior: float
+        Prior used for the segmentation
+    fitness: float
+        Fitness of the segmentation
+    cells: tuple
+        Number of cells before and after merging runs of equal density
+    """
+
+    if weights is not None:
+        coordinates, weights = aggregateWeights(coordinates, weights)
+        # A chromosome without any weight has no blocks
+        if len(coordinates) == 0:
+            return coordinates, None, 0, (0, 0)
+    block_boundaries = alg.segment(coordinates, weights)
+    return block_boundaries, alg.prior, alg.best_fitness, (alg.n_cells, alg.n_compressed_cells)
+
+
+def segmentChromosomePath(alg, coordinates, p0s=None, priors=None, weights=None):
+    """Segment the events on a single chromosome for a grid of p0 values or priors.
+
+    Parameters
+    ----------
+    alg: Algorithm object
+        Instantiated segmentation algorithm (see ``blockify.algorithms``)
+    coordinates: array
+        Event coordinates on the chromosome
+    p0s: list of float, optional
+        Grid of p0 values
+    priors: list of float, optional
+        Grid of explicit priors; if specified, p0s is ignored
+    weights: array, optional
+        Weight of each event; if None, each event counts once
+
+    Returns
+    -------
+    path: list of tuples
+        (block_boundaries, prior, fitness, cells) for each grid value, as returned by ``segmentChromosome``
+    """
+
+    grid = p0s if priors is None else priors
+    if weights is not None:
+        coordinates, weights = aggregateWeights(coordinates, weights)
+        # A chromosome without any weight has no blocks
+        if len(coordinates) == 0:
+            return [(coordinates, None, 0, (0, 0)) for _ in grid]
+    boundaries = alg.segment_path(coordinates, weights, p0=p0s, ncp_prior=priors)
+    cells = (alg.n_cells, alg.n_compressed_cells)
+    return [(_, prior, fitness, cells) for _, prior, fitness in zip(boundaries, alg.path_priors, alg.path_fitness)]
+
+
+def segmentChromosomes(alg, coordinates, weights=None, shared_prior=False):
+    """Segment the events on several chromosomes in a single pass (see ``Algorithm.segment_genome``).
+
+    Parameters
+    ----------
+    alg: Algorithm object
+        Instantiated segmentation algorithm (see ``blockify.algorithms``)
+    coordinates: dict
+        Event coordinates, keyed by chromosome
+    weights: dict, optional
+        Event weights, keyed by chromosome; if None, each event counts once
+    shared_prior: bool, optional
+        Whether to use a single prior, computed from the total number of unique event coordinates, rather than one per chromosome. Default: False
+
+    Returns
+    -------
+    results: dict
+        (block_boundaries, prior, fitness, cells) for each chromosome, as returned by ``segmentChromosome``
+    """
+
+    chroms = list(coordinates)
+    if weights is not None:
+        for chrom in chroms:
+            assert np.all(np.asarray(weights[chrom]) >= 0), "event weights must be non-negative"
+    boundaries = alg.segment_genome(
+        [coordinates[chrom] for chrom in chroms],
+        None if weights is None else [weights[chrom] for chrom in chroms],
+        shared_prior=shared_prior,
+    )
+    return {
+        chrom: (
+            boundaries[i],
+            alg.chrom_priors[i],
+            alg.chrom_fitness[i],
+            (alg.chrom_cells[i], alg.chrom_compressed_cells[i]),
+        )
+        for i, chrom in enumerate(chroms)
+    }
+
+
+def batchChromosomes(coordinates, small=SMALL_CHROMOSOME_EVENTS, size=BATCH_EVENTS):
+    """Group consecutive small chromosomes into batches, so that they are segmented together.
+
+    Parameters
+    ----------
+    coordinates: dict
+        Event coordinates, keyed by chromosome
+    small: int, optional
+        Chromosomes with fewer events than this are batched; the others form a batch of their own. Default: ``SMALL_CHROMOSOME_EVENTS``
+    size: int, optional
+        Number of events after which a batch is closed. Default: ``BATCH_EVENTS``
+
+    Returns
+    -------
+    batches: list of lists
+        Chromosomes of each batch, in order
+    """
+
+    batches = []
+    batch, events = [], 0
+    for chrom, values in coordinates.items():
+        if len(values) >= small:
+            if batch:
+                batches.append(batch)
+                batch, events = [], 0
+            batches.append([chrom])
+            continue
+        batch.append(chrom)
+        events += len(values)
+        if events >= size:
+            batches.append(batch)
+            batch, events = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def segmentBatch(alg, coordinates, weights=None):
+    """Segment a batch of chromosomes, each with its own prior.
+
+    Parameters
+    ----------
+    alg: Algorithm object
+        Instantiated segmentation algorithm (see ``blockify.algorithms``)
+    coordinates: dict
+        Event coordinates, keyed by chromosome
+    weights: dict, optional
+        Event weights, keyed by chromosome; if None, each event counts once
+
+    Returns
+    -------
+    results: dict
+        (block_boundaries, prior, fitness, cells) for each chromosome, as returned by ``segmentChromosome``
+    """
+
+    if len(coordinates) == 1:
+        chrom = next(iter(coordinates))
+        return {chrom: segmentChromosome(alg, coordinates[chrom], None if weights is None else weights[chrom])}
+    return segmentChromosomes(alg, coordinates, weights)
+
+
+def subsetChromosomes(values, chroms):
+    """Select the entries of some chromosomes from a dict keyed by chromosome, or None."""
+    return None if values is None else OrderedDict((chrom, values[chrom]) for chrom in chroms)
+
+
+def segmentBatchesInParallel(alg, coordinates, batches, workers, weights=None):
+    """Segment batches of chromosomes in a pool of worker processes, largest batches first.
+
+    Parameters
+    ----------
+    alg: Algorithm object
+        Instantiated segmentation algorithm (see ``blockify.algorithms``)
+    coordinates: dict
+        Event coordinates, keyed by chromosome
+    batches: list of lists
+        Chromosomes of each batch (see ``batchChromosomes``)
+    workers: int
+        Number of worker processes
+    weights: dict, optional
+        Event weights, keyed by chromosome
+
+    Returns
+    -------
+    results: dict
+        Return values of ``segmentChromosome``, keyed by chromosome
+    """
+
+    schedule = sorted(batches, key=lambda batch: sum(len(coordinates[chrom]) for chrom in batch), reverse=True)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                segmentBatch, alg, subsetChromosomes(coordinates, batch), subsetChromosomes(weights, batch)
+            )
+            for batch in schedule
+        ]
+        for future in futures:
+            results.update(future.result())
+    return results
+
+
+def segmentChromosomesInParallel(alg, coordinates, workers, task=segmentChromosome, args=(), weights=None):
+    """Segment several chromosomes in a pool of worker processes.
+
+    Chromosomes are submitted largest first, so the longest-running jobs
+    start as early as possible.
+
+    Parameters
+    ----------
+    alg: Algorithm object
+        Instantiated segmentation algorithm (see ``blockify.algorithms``)
+    coordinates: dict
+        Event coordinates, keyed by chromosome
+    workers: int
+        Number of worker processes
+    task: function, optional
+        Function called as ``task(alg, coordinates, *args)`` for each chromosome. Default: ``segmentChromosome``
+    args: tuple, optional
+        Additional arguments passed to task
+    weights: dict, optional
+        Event weights, keyed by chromosome; passed to task as the ``weights`` keyword argument
+
+    Returns
+    -------
+    results: dict
+        Return values of task, keyed by chromosome
+    """
+
+    schedule = sorted(coordinates, key=lambda chrom: len(coordinates[chrom]), reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            chrom: executor.submit(
+                task, alg, coordinates[chrom], *args, weights=None if weights is None else weights[chrom]
+            )
+            for chrom in schedule
+        }
+        return {chrom: future.result() for chrom, future in futures.items()}
 
 
 # Returns a SegmentationRecord object
-def segment(input_file, method, p0=None, prior=None):
+def segment(
+    input_file, method, p0=None, prior=None, workers=1, cache=None, weighted=False, callback=None, genome_wide=False
+):
     """Core segmentation method.
 
     Parameters
     ----------
-    input_file: BedTool object
-        BedTool object (instantiated from pybedtools) for input data
+    input_file: BedTool object or str
+        BedTool object (instantiated from pybedtools) for input data, or the path to a (optionally gzipped) BED/qBED/CCF file, which is streamed without going through pybedtools
     method: str
         String specifying whether to use OP or PELT for the segmentation
     p0: float, optional
         Float used to parameterize the prior on the total number of blocks; must be in the interval [0, 1]. Default: 0.05
     prior: float, optional
         Explicit value for the total number of priors (specifying this is not recommended)
+    workers: int, optional
+        Number of processes used to segment chromosomes in parallel. Default: 1
+    cache: SegmentationCache, optional
+        Cache (see ``blockify.cache``) from which to load the segmentation of a file-based input, and in which to store it otherwise
+    weighted: bool, optional
+        Whether to weight each event by the value (fourth) column of the input, e.g. the number of reads supporting an insertion. Default: False
+    callback: function, optional
+        Called with the blocks of each chromosome, or of each batch of small chromosomes (see ``batchChromosomes``), as a ``pandas`` DataFrame, as soon as they are segmented (see ``blockify.writers``)
+    genome_wide: bool, optional
+        Whether to segment all chromosomes in a single pass, with one prior computed from the total number of unique event coordinates in the genome rather than one per chromosome (see ``Algorithm.segment_genome``). Default: False
 
     Returns
     -------
@@ -121,7 +600,8 @@ def segment(input_file, method, p0=None, prior=None):
 
     # input_file is a BedTool object
     # Validate segmentation arguments
-    validateSegmentationArguments(input_file, p0, prior)
+    with profiling.stage("segmentation.validate"):
+        validateSegmentationArguments(input_file, p0, prior, workers)
     # Get the algorithm class, then instantiate with specified parameters
     algorithm = algorithms.ALGORITHM_DICT.get(method, method)
     if prior:
@@ -131,13 +611,25 @@ def segment(input_file, method, p0=None, prior=None):
     else:
         raise ValueError("--p0 or --prior argument are invalid")
 
-    # Open input file as DataFrame
-    input_df = input_file.to_dataframe()
-    # Pre-process coordinates by taking the floor of the mean of the start and end values
-    input_df["coordinate"] = (input_df["start"] + input_df["end"]) // 2
-    # Get list of chromosomes specified in input_df
-    chroms = utilities.getChromosomesInDF(input_df)
-    n_chroms = len(chroms)
+    # Return a cached segmentation of the same content and parameters, if any
+    key = None
+    if cache is not None:
+        if isinstance(input_file, str) or utilities.isFileBasedBEDObject(input_file):
+            path = input_file if isinstance(input_file, str) else input_file.fn
+            with profiling.stage("segmentation.cache"):
+                key = cache.key(path, method, p0, prior, weighted, genome_wide)
+                arrays = cache.load(key)
+            if arrays is not None:
+                profiling.logger.info("Loaded segmentation of %s from cache", path, extra={"cache": "hit"})
+                segmentation = recordFromArrays(arrays)
+                if callback is not None:
+                    for df in writers.iterChromosomeFrames(segmentation.df):
+                        callback(df)
+                return segmentation
+
+    with profiling.stage("segmentation.read"):
+        coordinates, weights = readInputCoordinates(input_file, weighted)
+    n_chroms = len(coordinates)
     # Now we are ready to segment. Instantiate a SegmentationRecord object
     segmentation = SegmentationRecord()
     # segmentation.filename = input_df
@@ -145,40 +637,216 @@ def segment(input_file, method, p0=None, prior=None):
     if p0:
         segmentation.p0 = p0
 
-    # Segment by chromosome
-    for i, chrom in enumerate(chroms):
-        # Print progress to stdout
-        print("[{}/{}] Processing {}".format(i + 1, n_chroms, chrom), file=sys.stderr)
-        # Get the block boundaries of the segmentation
-        block_boundaries = alg.segment(
-            input_df[input_df["chrom"] == chrom]["coordinate"]
-        )
-        # Conditional on if there are ≥ 1 block (≥ 2 boundaries)
-        if len(block_boundaries) > 1:
-            # Store the prior in the SegmentationRecord
-            segmentation.priors[chrom] = alg.prior
-            # Store the fitness of each segmentation
-            segmentation.fitness[chrom] = alg.best_fitness
-            # Convert block boundaries to DataFrame and append to the SegmentationRecord
-            df = blocksToDF(chrom, block_boundaries.astype(int))
-            segmentation.df = segmentation.df.append(df)
-            # Store the number of blocks in the SegmentationRecord
-            segmentation.nblocks[chrom] = len(df)
-            print("--Found {} blocks".format(segmentation.nblocks[chrom]), file=sys.stderr)
+    # Group small chromosomes into batches; a genome-wide segmentation is a single batch
+    batches = [list(coordinates)] if genome_wide else batchChromosomes(coordinates)
+    # Segment the whole genome at once, or batches in a process pool, if requested
+    if genome_wide:
+        with profiling.stage("segmentation.segment"):
+            results = segmentChromosomes(alg, coordinates, weights, shared_prior=True)
+    elif workers > 1 and len(batches) > 1:
+        with profiling.stage("segmentation.segment"):
+            results = segmentBatchesInParallel(alg, coordinates, batches, workers, weights=weights)
+    else:
+        results = None
+
+    # Segment by batch of chromosomes
+    i = 0
+    for batch in batches:
+        if results is None:
+            with profiling.stage("segmentation.segment"):
+                batch_results = segmentBatch(
+                    alg, subsetChromosomes(coordinates, batch), subsetChromosomes(weights, batch)
+                )
         else:
-            print("--Skipped, no blocks found", file=sys.stderr)
-    segmentation.finalize()
+            batch_results = results
+        # Block boundaries of the chromosomes of the batch with ≥ 1 block
+        batch_boundaries = OrderedDict()
+        for chrom in batch:
+            i += 1
+            # Report progress
+            profiling.logger.info(
+                "[%d/%d] Processing %s", i, n_chroms, chrom,
+                extra={"chrom": chrom, "index": i, "total": n_chroms},
+            )
+            profiling.count("segmentation.segment", chrom, len(coordinates[chrom]))
+            # Get the block boundaries of the segmentation
+            block_boundaries, chrom_prior, chrom_fitness, cells = batch_results[chrom]
+            # Conditional on if there are ≥ 1 block (≥ 2 boundaries)
+            if len(block_boundaries) > 1:
+                # Store the prior, fitness, and blocks in the SegmentationRecord
+                segmentation.addChromosome(chrom, block_boundaries, chrom_prior, chrom_fitness, cells)
+                batch_boundaries[chrom] = block_boundaries
+                profiling.logger.info(
+                    "--Found %d blocks", segmentation.nblocks[chrom],
+                    extra={
+                        "chrom": chrom,
+                        "blocks": segmentation.nblocks[chrom],
+                        "cells": cells[0],
+                        "compressed_cells": cells[1],
+                    },
+                )
+            else:
+                profiling.logger.info("--Skipped, no blocks found", extra={"chrom": chrom, "blocks": 0})
+        # Hand over the blocks of the whole batch at once
+        if callback is not None and batch_boundaries:
+            callback(boundariesToDF(batch_boundaries))
+    with profiling.stage("segmentation.finalize"):
+        segmentation.finalize()
+    profiling.logger.info(
+        "Merging cells of equal density compressed the input %.2f-fold", segmentation.compression_ratio,
+        extra={"compression_ratio": segmentation.compression_ratio},
+    )
+
+    if key is not None:
+        with profiling.stage("segmentation.cache"):
+            cache.save(key, segmentation.toArrays())
 
     return segmentation
 
 
-def segment_from_command_line(args):
+def segment_path(input_file, method, p0s=None, priors=None, workers=1, weighted=False):
+    """Segment the input for a grid of p0 values or priors, in a single pass over the data.
+
+    Each chromosome is read once and its segmentations for the whole grid
+    are computed together (see ``Algorithm.segment_path``), re-using the
+    dynamic program wherever neighboring penalties share a segmentation.
+
+    Parameters
+    ----------
+    input_file: BedTool object or str
+        BedTool object (instantiated from pybedtools) for input data, or the path to a (optionally gzipped) BED/qBED/CCF file
+    method: str
+        String specifying whether to use OP or PELT for the segmentation
+    p0s: list of float, optional
+        Grid of p0 values; each must be in the interval [0, 1]
+    priors: list of float, optional
+        Grid of explicit priors; exactly one of p0s and priors must be given
+    workers: int, optional
+        Number of processes used to segment chromosomes in parallel. Default: 1
+    weighted: bool, optional
+        Whether to weight each event by the value (fourth) column of the input. Default: False
+
+    Returns
+    -------
+    segmentations: list of SegmentationRecord
+        One SegmentationRecord per grid value, in the order given
+    """
+
+    if (p0s is None) == (priors is None):
+        raise ValueError("exactly one of a p0 grid or a prior grid must be specified")
+    grid = p0s if p0s is not None else priors
+    assert len(grid) > 0, "the grid of p0 values or priors should not be empty"
+    with profiling.stage("segmentation.validate"):
+        for value in grid:
+            if p0s is not None:
+                validateSegmentationArguments(input_file, value, None, workers)
+            else:
+                validateSegmentationArguments(input_file, None, value, workers)
+    alg = algorithms.ALGORITHM_DICT.get(method, method)()
+
+    with profiling.stage("segmentation.read"):
+        coordinates, weights = readInputCoordinates(input_file, weighted)
+    n_chroms = len(coordinates)
+    segmentations = [SegmentationRecord() for _ in grid]
+    if p0s is not None:
+        for segmentation, p0 in zip(segmentations, p0s):
+            segmentation.p0 = p0
+
+    # Segment chromosomes in a process pool, if requested
+    if workers > 1 and n_chroms > 1:
+        with profiling.stage("segmentation.segment"):
+            results = segmentChromosomesInParallel(
+                alg, coordinates, workers, task=segmentChromosomePath, args=(p0s, priors), weights=weights
+            )
+    else:
+        results = None
+
+    for i, chrom in enumerate(coordinates):
+        # Report progress
+        profiling.logger.info(
+            "[%d/%d] Processing %s", i + 1, n_chroms, chrom,
+            extra={"chrom": chrom, "index": i + 1, "total": n_chroms},
+        )
+        profiling.count("segmentation.segment", chrom, len(coordinates[chrom]))
+        if results is None:
+            with profiling.stage("segmentation.segment"):
+                path = segmentChromosomePath(
+                    alg, coordinates[chrom], p0s, priors, None if weights is None else weights[chrom]
+                )
+        else:
+            path = results[chrom]
+        for segmentation, (block_boundaries, chrom_prior, chrom_fitness, cells) in zip(segmentations, path):
+            # Conditional on if there are ≥ 1 block (≥ 2 boundaries)
+            if len(block_boundaries) > 1:
+                segmentation.addChromosome(chrom, block_boundaries, chrom_prior, chrom_fitness, cells)
+    with profiling.stage("segmentation.finalize"):
+        for segmentation in segmentations:
+            segmentation.finalize()
+
+    return segmentations
+
+
+def pathToDF(grid, segmentations, name="p0"):
+    """Summarize the segmentations of a grid of p0 values or priors.
+
+    Parameters
+    ----------
+    grid: list of float
+        Grid of p0 values or priors
+    segmentations: list of SegmentationRecord
+        Segmentations returned by ``segment_path``
+    name: str
+        Name of the grid column, e.g. "p0" or "prior"
+
+    Returns
+    -------
+    summary: ``pandas`` DataFrame
+        Total number of blocks and total fitness for each grid value
+    """
+
+    return pd.DataFrame(
+        {
+            name: grid,
+            "blocks": [int(_.total_blocks) for _ in segmentations],
+            "fitness": [_.total_fitness for _ in segmentations],
+        }
+    )
+
+
+def segment_path_from_command_line(args):
+    """Wrapper function for the command line function ``blockify segment --p0-grid/--prior-grid``
+
+    Parameters
+    ----------
+    args: ``argparse.Namespace`` object
+        Input from command line
+
+    Returns
+    -------
+    segmentations: list of SegmentationRecord
+        One SegmentationRecord per grid value
+    """
+
+    assert not args.genome_wide, "--genome-wide cannot be combined with --p0-grid or --prior-grid"
+    return segment_path(
+        args.input,
+        args.method,
+        p0s=args.p0_grid,
+        priors=args.prior_grid,
+        workers=args.threads,
+        weighted=args.weighted,
+    )
+
+
+def segment_from_command_line(args, callback=None):
     """Wrapper function for the command line function ``blockify segment``
 
     Parameters
     ----------
     args: ``argparse.Namespace`` object
         Input from command line
+    callback: function, optional
+        Called with the blocks of each chromosome as soon as it is segmented (see ``segment``)
 
     Returns
     -------
@@ -186,6 +854,15 @@ def segment_from_command_line(args):
         A SegmentationRecord from segmenting the command line data
     """
 
-    input_file = BedTool(args.input)
-    # Segment the input file
-    return segment(input_file, args.method, p0=args.p0, prior=args.prior)
+    # Segment the input file, streaming it from disk
+    return segment(
+        args.input,
+        args.method,
+        p0=args.p0,
+        prior=args.prior,
+        workers=args.threads,
+        cache=caching.cache_from_command_line(args),
+        weighted=args.weighted,
+        callback=callback,
+        genome_wide=args.genome_wide,
+    )
@@ -0,0 +1,194 @@
+import numpy as np
+import scipy.special as special
+import scipy.stats as stats
+import statsmodels.stats.multitest as multitest
+from . import utilities
+
+# Poisson tests and multiple hypothesis corrections for peak calling,
+# on contiguous NumPy arrays. p-values are kept as natural logarithms
+# throughout, so that the tiny p-values of strong peaks do not underflow
+# to 0; -log10 p-values follow directly. Bonferroni and
+# Benjamini-Hochberg corrections are computed here in log space, which
+# gives the same rejections as statsmodels; the other corrections of
+# ``statsmodels.stats.multitest`` fall back to statsmodels itself.
+
+# Below this log p-value, the regularized incomplete gamma functions lose
+# precision as they approach underflow, so the tails are computed otherwise
+LOG_UNDERFLOW = np.log(1e-290)
+
+# Log p-value reported for events that are impossible under the null, e.g.
+# any event where the expected count is 0: log(1 / FLOAT_MAX), so that p-values
+# stay positive and -log10 p-values are capped at LOG10_FLOAT_MAX
+LOG_P_MIN = -utilities.LOG10_FLOAT_MAX * np.log(10)
+
+# Aliases of the corrections computed here (see ``statsmodels.stats.multitest``)
+BONFERRONI_METHODS = ["b", "bonf", "bonferroni"]
+BENJAMINI_HOCHBERG_METHODS = ["fdr_bh", "fdr_i", "fdr_p", "fdri", "fdrp"]
+
+
+def logPoissonUpperTail(x, mu):
+    """Compute log P(X ≥ x) for Poisson-distributed X with mean mu.
+
+    Parameters
+    ----------
+    x: ``numpy`` array
+        Integer-valued numbers of events
+    mu: ``numpy`` array
+        Poisson means
+
+    Returns
+    -------
+    log_p: ``numpy`` array
+        Natural logarithm of the upper tail probability of each x; probabilities of 0 are reported as ``LOG_P_MIN``
+    """
+
+    x, mu = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(mu, dtype=float))
+    log_p = np.zeros(x.shape)
+    # P(X ≥ x) = 1 for x ≤ 0; otherwise, it is the regularized lower incomplete gamma function
+    upper = x > 0
+    with np.errstate(divide="ignore"):
+        log_p[upper] = np.log(special.gammainc(x[upper], mu[upper]))
+    # Deep in the tail (x >> mu), P(X ≥ x) = P(X = x) * 1F1(1; x + 1; mu),
+    # where the confluent hypergeometric series is close to 1
+    deep = upper & (log_p < LOG_UNDERFLOW) & (mu > 0)
+    if deep.any():
+        log_p[deep] = stats.poisson.logpmf(x[deep], mu[deep]) + np.log(
+            special.hyp1f1(1, x[deep] + 1, mu[deep])
+        )
+    # With mu = 0, P(X ≥ x) = 0 for x > 0
+    log_p[np.isneginf(log_p)] = LOG_P_MIN
+    return log_p
+
+
+def logPoissonLowerTail(x, mu):
+    """Compute log P(X ≤ x) for Poisson-distributed X with mean mu.
+
+    Parameters
+    ----------
+    x: ``numpy`` array
+        Integer-valued numbers of events
+    mu: ``numpy`` array
+        Poisson means
+
+    Returns
+    -------
+    log_p: ``numpy`` array
+        Natural logarithm of the lower tail probability of each x; probabilities of 0 are reported as ``LOG_P_MIN``
+    """
+
+    x, mu = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(mu, dtype=float))
+    log_p = np.full(x.shape, -np.inf)
+    # P(X ≤ x) = 0 for x < 0; otherwise, it is the regularized upper incomplete gamma function
+    lower = x >= 0
+    with np.errstate(divide="ignore"):
+        log_p[lower] = np.log(special.gammaincc(x[lower] + 1, mu[lower]))
+    # Deep in the tail (x << mu), sum the probabilities of 0, 1, ..., x events in log space;
+    # this only happens for a handful of regions, so they are summed one at a time
+    for i in np.flatnonzero(lower & (log_p < LOG_UNDERFLOW)):
+        log_p[i] = special.logsumexp(stats.poisson.logpmf(np.arange(x[i] + 1), mu[i]))
+    log_p[np.isneginf(log_p)] = LOG_P_MIN
+    return log_p
+
+
+def bonferroni(log_p, alpha):
+    """Bonferroni correction of log p-values.
+
+    Parameters
+    ----------
+    log_p: ``numpy`` array
+        Natural logarithms of the p-values
+    alpha: float
+        Family-wise error rate
+
+    Returns
+    -------
+    rejected: ``numpy`` array
+        Whether each hypothesis is rejected
+    log_corrected: ``numpy`` array
+        Natural logarithms of the corrected p-values
+    """
+
+    log_m = np.log(len(log_p))
+    with np.errstate(divide="ignore"):
+        rejected = log_p <= np.log(alpha) - log_m
+    return rejected, np.minimum(log_p + log_m, 0)
+
+
+def benjaminiHochberg(log_p, alpha):
+    """Benjamini-Hochberg correction of log p-values, in O(n log n).
+
+    Parameters
+    ----------
+    log_p: ``numpy`` array
+        Natural logarithms of the p-values
+    alpha: float
+        False discovery rate
+
+    Returns
+    -------
+    rejected: ``numpy`` array
+        Whether each hypothesis is rejected
+    log_corrected: ``numpy`` array
+        Natural logarithms of the corrected p-values
+    """
+
+    m = len(log_p)
+    order = np.argsort(log_p)
+    sorted_log_p = log_p[order]
+    # log(k / m) for the k-th smallest p-value
+    log_ranks = np.log(np.arange(1, m + 1)) - np.log(m)
+    # Reject every hypothesis up to the largest k with p_(k) ≤ k / m * alpha
+    with np.errstate(divide="ignore"):
+        below = np.flatnonzero(sorted_log_p <= log_ranks + np.log(alpha))
+    rejected = np.zeros(m, dtype=bool)
+    if len(below):
+        rejected[order[:below[-1] + 1]] = True
+    # Corrected p-values are the running minimum of p_(k) * m / k, from the largest p-value down
+    log_corrected = np.empty(m)
+    log_corrected[order] = np.minimum(np.minimum.accumulate((sorted_log_p - log_ranks)[::-1])[::-1], 0)
+    return rejected, log_corrected
+
+
+def correct(log_p, alpha, method):
+    """Correct log p-values for multiple hypothesis testing.
+
+    Parameters
+    ----------
+    log_p: ``numpy`` array
+        Natural logarithms of the p-values
+    alpha: float
+        Error rate
+    method: str
+        Correction method (see ``statsmodels.stats.multitest`` for valid values)
+
+    Returns
+    -------
+    rejected: ``numpy`` array
+        Whether each hypothesis is rejected
+    log_corrected: ``numpy`` array
+        Natural logarithms of the corrected p-values
+    """
+
+    if len(log_p) == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0)
+    if method in BONFERRONI_METHODS:
+        return bonferroni(log_p, alpha)
+    if method in BENJAMINI_HOCHBERG_METHODS:
+        return benjaminiHochberg(log_p, alpha)
+    # Other methods need linear p-values; keep them positive, so that their logarithms are finite
+    p = pValues(log_p)
+    rejected, corrected, _, _ = multitest.multipletests(
+        p, alpha=alpha, method=method, is_sorted=False, returnsorted=False
+    )
+    with np.errstate(divide="ignore"):
+        return rejected, np.log(corrected)
+
+
+def negLog10(log_p):
+    """Convert natural logarithms of p-values into -log10 p-values."""
+    return -log_p / np.log(10)
+
+
+def pValues(log_p):
+    """Convert natural logarithms of p-values into p-values, reporting those that underflow to 0 as 1 / FLOAT_MAX."""
+    return np.maximum(np.exp(log_p), 1 / utilities.FLOAT_MAX)
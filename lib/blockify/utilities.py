@@ -1,17 +1,22 @@
-from functools import reduce
 import numpy as np
+import os
+import pandas as pd
 from pybedtools import BedTool
+from . import readers
 
 # numpy log10 float max
 FLOAT_MAX = np.finfo(np.float64).max
 LOG10_FLOAT_MAX = np.log10(FLOAT_MAX)
 
+# Attribute used to cache the result of a sortedness check on a BedTool object
+SORTED_ATTRIBUTE = "blockify_is_sorted"
+
 
 # Fast method for getting number of lines in a file
 # For BED files, much faster than calling len() on file
 # From https://stackoverflow.com/questions/845058/how-to-get-line-count-cheaply-in-python
 def file_len(fname):
-    """Fast method for getting number of lines in a file. For BED files, much faster than calling len() on a BedTool object. From https://stackoverflow.com/questions/845058/how-to-get-line-count-cheaply-in-python
+    """Fast method for getting number of lines in a file. For BED files, much faster than calling len() on a BedTool object. The file is read in blocks, rather than line by line.
 
     Parameters
     ----------
@@ -24,10 +29,14 @@ def file_len(fname):
         Length of fname
     """
 
-    with open(fname) as f:
-        for i, l in enumerate(f):
-            pass
-    return i + 1
+    length = 0
+    last = b"\n"
+    with open(fname, "rb") as f:
+        for block in iter(lambda: f.read(readers.COUNT_BLOCKSIZE), b""):
+            length += block.count(b"\n")
+            last = block[-1:]
+    # The last line may not end with a newline
+    return length + (last != b"\n")
 
 
 def getChromosomesInDF(df):
@@ -41,14 +50,124 @@ def getChromosomesInDF(df):
     Returns
     -------
     chroms: list
-        List of chromosomes
+        List of chromosomes, in order of first appearance
+    """
+
+    # pd.unique is hash-based and preserves the order of appearance
+    return list(pd.unique(df["chrom"]))
+
+
+def isSortedArrays(chroms, starts):
+    """Tests, in a single vectorized pass, whether genomic records are sorted by chromosome and then by start coordinate.
+
+    Parameters
+    ----------
+    chroms: array_like
+        Chromosome of each record
+    starts: array_like
+        Start coordinate of each record
+
+    Returns
+    -------
+    is_sorted: bool
+    """
+
+    chroms = np.asarray(chroms)
+    starts = np.asarray(starts)
+    if len(chroms) < 2:
+        return True
+    # Records on the same chromosome as the preceding record
+    same = chroms[1:] == chroms[:-1]
+    # Chromosomes must increase wherever they change...
+    if not np.all(chroms[1:][~same] > chroms[:-1][~same]):
+        return False
+    # ...and start coordinates must not decrease within a chromosome
+    return bool(np.all(starts[1:][same] >= starts[:-1][same]))
+
+
+def isFileBasedBEDObject(bed_object):
+    """Tests whether a BedTool object is backed by a file on disk (as opposed to a stream or an iterator).
+
+    Parameters
+    ----------
+    bed_object: BedTool object
+        Input data as a BedTool object
+
+    Returns
+    -------
+    is_file_based: bool
+    """
+
+    return isinstance(bed_object.fn, str) and os.path.isfile(bed_object.fn)
+
+
+def isPackedBEDObject(bed_object):
+    """Tests whether a BedTool object is backed by a packed event store (see ``blockify pack``).
+
+    Parameters
+    ----------
+    bed_object: BedTool object
+        Input data as a BedTool object
+
+    Returns
+    -------
+    is_packed: bool
+    """
+
+    return isFileBasedBEDObject(bed_object) and readers.isPacked(bed_object.fn)
+
+
+def toTextBEDObject(bed_object):
+    """Make a BedTool object readable by bedtools, unpacking packed event stores into a temporary BED file.
+
+    Parameters
+    ----------
+    bed_object: BedTool object
+        Input data as a BedTool object
+
+    Returns
+    -------
+    bed_object: BedTool object
+        The input itself, or a BED copy of a packed event store
+    """
+
+    if isPackedBEDObject(bed_object):
+        return BedTool.from_dataframe(readers.PackedEvents(bed_object.fn).toDataFrame())
+    return bed_object
+
+
+def countEvents(bed_object, weighted=False):
+    """Count the events (rows) in a BedTool object, i.e. its library size.
+
+    Files are counted with buffered block reads, and the result is cached for as long as the file does not change
+    (see ``readers.librarySize``); packed event stores and files with a count index are not read at all.
+
+    Parameters
+    ----------
+    bed_object: BedTool object or ``blockify.counting.EventIndex``
+        Input data as a BedTool object, or events already loaded into memory
+    weighted: bool
+        Whether to sum the values (fourth column) of events rather than count them
+
+    Returns
+    -------
+    n: int or float
+        Number of events, or sum of their values if weighted
     """
 
-    return reduce(lambda l, x: l if x in l else l + [x], df["chrom"], [])
+    if not isinstance(bed_object, BedTool):
+        # Events loaded into memory know their number
+        assert not weighted, "events loaded into memory have no values"
+        return len(bed_object)
+    if isFileBasedBEDObject(bed_object):
+        return readers.librarySize(bed_object.fn, weighted=weighted)
+    df = bed_object.to_dataframe()
+    # The value column is the fourth column, which pybedtools names "name"
+    return float(df["name"].astype(float).sum()) if weighted else len(df)
 
 
 def isSortedBEDObject(bed_object):
-    """Tests whether a BedTool object is sorted.
+    """Tests whether a BedTool object is sorted. The result is cached on the object, so repeated checks are free.
 
     Parameters
     ----------
@@ -60,30 +179,33 @@ def isSortedBEDObject(bed_object):
     is_sorted: bool
     """
 
-    # Convert BedTool object to pandas DataFrame
-    df = bed_object.to_dataframe()
-    # First, check that chrom is in sorted order
-    if df["chrom"].is_monotonic:
-        # If so, check that the start coordinates are in order
-        chroms = getChromosomesInDF(df)
-        for c in chroms:
-            if not df[df["chrom"] == c]["start"].is_monotonic:
-                return False
-        return True
-    return False
+    is_sorted = getattr(bed_object, SORTED_ATTRIBUTE, None)
+    if is_sorted is None:
+        if isFileBasedBEDObject(bed_object):
+            # Files with an up-to-date count index were sorted when it was written;
+            # otherwise, stream the underlying file without pybedtools
+            is_sorted = readers.findCountIndex(bed_object.fn) is not None or readers.isSortedFile(bed_object.fn)
+        else:
+            # Convert BedTool object to pandas DataFrame
+            df = bed_object.to_dataframe()
+            is_sorted = isSortedArrays(df["chrom"].values, df["start"].values)
+        setattr(bed_object, SORTED_ATTRIBUTE, is_sorted)
+    return is_sorted
 
 
 def isSortedBEDFile(bed_file_path):
-    """Wrapper function to feed filepaths isSortedBEDObject.
+    """Tests whether a BED/qBED/CCF file is sorted, streaming it from disk rather than through pybedtools.
 
     Parameters
     ----------
-    bed_file_path: str
-        Path to BED/qBED/CCF data file
+    bed_file_path: str or BedTool object
+        Path to BED/qBED/CCF data file, or a BedTool object
 
     Returns
     -------
     is_sorted: bool
     """
 
-    return isSortedBEDObject(BedTool(bed_file_path))
+    if isinstance(bed_file_path, BedTool):
+        return isSortedBEDObject(bed_file_path)
+    return readers.isSortedFile(bed_file_path)
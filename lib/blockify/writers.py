@@ -0,0 +1,118 @@
+import gzip
+import numpy as np
+import shutil
+import sys
+from . import profiling
+from . import utilities
+
+# Writes tab-separated results (BED, bedGraph) incrementally. Subcommands
+# hand over each chromosome's results as soon as they are computed, so the
+# output never has to be held in memory as a whole, and a downstream tool
+# reading from a pipe can start consuming it right away. Outputs whose
+# path ends in ".gz" are gzip-compressed; "-" stands for stdout.
+
+# Extension of outputs that are gzip-compressed
+GZIP_EXTENSION = ".gz"
+
+
+def openOutput(output):
+    """Open an output for writing text.
+
+    Parameters
+    ----------
+    output: str or file object
+        Path to the output file ("-" for stdout; gzip-compressed if it ends in ".gz"), or an open file object
+
+    Returns
+    -------
+    handle: file object
+    owned: bool
+        Whether the handle was opened here, and should therefore be closed by the caller
+    """
+
+    if hasattr(output, "write"):
+        return output, False
+    if output == "-":
+        return sys.stdout, False
+    if str(output).endswith(GZIP_EXTENSION):
+        return gzip.open(output, "wt"), True
+    return open(output, "w"), True
+
+
+def iterChromosomeFrames(df):
+    """Split a DataFrame sorted by chromosome into one DataFrame per chromosome.
+
+    Parameters
+    ----------
+    df: ``pandas`` DataFrame
+        Records whose first column is the chromosome
+
+    Returns
+    -------
+    frames: iterator of ``pandas`` DataFrame
+        The records of each chromosome, in order
+    """
+
+    if len(df) == 0:
+        return
+    chroms = df.iloc[:, 0].astype(str).values
+    breaks = np.flatnonzero(chroms[1:] != chroms[:-1]) + 1
+    for i, j in zip([0, *breaks], [*breaks, len(df)]):
+        yield df.iloc[i:j]
+
+
+class BEDWriter(object):
+    """A class to write tab-separated records incrementally, e.g. one chromosome at a time."""
+
+    def __init__(self, output):
+        """
+        Parameters
+        ----------
+        output: str or file object
+            Path to the output file ("-" for stdout; gzip-compressed if it ends in ".gz"), or an open file object
+        """
+
+        self.handle, self._owned = openOutput(output)
+
+    def write(self, df):
+        """Write records, flushing them so that readers downstream see them immediately.
+
+        Parameters
+        ----------
+        df: ``pandas`` DataFrame
+            Records to write, without header or index
+        """
+
+        with profiling.stage("output"):
+            df.to_csv(self.handle, sep="\t", index=None, header=None)
+            self.handle.flush()
+
+    def writeBED(self, bed_object):
+        """Write the records of a BedTool object, copying its file rather than parsing it if it has one.
+
+        Parameters
+        ----------
+        bed_object: BedTool object
+            Records to write
+        """
+
+        if utilities.isFileBasedBEDObject(bed_object) and not utilities.isPackedBEDObject(bed_object):
+            with profiling.stage("output"):
+                with open(bed_object.fn) as f:
+                    shutil.copyfileobj(f, self.handle)
+                self.handle.flush()
+        else:
+            self.write(bed_object.to_dataframe())
+
+    def close(self):
+        """Close the output, unless it was passed in already open."""
+        if self._owned:
+            self.handle.close()
+        else:
+            self.handle.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
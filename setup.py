@@ -43,5 +43,6 @@ setuptools.setup(
     ],
     python_requires='>=3.4',
     install_requires=["numpy", "pandas", "scipy", "statsmodels", "pybedtools"],
+    extras_require={"fast": ["numba"]},
     keywords="genomics,segmentation,bayesian",
 )
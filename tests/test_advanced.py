@@ -1,7 +1,15 @@
+import tests.test_algorithms as test_algorithms
 import tests.test_segmentation as test_segmentation
 import tests.test_normalization as test_normalization
 import tests.test_annotation as test_annotation
 import tests.test_utilities as test_utilities
+import tests.test_readers as test_readers
+import tests.test_profiling as test_profiling
+import tests.test_counting as test_counting
+import tests.test_cache as test_cache
+import tests.test_packing as test_packing
+import tests.test_writers as test_writers
+import tests.test_statistics as test_statistics
 import sys
 import unittest
 
@@ -17,6 +25,11 @@ if not sys.warnoptions:
 advanced_tests = unittest.TestSuite()
 loader = unittest.TestLoader()
 
+# Add algorithm tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_algorithms.TestAlgorithms)
+)
+
 # Add segmentation tests
 advanced_tests.addTests(
     loader.loadTestsFromTestCase(test_segmentation.TestSegmentation)
@@ -53,6 +66,44 @@ advanced_tests.addTests(
     loader.loadTestsFromTestCase(test_utilities.TestUtilities)
 )
 
+# Add reader tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_readers.TestReaders)
+)
+
+# Add profiling tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_profiling.TestProfiling)
+)
+
+# Add counting tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_counting.TestCounting)
+)
+
+# Add cache tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_cache.TestCache)
+)
+
+# Add packing tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_packing.TestPacking)
+)
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_packing.TestCountIndex)
+)
+
+# Add writer tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_writers.TestWriters)
+)
+
+# Add statistics tests
+advanced_tests.addTests(
+    loader.loadTestsFromTestCase(test_statistics.TestStatistics)
+)
+
 # Run tests
 runner = unittest.TextTestRunner(verbosity=3)
 result = runner.run(advanced_tests)
@@ -0,0 +1,110 @@
+import blockify.algorithms as algorithms
+import numpy as np
+import pandas as pd
+import sys
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import os
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+def yeastCoordinates(chrom="chrI"):
+    df = pd.read_table("tests/data/S288C_CBF1.qbed", header=None)
+    df = df[df[0] == chrom]
+    return ((df[1] + df[2]) // 2).values
+
+
+class TestAlgorithms(unittest.TestCase):
+    def test_OP_engines(self):
+        # Test that the fast and legacy OP engines yield identical segmentations
+        t = yeastCoordinates()
+        legacy = algorithms.OptimalPartitioning(engine="legacy")
+        fast = algorithms.OptimalPartitioning(engine="fast")
+        np.testing.assert_array_equal(legacy.segment(t), fast.segment(t))
+        self.assertAlmostEqual(legacy.best_fitness, fast.best_fitness)
+
+    def test_PELT_engines(self):
+        # Test that pruning the full candidate set does not change the segmentation
+        t = yeastCoordinates()
+        legacy = algorithms.PELT(engine="legacy")
+        fast = algorithms.PELT(engine="fast")
+        np.testing.assert_array_equal(legacy.segment(t), fast.segment(t))
+        self.assertAlmostEqual(legacy.best_fitness, fast.best_fitness)
+
+    def test_compress(self):
+        # Test that merging runs of cells with equal density does not change the segmentation
+        for chrom in ["chrI", "chrIV", "chrXII"]:
+            t = yeastCoordinates(chrom)
+            for method in ["OP", "PELT"]:
+                merged = algorithms.ALGORITHM_DICT[method]()
+                full = algorithms.ALGORITHM_DICT[method](compress=False)
+                np.testing.assert_array_equal(merged.segment(t), full.segment(t))
+                self.assertEqual(merged.best_fitness, full.best_fitness)
+                self.assertLess(merged.n_compressed_cells, merged.n_cells)
+                self.assertEqual(full.n_compressed_cells, full.n_cells)
+
+    def test_compress_uniform(self):
+        # Evenly spaced events only differ in density at the ends
+        t = np.concatenate([np.arange(0, 1000, 5), np.arange(1000, 2000, 50)])
+        alg = algorithms.PELT()
+        edges = alg.segment(t)
+        self.assertLessEqual(alg.n_compressed_cells, 6)
+        np.testing.assert_array_equal(edges, algorithms.PELT(compress=False).segment(t))
+
+    def test_segment_path(self):
+        # Test that a sweep over priors matches segmenting separately for each prior
+        t = yeastCoordinates("chrIV")
+        priors = np.linspace(2, 12, 60)
+        for method in ["OP", "PELT"]:
+            alg = algorithms.ALGORITHM_DICT[method]()
+            path = alg.segment_path(t, ncp_prior=priors[::-1])
+            self.assertLess(alg.path_evaluations, len(priors))
+            for edges, prior, fitness in zip(path, alg.path_priors, alg.path_fitness):
+                expected = algorithms.ALGORITHM_DICT[method](ncp_prior=prior)
+                np.testing.assert_array_equal(edges, expected.segment(t))
+                self.assertAlmostEqual(fitness, expected.best_fitness, places=6)
+
+    def test_online_PELT(self):
+        # Test that segmenting batches as they arrive gives the same blocks as segmenting all events at once
+        t = yeastCoordinates("chrIV")
+        N = len(np.unique(t))
+        expected = algorithms.PELT(p0=0.05)
+        edges = expected.segment(t)
+        for size in [1, 97, 1000, len(t)]:
+            alg = algorithms.OnlinePELT(p0=0.05, N=N)
+            batches = [alg.update(t[i:i + size]) for i in range(0, len(t), size)]
+            batches.append(alg.finalize())
+            np.testing.assert_array_equal(np.concatenate(batches), edges)
+            self.assertEqual(alg.best_fitness, expected.best_fitness)
+            if size < len(t):
+                # Blocks are returned before the input ends
+                self.assertGreater(len(np.concatenate(batches[:-1])), 1)
+        # Weighted events, with repeated coordinates split across batches
+        x = np.arange(len(t)) % 5
+        alg = algorithms.OnlinePELT(ncp_prior=8)
+        batches = [alg.update(t[i:i + 500], x[i:i + 500]) for i in range(0, len(t), 500)]
+        batches.append(alg.finalize())
+        unique, inverse = np.unique(t[x > 0], return_inverse=True)
+        np.testing.assert_array_equal(
+            np.concatenate(batches),
+            algorithms.PELT(ncp_prior=8).segment(unique, np.bincount(inverse, weights=x[x > 0])),
+        )
+        with self.assertRaises(ValueError):
+            algorithms.OnlinePELT(p0=0.05)
+        alg = algorithms.OnlinePELT(ncp_prior=8)
+        alg.update([10, 20])
+        with self.assertRaises(ValueError):
+            alg.update([15])
+
+    def test_engine(self):
+        with self.assertRaises(ValueError):
+            algorithms.OptimalPartitioning(engine="turbo")
+
+
+if __name__ == "__main__":
+    unittest.main()
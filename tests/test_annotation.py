@@ -1,10 +1,14 @@
 from blockify.parsers import blockify_parser
 import blockify.annotation as annotation
+import blockify.utilities as utilities
 import gzip
 import lzma
+import numpy as np
 import os
+import pandas as pd
 from pybedtools import BedTool
 import sys
+import tempfile
 import unittest
 from urllib.request import Request, urlopen
 
@@ -178,6 +182,29 @@ class TestAnnotation(unittest.TestCase):
 
 
 class TestAnnotationParameters(unittest.TestCase):
+    def test_inputs(self):
+        # Test that call takes exactly one of --input and --inputs, whatever the interpreter's argv
+        args = blockify_parser.parse_args(
+            ["call", "--inputs", "manifest.tsv", "--background", "tests/data/S288C_dSIR4.qbed", "--alpha", "0.05"]
+        )
+        self.assertEqual(args.inputs, "manifest.tsv")
+        self.assertIsNone(args.input)
+        args = blockify_parser.parse_args(
+            ["call", "-i", "tests/data/S288C_CBF1.qbed", "--background", "tests/data/S288C_dSIR4.qbed", "--alpha", "0.05"]
+        )
+        self.assertEqual(args.input, "tests/data/S288C_CBF1.qbed")
+        self.assertIsNone(args.inputs)
+        args = blockify_parser.parse_args(["segment", "-i", "tests/data/S288C_CBF1.qbed"])
+        self.assertEqual(args.input, "tests/data/S288C_CBF1.qbed")
+        for invalid in [
+            ["call", "--background", "tests/data/S288C_dSIR4.qbed", "--alpha", "0.05"],
+            ["call", "-i", "input.qbed", "--inputs", "manifest.tsv", "--background", "bg.qbed", "--alpha", "0.05"],
+            ["segment"],
+            ["segment", "--inputs", "manifest.tsv"],
+        ]:
+            with self.assertRaises(SystemExit):
+                blockify_parser.parse_args(invalid)
+
     def test_pseudocount(self):
         args = blockify_parser.parse_args(
             [
@@ -328,6 +355,76 @@ class TestAnnotationAPI(unittest.TestCase):
         self.assertEqual(len(result), 236)
         self.assertEqual(len(intermediate), 1408)
 
+    def test_summits(self):
+        # Runs of adjacent blocks end at gaps and at changes of chromosome; ties are all kept
+        df = pd.DataFrame(
+            {
+                "chrom": ["chr1", "chr1", "chr1", "chr1", "chr2", "chr2", "chr2"],
+                "start": [0, 10, 20, 40, 20, 30, 40],
+                "end": [10, 20, 30, 50, 30, 40, 50],
+                "negLog10corrected": [1.0, 3.0, 2.0, 1.0, 5.0, 5.0, 4.0],
+                "Net_density": [0.5, 0.1, 0.2, 0.3, 0.1, 0.2, 0.3],
+            }
+        )
+        summits = annotation.getPeakSummits(df)
+        self.assertEqual(list(summits["start"]), [10, 40, 20, 30])
+        summits = annotation.getPeakSummits(df, metric="density")
+        self.assertEqual(list(summits["start"]), [0, 40, 40])
+        self.assertEqual([len(_) for _ in annotation.parcelConsecutiveBlocks(df)], [3, 1, 3])
+
+    def test_zero_background(self):
+        # Test that a block without background events gets a finite p-value with a pseudocount of 0
+        input_bed = BedTool.from_dataframe(
+            pd.DataFrame({"chrom": "chrI", "start": [10, 20, 30, 1010], "end": [11, 21, 31, 1011], "value": 1})
+        )
+        regions_bed = BedTool.from_dataframe(pd.DataFrame({"chrom": "chrI", "start": [0, 1000], "end": [100, 1100]}))
+        background_bed = BedTool.from_dataframe(
+            pd.DataFrame({"chrom": "chrI", "start": [1020, 1030], "end": [1021, 1031], "value": 1})
+        )
+        result, intermediate = annotation.annotate(
+            input_bed, regions_bed, background_bed, intermediate=True, alpha=0.05, correction="bonferroni", pseudocount=0
+        )
+        self.assertEqual(list(intermediate["Background"]), [0, 2])
+        self.assertGreater(intermediate["pValue"].iloc[0], 0)
+        self.assertAlmostEqual(intermediate["negLog10pValue"].iloc[0], utilities.LOG10_FLOAT_MAX)
+        self.assertTrue(np.isfinite(intermediate["negLog10corrected"]).all())
+        self.assertEqual(len(result), 1)
+
+    def test_batch(self):
+        # Test that each sample of a batch gets the peaks of a separate run
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = os.path.join(directory, "manifest.tsv")
+            with open(manifest, "w") as f:
+                f.write("# name\tinput\tregions\n")
+                f.write("CBF1\ttests/data/S288C_CBF1.qbed\ttests/data/S288C_CBF1.blocks\n")
+                f.write("segmented\ttests/data/S288C_CBF1.qbed\n")
+            samples = annotation.readManifest(manifest)
+            self.assertEqual(samples[0], ("CBF1", "tests/data/S288C_CBF1.qbed", "tests/data/S288C_CBF1.blocks"))
+            self.assertIsNone(samples[1][2])
+            # The blocks of CBF1 are those of segmenting its input
+            result, _ = annotation.annotate(
+                BedTool("tests/data/S288C_CBF1.qbed"),
+                BedTool("tests/data/S288C_CBF1.blocks"),
+                BedTool("tests/data/S288C_dSIR4.qbed"),
+                alpha=0.05,
+                correction="bonferroni",
+            )
+            expected = result.to_dataframe()
+            for workers in [1, 2]:
+                summaries = annotation.annotateBatch(
+                    samples,
+                    "tests/data/S288C_dSIR4.qbed",
+                    output_dir=os.path.join(directory, str(workers)),
+                    workers=workers,
+                    alpha=0.05,
+                    correction="bonferroni",
+                )
+                self.assertEqual([name for name, _, _ in summaries], ["CBF1", "segmented"])
+                for name, output, npeaks in summaries:
+                    peaks = BedTool(output).to_dataframe()
+                    self.assertEqual(npeaks, len(expected))
+                    pd.testing.assert_frame_equal(peaks, expected)
+
 
 if __name__ == "__main__":
     unittest.main()
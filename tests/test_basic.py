@@ -1,7 +1,15 @@
+import tests.test_algorithms as test_algorithms
 import tests.test_segmentation as test_segmentation
 import tests.test_normalization as test_normalization
 import tests.test_annotation as test_annotation
 import tests.test_utilities as test_utilities
+import tests.test_readers as test_readers
+import tests.test_profiling as test_profiling
+import tests.test_counting as test_counting
+import tests.test_cache as test_cache
+import tests.test_packing as test_packing
+import tests.test_writers as test_writers
+import tests.test_statistics as test_statistics
 import sys
 import unittest
 
@@ -17,9 +25,21 @@ if not sys.warnoptions:
 basic_tests = unittest.TestSuite()
 loader = unittest.TestLoader()
 
+# Add algorithm tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_algorithms.TestAlgorithms)
+)
+
 # Add segmentation tests
 basic_tests.addTest(test_segmentation.TestSegmentation("test_yeast"))
 basic_tests.addTest(test_segmentation.TestSegmentation("test_uniformity"))
+basic_tests.addTest(test_segmentation.TestSegmentation("test_parallel"))
+basic_tests.addTest(test_segmentation.TestSegmentation("test_weighted"))
+basic_tests.addTest(test_segmentation.TestSegmentation("test_zero_weights"))
+basic_tests.addTest(test_segmentation.TestSegmentation("test_p0_grid"))
+basic_tests.addTest(test_segmentation.TestSegmentation("test_prior_grid"))
+basic_tests.addTest(test_segmentation.TestSegmentation("test_genome_wide"))
+basic_tests.addTest(test_segmentation.TestSegmentation("test_batches"))
 basic_tests.addTests(
     loader.loadTestsFromTestCase(test_segmentation.TestSegmentationParameters)
 )
@@ -50,6 +70,44 @@ basic_tests.addTests(
     loader.loadTestsFromTestCase(test_utilities.TestUtilities)
 )
 
+# Add reader tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_readers.TestReaders)
+)
+
+# Add profiling tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_profiling.TestProfiling)
+)
+
+# Add counting tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_counting.TestCounting)
+)
+
+# Add cache tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_cache.TestCache)
+)
+
+# Add packing tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_packing.TestPacking)
+)
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_packing.TestCountIndex)
+)
+
+# Add writer tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_writers.TestWriters)
+)
+
+# Add statistics tests
+basic_tests.addTests(
+    loader.loadTestsFromTestCase(test_statistics.TestStatistics)
+)
+
 # Run tests
 runner = unittest.TextTestRunner(verbosity=3)
 result = runner.run(basic_tests)
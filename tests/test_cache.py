@@ -0,0 +1,96 @@
+import blockify.cache as cache
+import blockify.profiling as profiling
+import blockify.segmentation as segmentation
+from blockify.parsers import blockify_parser
+import os
+import pandas as pd
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_warm(self):
+        # Test that a warm cache returns an identical segmentation without re-segmenting
+        segmentation_cache = cache.SegmentationCache(self.directory)
+        cold = segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05, cache=segmentation_cache)
+        with profiling.profiled() as profile:
+            warm = segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05, cache=segmentation_cache)
+        self.assertNotIn("segmentation.read", profile.timings)
+        self.assertNotIn("segmentation.segment", profile.timings)
+        pd.testing.assert_frame_equal(cold.df, warm.df)
+        self.assertEqual(cold.priors, warm.priors)
+        self.assertEqual(cold.fitness, warm.fitness)
+        self.assertEqual(cold.nblocks, warm.nblocks)
+        self.assertEqual(warm.total_blocks, 1408)
+        self.assertEqual(warm.total_fitness, cold.total_fitness)
+        self.assertEqual(warm.p0, 0.05)
+        self.assertEqual(warm.compression_ratio, cold.compression_ratio)
+        self.assertEqual(len(warm.blocks), 1408)
+
+    def test_keys(self):
+        # Test that keys depend on the content of the input and the parameters
+        segmentation_cache = cache.SegmentationCache(self.directory)
+        copy = os.path.join(self.directory, "copy.qbed")
+        shutil.copy("tests/data/S288C_CBF1.qbed", copy)
+        key = segmentation_cache.key("tests/data/S288C_CBF1.qbed", "PELT", 0.05, None)
+        self.assertEqual(key, segmentation_cache.key(copy, "PELT", 0.05, None))
+        self.assertNotEqual(key, segmentation_cache.key(copy, "OP", 0.05, None))
+        self.assertNotEqual(key, segmentation_cache.key(copy, "PELT", 0.01, None))
+        self.assertNotEqual(key, segmentation_cache.key(copy, "PELT", None, 5))
+        self.assertNotEqual(key, segmentation_cache.key(copy, "PELT", 0.05, None, weighted=True))
+        with open(copy, "a") as f:
+            f.write("chrXVI\t948000\t948001\t1\t-\n")
+        self.assertNotEqual(key, segmentation_cache.key(copy, "PELT", 0.05, None))
+
+    def test_eviction(self):
+        # Test that least recently used entries are evicted once the cache exceeds its bound
+        segmentation_cache = cache.SegmentationCache(self.directory)
+        arrays = segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05).toArrays()
+        for key in ["a", "b", "c"]:
+            segmentation_cache.save(key, arrays)
+            time.sleep(0.01)
+        entry_size = os.path.getsize(segmentation_cache.path("a"))
+        # Mark "a" as recently used, then shrink the cache to fit two entries
+        self.assertIsNotNone(segmentation_cache.load("a"))
+        segmentation_cache.max_size = 2.5 * entry_size
+        segmentation_cache.save("d", arrays)
+        self.assertIsNotNone(segmentation_cache.load("a"))
+        self.assertIsNone(segmentation_cache.load("b"))
+        self.assertIsNone(segmentation_cache.load("c"))
+        self.assertIsNotNone(segmentation_cache.load("d"))
+        self.assertLessEqual(segmentation_cache.size(), segmentation_cache.max_size)
+
+    def test_command_line(self):
+        args = blockify_parser.parse_args(
+            [
+                "segment",
+                "--input",
+                "tests/data/S288C_CBF1.qbed",
+                "--cache-dir",
+                self.directory,
+            ]
+        )
+        segmentation.segment_from_command_line(args)
+        self.assertEqual(len(cache.cache_from_command_line(args).entries()), 1)
+        result = segmentation.segment_from_command_line(args)
+        self.assertEqual(result.total_blocks, 1408)
+
+
+if __name__ == "__main__":
+    unittest.main()
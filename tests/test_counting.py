@@ -0,0 +1,156 @@
+import blockify.counting as counting
+import numpy as np
+import os
+import pandas as pd
+from pybedtools import BedTool
+import sys
+import time
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+def bruteForceCounts(regions_df, events_df):
+    # Count overlaps one region at a time, treating zero-length intervals as one base long
+    counts = []
+    for region in regions_df.itertuples():
+        region_end = max(region.end, region.start + 1)
+        events = events_df[events_df["chrom"] == region.chrom]
+        event_ends = np.maximum(events["end"], events["start"] + 1)
+        counts.append(int(((events["start"] < region_end) & (event_ends > region.start)).sum()))
+    return np.array(counts)
+
+
+def bruteForceTighten(regions_df, events_df):
+    # Tighten one region at a time: from the first event overlapping it to the
+    # end of the last one (the latest-ending among those that start last)
+    tightened = []
+    for region in regions_df.drop_duplicates().itertuples():
+        region_end = max(region.end, region.start + 1)
+        events = events_df[events_df["chrom"] == region.chrom]
+        event_ends = np.maximum(events["end"], events["start"] + 1)
+        events = events[(events["start"] < region_end) & (event_ends > region.start)]
+        if len(events):
+            last = events[events["start"] == events["start"].max()]
+            tightened.append((region.chrom, events["start"].min(), last["end"].max()))
+    return pd.DataFrame(tightened, columns=["chrom", "start", "end"])
+
+
+class TestCounting(unittest.TestCase):
+    def test_yeast(self):
+        regions_df = BedTool("tests/data/S288C_CBF1.blocks").to_dataframe()
+        events = BedTool("tests/data/S288C_CBF1.qbed")
+        counts = counting.countOverlaps(regions_df, events)
+        self.assertEqual(len(counts), 1408)
+        self.assertEqual(counts[0], 30)
+        np.testing.assert_array_equal(counts, bruteForceCounts(regions_df, events.to_dataframe()))
+
+    def test_overlaps(self):
+        # Test variable-length, nested, and zero-length intervals against a brute-force count
+        rng = np.random.default_rng(0)
+        events = []
+        regions = []
+        for chrom in ["chr1", "chr2", "chr3"]:
+            starts = np.sort(rng.integers(0, 1000, 300))
+            events.append(pd.DataFrame({"chrom": chrom, "start": starts, "end": starts + rng.integers(0, 50, 300)}))
+            starts = np.sort(rng.integers(0, 1000, 100))
+            regions.append(pd.DataFrame({"chrom": chrom, "start": starts, "end": starts + rng.integers(0, 30, 100)}))
+        # chr2 has no events; chr4 has no regions
+        events_df = pd.concat([events[0], events[2], events[2].assign(chrom="chr4")], ignore_index=True)
+        regions_df = pd.concat(regions, ignore_index=True)
+        counts = counting.countOverlaps(regions_df, BedTool.from_dataframe(events_df))
+        np.testing.assert_array_equal(counts, bruteForceCounts(regions_df, events_df))
+        self.assertEqual(counts[regions_df["chrom"] == "chr2"].sum(), 0)
+
+    def test_many_contigs(self):
+        # Test that regions on many contigs, in any order, are counted without scanning every region per contig
+        n = 20000
+        contigs = np.array(["contig%05d" % i for i in range(n)])
+        events_df = pd.DataFrame({"chrom": np.repeat(contigs, 3), "start": np.tile([10, 20, 30], n)})
+        events_df["end"] = events_df["start"] + 1
+        regions_df = pd.DataFrame({"chrom": np.repeat(contigs, 2), "start": np.tile([0, 25], n), "end": np.tile([25, 100], n)})
+        regions_df = regions_df.sample(frac=1, random_state=0)
+        start = time.perf_counter()
+        counts = counting.countOverlaps(regions_df, BedTool.from_dataframe(events_df))
+        self.assertLess(time.perf_counter() - start, 10)
+        np.testing.assert_array_equal(counts, np.where(regions_df["start"] == 0, 2, 1))
+
+    def test_iter_overlaps(self):
+        # Test that per-chromosome counts match those of countOverlaps, including chromosomes without events
+        rng = np.random.default_rng(1)
+        events = []
+        regions = []
+        for chrom in ["chr1", "chr2", "chr3"]:
+            starts = np.sort(rng.integers(0, 1000, 300))
+            events.append(pd.DataFrame({"chrom": chrom, "start": starts, "end": starts + rng.integers(0, 50, 300)}))
+            starts = np.sort(rng.integers(0, 1000, 100))
+            regions.append(pd.DataFrame({"chrom": chrom, "start": starts, "end": starts + rng.integers(0, 30, 100)}))
+        events_df = pd.concat([events[0].assign(chrom="chr0"), events[0], events[2]], ignore_index=True)
+        regions_df = pd.concat(regions, ignore_index=True)
+        events_bed = BedTool.from_dataframe(events_df)
+        chunks = list(counting.iterOverlaps(regions_df, events_bed))
+        self.assertEqual([(i, j) for i, j, _ in chunks], [(0, 100), (100, 200), (200, 300)])
+        np.testing.assert_array_equal(
+            np.concatenate([counts for _, _, counts in chunks]),
+            counting.countOverlaps(regions_df, events_bed),
+        )
+
+    def test_tighten(self):
+        # Test variable-length, nested, and zero-length intervals against a brute-force tightening
+        rng = np.random.default_rng(2)
+        events = []
+        regions = []
+        for chrom in ["chr1", "chr2", "chr3"]:
+            starts = np.sort(rng.integers(0, 1000, 300))
+            events.append(pd.DataFrame({"chrom": chrom, "start": starts, "end": starts + rng.integers(0, 50, 300)}))
+            starts = np.sort(rng.integers(0, 1000, 100))
+            regions.append(pd.DataFrame({"chrom": chrom, "start": starts, "end": starts + rng.integers(0, 30, 100)}))
+        # chr2 has no events, so none of its regions are kept
+        events_df = pd.concat([events[0], events[2]], ignore_index=True)
+        regions_df = pd.concat(regions, ignore_index=True)
+        tight_df = counting.tightenRegions(regions_df, BedTool.from_dataframe(events_df))
+        pd.testing.assert_frame_equal(tight_df, bruteForceTighten(regions_df, events_df), check_dtype=False)
+        self.assertNotIn("chr2", tight_df["chrom"].values)
+
+    def test_tighten_yeast(self):
+        regions_df = BedTool("tests/data/S288C_CBF1.blocks").to_dataframe()
+        events = BedTool("tests/data/S288C_CBF1.qbed")
+        tight_df = counting.tightenRegions(regions_df, events)
+        # The one block without any event is dropped; the others keep all of their events
+        counts = counting.countOverlaps(regions_df, events)
+        self.assertEqual(len(tight_df), 1407)
+        np.testing.assert_array_equal(counting.countOverlaps(tight_df, events), counts[counts > 0])
+
+    def test_event_index(self):
+        # Test that events loaded once are counted like the BedTool object they were loaded from
+        regions_df = BedTool("tests/data/S288C_CBF1.blocks").to_dataframe()
+        events = BedTool("tests/data/S288C_CBF1.qbed")
+        index = counting.EventIndex(events)
+        self.assertEqual(len(index), len(events.to_dataframe()))
+        np.testing.assert_array_equal(counting.countOverlaps(regions_df, index), counting.countOverlaps(regions_df, events))
+        pd.testing.assert_frame_equal(counting.tightenRegions(regions_df, index), counting.tightenRegions(regions_df, events))
+        with self.assertRaises(ValueError):
+            counting.countOverlaps(regions_df, index, backend="bedtools")
+
+    def test_in_memory(self):
+        # Test that in-memory BedTool objects are counted like file-based ones
+        regions_df = BedTool("tests/data/S288C_CBF1.blocks").to_dataframe()
+        events = BedTool("tests/data/S288C_CBF1.qbed")
+        np.testing.assert_array_equal(
+            counting.countOverlaps(regions_df, events),
+            counting.countOverlaps(regions_df, BedTool(str(events), from_string=True)),
+        )
+
+    def test_backend(self):
+        regions_df = BedTool("tests/data/S288C_CBF1.blocks").to_dataframe()
+        with self.assertRaises(ValueError):
+            counting.countOverlaps(regions_df, BedTool("tests/data/S288C_CBF1.qbed"), backend="turbo")
+
+
+if __name__ == "__main__":
+    unittest.main()
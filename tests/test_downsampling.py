@@ -1,5 +1,7 @@
 from blockify.parsers import blockify_parser
 import blockify.downsampling as downsampling
+import blockify.utilities as utilities
+import numpy as np
 import os
 import pandas as pd
 import sys
@@ -24,6 +26,8 @@ class TestDownsampling(unittest.TestCase):
                 "10000",
                 "--seed",
                 "0",
+                "--engine",
+                "legacy",
             ]
         )
         result = downsampling.downsample_from_command_line(args)
@@ -40,11 +44,29 @@ class TestDownsampling(unittest.TestCase):
                 "--seed",
                 "0",
                 "--naive",
+                "--engine",
+                "legacy",
             ]
         )
         result = downsampling.downsample_from_command_line(args)
         self.assertEqual(result.to_dataframe()["start"][0], 2118)
 
+    def test_yeast_exponential(self):
+        args = blockify_parser.parse_args(
+            [
+                "downsample",
+                "--input",
+                "tests/data/S288C_dSIR4.qbed",
+                "-n",
+                "10000",
+                "--seed",
+                "0",
+            ]
+        )
+        result = downsampling.downsample_from_command_line(args).to_dataframe()
+        self.assertEqual(len(result), 10000)
+        self.assertEqual(result["start"][0], 1517)
+
 
 class TestDownsamplingAPI(unittest.TestCase):
     def test_downsampling_API_normal(self):
@@ -52,7 +74,8 @@ class TestDownsamplingAPI(unittest.TestCase):
             pd.read_table("tests/data/S288C_dSIR4.qbed", header=None),
             10000,
             seed=0,
-            naive=False
+            naive=False,
+            engine="legacy",
         )
         self.assertEqual(result.to_dataframe()["start"][0], 2091)
 
@@ -61,10 +84,39 @@ class TestDownsamplingAPI(unittest.TestCase):
             pd.read_table("tests/data/S288C_dSIR4.qbed", header=None),
             10000,
             seed=0,
-            naive=True
+            naive=True,
+            engine="legacy",
         )
         self.assertEqual(result.to_dataframe()["start"][0], 2118)
 
+    def test_exponential(self):
+        # Test that chunked sampling draws the same rows, in file order, and that
+        # inclusion probabilities are proportional to weights
+        input_file = pd.read_table("tests/data/S288C_dSIR4.qbed", header=None)
+        chunks = [input_file.iloc[i:i + 7000] for i in range(0, len(input_file), 7000)]
+        result = downsampling.downsample(input_file, 10000, seed=np.random.default_rng(1)).to_dataframe()
+        chunked = downsampling.downsample(chunks, 10000, seed=np.random.default_rng(1)).to_dataframe()
+        pd.testing.assert_frame_equal(result, chunked)
+        self.assertTrue(utilities.isSortedArrays(result["chrom"].values, result["start"].values))
+        weights = pd.DataFrame({0: "chr1", 1: np.arange(4), 2: np.arange(1, 5), 3: [1, 2, 3, 4]})
+        rng = np.random.default_rng(0)
+        counts = np.zeros(4)
+        for _ in range(4000):
+            counts[downsampling.sampleExponential([weights], 1, rng)[1].values] += 1
+        np.testing.assert_allclose(counts / counts.sum(), [0.1, 0.2, 0.3, 0.4], atol=0.03)
+
+    def test_zero_weights(self):
+        # Rows with a weight of 0 are never sampled
+        input_file = pd.DataFrame({0: "chr1", 1: np.arange(4), 2: np.arange(1, 5), 3: [0, 1, 0, 1]})
+        result = downsampling.downsample(input_file, 2, seed=0).to_dataframe()
+        self.assertEqual(list(result["start"]), [1, 3])
+        with self.assertRaises(AssertionError):
+            downsampling.downsample(input_file, 3, seed=0)
+
+    def test_engine(self):
+        with self.assertRaises(ValueError):
+            downsampling.downsample(pd.read_table("tests/data/S288C_dSIR4.qbed", header=None), 10, engine="alias")
+
 
 if __name__ == "__main__":
     unittest.main()
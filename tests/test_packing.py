@@ -0,0 +1,152 @@
+import blockify.counting as counting
+import blockify.normalization as normalization
+import blockify.packing as packing
+import blockify.readers as readers
+import blockify.segmentation as segmentation
+import blockify.utilities as utilities
+from blockify.parsers import blockify_parser
+import numpy as np
+import os
+import pandas as pd
+from pybedtools import BedTool
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+class TestPacking(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.packed = os.path.join(self.directory, "S288C_CBF1.pack")
+        packing.pack("tests/data/S288C_CBF1.qbed", self.packed)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        # Test that the packed store holds the same events as the text file
+        self.assertTrue(readers.isPacked(self.packed))
+        self.assertFalse(readers.isPacked("tests/data/S288C_CBF1.qbed"))
+        packed = readers.PackedEvents(self.packed)
+        self.assertEqual(len(packed), 34814)
+        self.assertTrue(packed.weighted)
+        text = list(readers.iterChromosomes("tests/data/S288C_CBF1.qbed", value=True))
+        self.assertEqual(packed.chroms, [events.chrom for events in text])
+        for events, mapped in zip(text, packed.iterChromosomes(value=True)):
+            self.assertEqual(mapped.start.dtype, np.int32)
+            self.assertTrue((events.start == mapped.start).all())
+            self.assertTrue((events.end == mapped.end).all())
+            self.assertTrue((events.value == mapped.value).all())
+        df = pd.read_table("tests/data/S288C_CBF1.qbed", header=None).iloc[:, :4]
+        pd.testing.assert_frame_equal(df, packed.toDataFrame(), check_dtype=False)
+        self.assertLess(os.path.getsize(self.packed), os.path.getsize("tests/data/S288C_CBF1.qbed"))
+
+    def test_unweighted(self):
+        # Test that files without a value column are packed with unit values
+        path = os.path.join(self.directory, "regions.pack")
+        self.assertFalse(readers.hasValueColumn("tests/data/S288C_CBF1.blocks"))
+        packing.pack("tests/data/S288C_CBF1.blocks", path)
+        packed = readers.PackedEvents(path)
+        self.assertFalse(packed.weighted)
+        self.assertTrue((packed.toDataFrame()[3] == 1).all())
+
+    def test_unsorted(self):
+        # Test that unsorted input is rejected without leaving a partial store behind
+        path = os.path.join(self.directory, "unsorted.pack")
+        with self.assertRaises(AssertionError):
+            packing.pack("tests/data/test_uniform_unsorted.qbed", path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_segmentation(self):
+        text = segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05)
+        packed = segmentation.segment(BedTool(self.packed), "PELT", p0=0.05)
+        pd.testing.assert_frame_equal(text.df, packed.df)
+        self.assertEqual(text.fitness, packed.fitness)
+        weighted = segmentation.segment(self.packed, "PELT", p0=0.05, weighted=True)
+        self.assertEqual(
+            weighted.total_blocks,
+            segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05, weighted=True).total_blocks,
+        )
+
+    def test_counting(self):
+        regions = segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05).df
+        regions.columns = ["chrom", "start", "end"]
+        self.assertTrue(
+            (
+                counting.countOverlaps(regions, BedTool("tests/data/S288C_CBF1.qbed"))
+                == counting.countOverlaps(regions, BedTool(self.packed))
+            ).all()
+        )
+        self.assertEqual(utilities.countEvents(BedTool(self.packed)), 34814)
+        self.assertTrue(utilities.isSortedBEDObject(BedTool(self.packed)))
+
+    def test_normalization(self):
+        text = normalization.normalize(
+            BedTool("tests/data/S288C_CBF1.qbed"), BedTool("tests/data/S288C_CBF1.qbed"), 10 ** 6, None
+        )
+        packed = normalization.normalize(
+            BedTool(self.packed), BedTool("tests/data/S288C_CBF1.qbed"), 10 ** 6, None
+        )
+        pd.testing.assert_frame_equal(text.to_dataframe(), packed.to_dataframe())
+
+    def test_command_line(self):
+        path = os.path.join(self.directory, "index.pack")
+        args = blockify_parser.parse_args(["index", "-i", "tests/data/S288C_CBF1.qbed", "-o", path])
+        packing.pack_from_command_line(args)
+        with open(path, "rb") as f, open(self.packed, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+
+class TestCountIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.background = os.path.join(self.directory, "S288C_dSIR4.qbed")
+        shutil.copy("tests/data/S288C_dSIR4.qbed", self.background)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_counts(self):
+        # Test that counts from the index match those from the file, including zero-length regions
+        # and chromosomes without events
+        regions_df = BedTool("tests/data/S288C_CBF1.blocks").to_dataframe()
+        regions_df = pd.concat(
+            [regions_df, pd.DataFrame({"chrom": ["chrZ"], "start": [0], "end": [100]})], ignore_index=True
+        )
+        regions_df.loc[::7, "end"] = regions_df.loc[::7, "start"]
+        expected = counting.countOverlaps(regions_df, BedTool(self.background))
+        index = packing.precount(self.background)
+        self.assertTrue(os.path.isfile(self.background + readers.COUNT_INDEX_EXTENSION))
+        self.assertEqual(len(index), 84109)
+        self.assertIsNotNone(counting.findCountIndex(BedTool(self.background)))
+        np.testing.assert_array_equal(counting.countOverlaps(regions_df, BedTool(self.background)), expected)
+        np.testing.assert_array_equal(
+            np.concatenate([counts for _, _, counts in counting.iterOverlaps(regions_df, BedTool(self.background))]),
+            expected,
+        )
+        self.assertEqual(utilities.countEvents(BedTool(self.background)), 84109)
+
+    def test_stale(self):
+        # Test that the index is ignored once the file changes
+        packing.precount(self.background)
+        with open(self.background, "a") as f:
+            f.write("chrXVI\t948000\t948001\t1\t-\n")
+        self.assertIsNone(readers.findCountIndex(self.background))
+        self.assertEqual(utilities.countEvents(BedTool(self.background)), 84110)
+
+    def test_command_line(self):
+        args = blockify_parser.parse_args(["precount", "-i", self.background])
+        packing.precount_from_command_line(args)
+        self.assertEqual(len(readers.findCountIndex(self.background)), 84109)
+
+
+if __name__ == "__main__":
+    unittest.main()
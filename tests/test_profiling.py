@@ -0,0 +1,85 @@
+import blockify.profiling as profiling
+import blockify.segmentation as segmentation
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestProfiling(unittest.TestCase):
+    def test_segmentation(self):
+        # Test that segmentation stages and per-chromosome event counts are recorded
+        with profiling.profiled() as profile:
+            segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05)
+        for name in ["segmentation.validate", "segmentation.read", "segmentation.segment", "segmentation.finalize"]:
+            self.assertIn(name, profile.timings)
+        self.assertEqual(profile.calls["segmentation.segment"], 17)
+        events = profile.events["segmentation.segment"]
+        self.assertEqual(len(events), 17)
+        self.assertEqual(sum(events.values()), 34814)
+        self.assertGreater(profile.total, 0)
+        self.assertLessEqual(sum(profile.timings.values()), profile.total)
+
+    def test_save(self):
+        with profiling.profiled() as profile:
+            with profiling.stage("a"):
+                pass
+            with profiling.stage("a"):
+                pass
+            profiling.count("a", "chrI", 10)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "timings.json")
+            profile.save(path)
+            with open(path) as f:
+                saved = json.load(f)
+        self.assertEqual(saved["stages"][0]["name"], "a")
+        self.assertEqual(saved["stages"][0]["calls"], 2)
+        self.assertEqual(saved["events"], {"a": {"chrI": 10}})
+
+    def test_inactive(self):
+        # Test that stages are not recorded outside of a profiled block
+        with profiling.profiled() as profile:
+            pass
+        with profiling.stage("a"):
+            profiling.count("a", "chrI", 10)
+        self.assertEqual(len(profile.timings), 0)
+        self.assertEqual(len(profile.events), 0)
+
+    def test_progress(self):
+        # Test that progress is reported through the blockify logger with structured fields
+        handler = RecordingHandler()
+        profiling.logger.addHandler(handler)
+        level = profiling.logger.level
+        profiling.logger.setLevel(logging.INFO)
+        try:
+            segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05)
+        finally:
+            profiling.logger.removeHandler(handler)
+            profiling.logger.setLevel(level)
+        processing = [_ for _ in handler.records if hasattr(_, "index")]
+        self.assertEqual(len(processing), 17)
+        self.assertEqual(processing[0].chrom, "chrI")
+        self.assertEqual(processing[-1].getMessage(), "[17/17] Processing chrXVI")
+        self.assertEqual(sum(_.blocks for _ in handler.records if hasattr(_, "blocks")), 1408)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import blockify.readers as readers
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+class TestReaders(unittest.TestCase):
+    def test_chunks(self):
+        # Test that chromosomes spanning several chunks are read in full
+        whole = readers.readCoordinates("tests/data/S288C_CBF1.qbed")
+        chunked = readers.readCoordinates("tests/data/S288C_CBF1.qbed", chunksize=1000)
+        self.assertEqual(list(whole), list(chunked))
+        self.assertEqual(sum(len(_) for _ in chunked.values()), 34814)
+        for chrom in whole:
+            self.assertTrue((whole[chrom] == chunked[chrom]).all())
+
+    def test_weights(self):
+        coordinates, weights = readers.readWeightedCoordinates("tests/data/S288C_CBF1.qbed", chunksize=1000)
+        self.assertEqual(list(coordinates), list(weights))
+        self.assertEqual(sum(len(_) for _ in weights.values()), 34814)
+        self.assertEqual(weights["chrI"][0], 4)
+        self.assertEqual(coordinates["chrI"][0], 1643)
+
+    def test_gzip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "S288C_CBF1.qbed")
+            with open("tests/data/S288C_CBF1.qbed", "rb") as f, gzip.open(path, "wb") as g:
+                shutil.copyfileobj(f, g)
+            coordinates = readers.readCoordinates(path)
+        self.assertEqual(len(coordinates), 17)
+        self.assertEqual(sum(len(_) for _ in coordinates.values()), 34814)
+
+    def test_sorted(self):
+        self.assertTrue(readers.isSortedFile("tests/data/test_uniform_sorted.qbed"))
+        self.assertFalse(readers.isSortedFile("tests/data/test_uniform_unsorted.qbed"))
+        self.assertFalse(readers.isSortedFile("tests/data/test_uniform_unsorted.qbed", chunksize=5))
+
+    def test_track_line(self):
+        # Test that UCSC track and browser lines before the first record are skipped
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "S288C_CBF1.qbed")
+            with open("tests/data/S288C_CBF1.qbed") as f, open(path, "w") as g:
+                g.write("track name=CBF1 description=\"CBF1 insertions\"\nbrowser position chrI:1-1000\n")
+                shutil.copyfileobj(f, g)
+            with open(path, "rb") as f, gzip.open(path + ".gz", "wb") as g:
+                shutil.copyfileobj(f, g)
+            expected, expected_weights = readers.readWeightedCoordinates("tests/data/S288C_CBF1.qbed")
+            for name in [path, path + ".gz"]:
+                coordinates, weights = readers.readWeightedCoordinates(name, chunksize=1000)
+                self.assertEqual(list(coordinates), list(expected))
+                for chrom in expected:
+                    self.assertTrue((coordinates[chrom] == expected[chrom]).all())
+                    self.assertTrue((weights[chrom] == expected_weights[chrom]).all())
+                self.assertTrue(readers.hasValueColumn(name))
+                self.assertTrue(readers.isSortedFile(name))
+
+    def test_count_records(self):
+        # Test headers, comments, blank lines, a missing final newline, gzip, and lines split across blocks
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "records.qbed")
+            with open(path, "w") as f:
+                f.write("track name=test\nbrowser position chrI:1-100\n#comment\n")
+                f.write("chrI\t1\t2\t3\t+\n\n#comment\nchrI\t5\t6\t1\t-\nchrII\t1\t2\t2\t+")
+            for blocksize in [1, 7, readers.COUNT_BLOCKSIZE]:
+                self.assertEqual(readers.countRecords(path, blocksize=blocksize), 3)
+            self.assertEqual(readers.librarySize(path, weighted=True), 6)
+            with open(path, "rb") as f, gzip.open(path + ".gz", "wb") as g:
+                g.write(f.read())
+            self.assertEqual(readers.librarySize(path + ".gz"), 3)
+            self.assertEqual(readers.countRecords(os.devnull), 0)
+            # Library sizes are cached until the file changes
+            self.assertEqual(readers.librarySize("tests/data/S288C_CBF1.qbed"), 34814)
+            with open(path, "a") as f:
+                f.write("\nchrII\t7\t8\t4\t+\n")
+            self.assertEqual(readers.librarySize(path), 4)
+            self.assertEqual(readers.librarySize(path, weighted=True), 10)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,12 @@ from blockify.parsers import blockify_parser
 from blockify.parsers import DEFAULT_SEGMENTATION_P0
 import blockify.segmentation as segmentation
 import gzip
+import numpy as np
 import os
+import pandas as pd
 from pybedtools import BedTool
 import sys
+import tempfile
 import unittest
 from urllib.request import urlopen
 
@@ -104,6 +107,8 @@ class TestSegmentation(unittest.TestCase):
         )
         result = segmentation.segment_from_command_line(args)
         self.assertEqual(result.total_blocks, 1)
+        # Evenly spaced events collapse into a handful of cells
+        self.assertGreater(result.compression_ratio, 10)
 
     def test_equivalence(self):
         # Test that segmenting using OP or PELT yield the same segmentation
@@ -131,6 +136,164 @@ class TestSegmentation(unittest.TestCase):
         # The fitness calculation is identical between the algorithms, except for a sign change
         self.assertEqual(result_OP.total_fitness, -result_PELT.total_fitness)
 
+    def test_parallel(self):
+        # Test that segmenting chromosomes in parallel matches the serial segmentation
+        args = blockify_parser.parse_args(
+            [
+                "segment",
+                "--input",
+                "tests/data/S288C_CBF1.qbed",
+                "--threads",
+                "2",
+            ]
+        )
+        result = segmentation.segment_from_command_line(args)
+        self.assertEqual(result.total_blocks, 1408)
+        self.assertAlmostEqual(result.total_fitness, 99777.41540439503)
+        self.assertEqual(list(result.priors), list(result.df[0].unique()))
+
+    def test_weighted(self):
+        # Test that weighting events by the value column matches expanding each event into that many rows
+        df = pd.read_table("tests/data/S288C_CBF1.qbed", header=None)
+        df = df[df[0].isin(["chrI", "chrII", "chrIII"])]
+        with tempfile.TemporaryDirectory() as tmp:
+            weighted_path = os.path.join(tmp, "weighted.qbed")
+            expanded_path = os.path.join(tmp, "expanded.qbed")
+            df.to_csv(weighted_path, sep="\t", header=False, index=False)
+            df.loc[df.index.repeat(df[3])].to_csv(expanded_path, sep="\t", header=False, index=False)
+            args = blockify_parser.parse_args(
+                [
+                    "segment",
+                    "--input",
+                    weighted_path,
+                    "--weighted",
+                ]
+            )
+            weighted = segmentation.segment_from_command_line(args)
+            expanded = segmentation.segment(expanded_path, "PELT", p0=DEFAULT_SEGMENTATION_P0)
+            in_memory = segmentation.segment(BedTool(weighted_path), "PELT", p0=DEFAULT_SEGMENTATION_P0, weighted=True)
+        pd.testing.assert_frame_equal(weighted.df, expanded.df)
+        pd.testing.assert_frame_equal(in_memory.df, expanded.df)
+        self.assertEqual(weighted.total_fitness, expanded.total_fitness)
+
+    def test_zero_weights(self):
+        # Test that events of zero weight are ignored
+        t, x = segmentation.aggregateWeights(np.array([5, 1, 5, 3, 7]), np.array([1, 2, 3, 0, 0]))
+        np.testing.assert_array_equal(t, [1, 5])
+        np.testing.assert_array_equal(x, [2, 4])
+        with self.assertRaises(AssertionError):
+            segmentation.aggregateWeights(np.array([1, 2]), np.array([1, -1]))
+
+    def test_p0_grid(self):
+        # Test that a p0 sweep matches segmenting separately for each p0
+        args = blockify_parser.parse_args(
+            [
+                "segment",
+                "--input",
+                "tests/data/S288C_CBF1.qbed",
+                "--p0-grid",
+                "0.1",
+                "0.01",
+                "0.05",
+            ]
+        )
+        results = segmentation.segment_path_from_command_line(args)
+        for p0, result in zip(args.p0_grid, results):
+            expected = segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=p0)
+            pd.testing.assert_frame_equal(result.df, expected.df)
+            self.assertEqual(result.priors, expected.priors)
+            self.assertAlmostEqual(result.total_fitness, expected.total_fitness)
+        summary = segmentation.pathToDF(args.p0_grid, results)
+        self.assertEqual(list(summary["p0"]), [0.1, 0.01, 0.05])
+        self.assertEqual(summary["blocks"][2], 1408)
+        self.assertAlmostEqual(summary["fitness"][2], 99777.41540439503)
+
+    def test_prior_grid(self):
+        results = segmentation.segment_path("tests/data/S288C_CBF1.qbed", "OP", priors=[5, 10], workers=2)
+        for prior, result in zip([5, 10], results):
+            expected = segmentation.segment("tests/data/S288C_CBF1.qbed", "OP", prior=prior)
+            pd.testing.assert_frame_equal(result.df, expected.df)
+            self.assertAlmostEqual(result.total_fitness, expected.total_fitness)
+
+    def test_genome_wide(self):
+        # Test that a genome-wide segmentation matches segmenting each chromosome with the genome-wide prior
+        args = blockify_parser.parse_args(
+            [
+                "segment",
+                "--input",
+                "tests/data/S288C_CBF1.qbed",
+                "--genome-wide",
+            ]
+        )
+        result = segmentation.segment_from_command_line(args)
+        coordinates, _ = segmentation.readInputCoordinates("tests/data/S288C_CBF1.qbed")
+        n_cells = sum(len(np.unique(_)) for _ in coordinates.values())
+        prior = segmentation.algorithms.PELT(p0=DEFAULT_SEGMENTATION_P0).p0_prior(n_cells)
+        self.assertEqual(set(result.priors.values()), {prior})
+        self.assertEqual(sum(result.cells.values()), n_cells)
+        for method in ["PELT", "OP"]:
+            expected = segmentation.segment("tests/data/S288C_CBF1.qbed", method, prior=prior)
+            if method == "OP":
+                result = segmentation.segment("tests/data/S288C_CBF1.qbed", method, prior=prior, genome_wide=True)
+            pd.testing.assert_frame_equal(result.df, expected.df)
+            self.assertAlmostEqual(result.total_fitness, expected.total_fitness)
+        # Weighted events, with a chromosome whose events all have zero weight
+        df = pd.read_table("tests/data/S288C_CBF1.qbed", header=None)
+        df = df[df[0].isin(["chrI", "chrII", "chrIII"])].copy()
+        df.loc[df[0] == "chrII", 3] = 0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "weighted.qbed")
+            df.to_csv(path, sep="\t", header=False, index=False)
+            result = segmentation.segment(path, "PELT", prior=10, weighted=True, genome_wide=True)
+            expected = segmentation.segment(path, "PELT", prior=10, weighted=True)
+        self.assertEqual(list(result.priors), ["chrI", "chrIII"])
+        pd.testing.assert_frame_equal(result.df, expected.df)
+        self.assertAlmostEqual(result.total_fitness, expected.total_fitness)
+
+    def test_batches(self):
+        # Test that batches of small contigs are segmented as if each contig was segmented on its own
+        rng = np.random.default_rng(0)
+        contigs = []
+        for i in range(300):
+            starts = np.sort(rng.integers(0, 1000, rng.integers(1, 30)))
+            contigs.append(
+                pd.DataFrame({0: "contig{:03d}".format(i), 1: starts, 2: starts + 1, 3: rng.integers(0, 3, len(starts))})
+            )
+        df = pd.concat(contigs)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "contigs.qbed")
+            df.to_csv(path, sep="\t", header=False, index=False)
+            coordinates, weights = segmentation.readInputCoordinates(BedTool(path), weighted=True)
+            expected_coordinates, expected_weights = segmentation.readInputCoordinates(path, weighted=True)
+            self.assertEqual(list(coordinates), list(expected_coordinates))
+            for chrom in coordinates:
+                np.testing.assert_array_equal(coordinates[chrom], expected_coordinates[chrom])
+                np.testing.assert_array_equal(weights[chrom], expected_weights[chrom])
+            self.assertEqual(segmentation.batchChromosomes(coordinates), [list(coordinates)])
+            self.assertEqual(segmentation.batchChromosomes(coordinates, small=1), [[_] for _ in coordinates])
+            batches = segmentation.batchChromosomes(coordinates, size=100)
+            self.assertEqual(sum(batches, []), list(coordinates))
+            self.assertTrue(all(sum(len(coordinates[_]) for _ in batch[:-1]) < 100 for batch in batches))
+            for weighted in [False, True]:
+                chunks = []
+                result = segmentation.segment(path, "PELT", p0=DEFAULT_SEGMENTATION_P0, weighted=weighted, callback=chunks.append)
+                parallel = segmentation.segment(path, "PELT", p0=DEFAULT_SEGMENTATION_P0, weighted=weighted, workers=2)
+                self.assertLess(len(chunks), 300)
+                pd.testing.assert_frame_equal(pd.concat(chunks).reset_index(drop=True).astype({0: str}), result.df.astype({0: str}))
+                pd.testing.assert_frame_equal(parallel.df, result.df)
+                alg = segmentation.algorithms.PELT(p0=DEFAULT_SEGMENTATION_P0)
+                for chrom in coordinates:
+                    boundaries, prior, fitness, cells = segmentation.segmentChromosome(
+                        alg, coordinates[chrom], weights[chrom] if weighted else None
+                    )
+                    if len(boundaries) > 1:
+                        np.testing.assert_array_equal(result.df[result.df[0] == chrom][1], boundaries[:-1].astype(np.int64))
+                        self.assertEqual(result.priors[chrom], prior)
+                        self.assertEqual(result.fitness[chrom], fitness)
+                        self.assertEqual(result.cells[chrom], cells[0])
+                    else:
+                        self.assertNotIn(chrom, result.priors)
+
 
 class TestSegmentationParameters(unittest.TestCase):
     def test_p0(self):
@@ -159,6 +322,19 @@ class TestSegmentationParameters(unittest.TestCase):
         with self.assertRaises(AssertionError):
             segmentation.segment_from_command_line(args)
 
+    def test_threads(self):
+        args = blockify_parser.parse_args(
+            [
+                "segment",
+                "--input",
+                "tests/data/S288C_CBF1.qbed",
+                "--threads",
+                "0",
+            ]
+        )
+        with self.assertRaises(AssertionError):
+            segmentation.segment_from_command_line(args)
+
 
 class TestSegmentationAPI(unittest.TestCase):
     def test_segmentation_API(self):
@@ -171,6 +347,30 @@ class TestSegmentationAPI(unittest.TestCase):
         self.assertEqual(result.total_blocks, 1408)
         self.assertAlmostEqual(result.total_fitness, 99777.41540439503)
 
+    def test_segmentation_df(self):
+        # Test that blocks are stored as a compact columnar table
+        result = segmentation.segment(
+            "tests/data/S288C_CBF1.qbed",
+            "PELT",
+            p0=DEFAULT_SEGMENTATION_P0,
+        )
+        self.assertEqual(len(result.df), 1408)
+        self.assertEqual(result.df[0].dtype.name, "category")
+        self.assertEqual(list(result.df[0].cat.categories), list(result.nblocks))
+        self.assertEqual(result.df[1].dtype.name, "int64")
+        self.assertEqual(result.df[2].dtype.name, "int64")
+
+    def test_segmentation_API_path(self):
+        # Test that segmenting a file path (streamed, without pybedtools) gives the same result
+        result = segmentation.segment(
+            "tests/data/S288C_CBF1.qbed",
+            "PELT",
+            p0=DEFAULT_SEGMENTATION_P0,
+            prior=None
+        )
+        self.assertEqual(result.total_blocks, 1408)
+        self.assertAlmostEqual(result.total_fitness, 99777.41540439503)
+
 
 if __name__ == "__main__":
     unittest.main()
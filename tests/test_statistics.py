@@ -0,0 +1,73 @@
+import blockify.statistics as statistics
+import numpy as np
+import os
+import scipy.special as special
+import scipy.stats as stats
+import statsmodels.stats.multitest as multitest
+import sys
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+class TestStatistics(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = rng.integers(0, 1000, 5000).astype(float)
+        self.mu = rng.uniform(0.5, 1000, 5000)
+
+    def test_upper_tail(self):
+        log_p = statistics.logPoissonUpperTail(self.x, self.mu)
+        p = stats.poisson.sf(self.x - 1, self.mu)
+        # Where scipy does not underflow, the p-values are the same
+        representable = p > 1e-280
+        np.testing.assert_allclose(log_p[representable], np.log(p[representable]), rtol=1e-12)
+        # Deep in the tail, compare with a direct sum of the probabilities
+        for i in np.flatnonzero(~representable)[:20]:
+            expected = special.logsumexp(stats.poisson.logpmf(np.arange(self.x[i], self.x[i] + 2000), self.mu[i]))
+            self.assertAlmostEqual(log_p[i] / expected, 1, places=12)
+        self.assertTrue(np.isfinite(log_p).all())
+        # Events that cannot happen under the null get the smallest positive p-value, as in earlier versions
+        np.testing.assert_array_equal(statistics.logPoissonUpperTail([0, 1], [0, 0]), [0, statistics.LOG_P_MIN])
+        self.assertAlmostEqual(statistics.negLog10(statistics.LOG_P_MIN), statistics.utilities.LOG10_FLOAT_MAX)
+        self.assertGreater(np.exp(statistics.LOG_P_MIN), 0)
+
+    def test_lower_tail(self):
+        log_p = statistics.logPoissonLowerTail(self.x, self.mu)
+        p = stats.poisson.cdf(self.x, self.mu)
+        representable = p > 1e-280
+        np.testing.assert_allclose(log_p[representable], np.log(p[representable]), rtol=1e-12)
+        for i in np.flatnonzero(~representable)[:20]:
+            expected = special.logsumexp(stats.poisson.logpmf(np.arange(self.x[i] + 1), self.mu[i]))
+            self.assertAlmostEqual(log_p[i] / expected, 1, places=12)
+        self.assertTrue(np.isfinite(log_p).all())
+
+    def test_p_values(self):
+        # Test that p-values too small for a float are reported as 1 / FLOAT_MAX, as in earlier versions, rather than 0
+        log_p = statistics.logPoissonUpperTail([0, 5, 1000], [1, 1, 1])
+        self.assertLess(log_p[-1], np.log(np.finfo(np.float64).tiny) - 50)
+        p = statistics.pValues(log_p)
+        np.testing.assert_allclose(p[:2], np.exp(log_p[:2]))
+        self.assertEqual(p[-1], 1 / statistics.utilities.FLOAT_MAX)
+        self.assertTrue(np.isfinite(statistics.negLog10(log_p)).all())
+
+    def test_corrections(self):
+        # Test that rejections and corrected p-values match those of statsmodels
+        rng = np.random.default_rng(1)
+        p = np.concatenate([rng.uniform(0, 1, 2000), rng.uniform(0, 1e-6, 100), [0.01] * 20])
+        for method in ["bonferroni", "fdr_bh", "holm"]:
+            rejected, log_corrected = statistics.correct(np.log(p), 0.05, method)
+            expected_rejected, expected_corrected, _, _ = multitest.multipletests(p, alpha=0.05, method=method)
+            np.testing.assert_array_equal(rejected, expected_rejected)
+            np.testing.assert_allclose(np.exp(log_corrected), expected_corrected, rtol=1e-12)
+        rejected, log_corrected = statistics.correct(np.zeros(0), 0.05, "fdr_bh")
+        self.assertEqual(len(rejected), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,6 +19,36 @@ class TestUtilities(unittest.TestCase):
     def test_unsorted(self):
         self.assertFalse(utilities.isSortedBEDObject(BedTool("tests/data/test_uniform_unsorted.qbed")))
 
+    def test_sorted_in_memory(self):
+        df = BedTool("tests/data/test_uniform_unsorted.qbed").to_dataframe()
+        self.assertFalse(utilities.isSortedBEDObject(BedTool.from_dataframe(df)))
+        self.assertTrue(utilities.isSortedBEDObject(BedTool.from_dataframe(df.sort_values(["chrom", "start"]))))
+
+    def test_sorted_cache(self):
+        bed = BedTool("tests/data/test_uniform_sorted.qbed")
+        self.assertTrue(utilities.isSortedBEDObject(bed))
+        self.assertTrue(getattr(bed, utilities.SORTED_ATTRIBUTE))
+
+    def test_sorted_arrays(self):
+        self.assertTrue(utilities.isSortedArrays(["chr1", "chr1", "chr2"], [5, 10, 1]))
+        self.assertFalse(utilities.isSortedArrays(["chr1", "chr2", "chr1"], [5, 10, 20]))
+        self.assertFalse(utilities.isSortedArrays(["chr1", "chr1", "chr2"], [10, 5, 1]))
+
+    def test_chromosomes(self):
+        chroms = utilities.getChromosomesInDF(BedTool("tests/data/S288C_CBF1.qbed").to_dataframe())
+        self.assertEqual(len(chroms), 17)
+        self.assertEqual(chroms[:3], ["chrI", "chrII", "chrIII"])
+
+    def test_library_size(self):
+        # Test that library sizes of files and in-memory objects match those of their DataFrames
+        bed = BedTool("tests/data/S288C_CBF1.qbed")
+        df = bed.to_dataframe()
+        self.assertEqual(utilities.countEvents(bed), len(df))
+        self.assertEqual(utilities.countEvents(bed, weighted=True), df["name"].sum())
+        in_memory = BedTool(str(bed), from_string=True)
+        self.assertEqual(utilities.countEvents(in_memory, weighted=True), df["name"].sum())
+        self.assertEqual(utilities.file_len("tests/data/S288C_CBF1.qbed"), len(df))
+
 
 if __name__ == "__main__":
     unittest.main()
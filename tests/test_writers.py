@@ -0,0 +1,81 @@
+import blockify.normalization as normalization
+import blockify.segmentation as segmentation
+import blockify.writers as writers
+import gzip
+import io
+import os
+import pandas as pd
+from pybedtools import BedTool
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# Enable warnings
+if not sys.warnoptions:
+    import warnings
+    warnings.simplefilter("default") # Change the filter in this process
+    os.environ["PYTHONWARNINGS"] = "default" # Also affect subprocesses
+
+
+class TestWriters(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.df = pd.DataFrame(
+            {0: ["chrI", "chrI", "chrII"], 1: [0, 10, 5], 2: [10, 20, 15]}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_chromosome_frames(self):
+        frames = list(writers.iterChromosomeFrames(self.df))
+        self.assertEqual([len(_) for _ in frames], [2, 1])
+        self.assertEqual(list(writers.iterChromosomeFrames(pd.DataFrame())), [])
+
+    def test_outputs(self):
+        # Test that plain, gzip-compressed and already open outputs receive the same records
+        plain = os.path.join(self.directory, "out.bed")
+        compressed = os.path.join(self.directory, "out.bed.gz")
+        handle = io.StringIO()
+        for output in [plain, compressed, handle]:
+            with writers.BEDWriter(output) as writer:
+                for df in writers.iterChromosomeFrames(self.df):
+                    writer.write(df)
+        self.assertFalse(handle.closed)
+        with open(plain) as f:
+            text = f.read()
+        with gzip.open(compressed, "rt") as f:
+            self.assertEqual(f.read(), text)
+        self.assertEqual(handle.getvalue(), text)
+        self.assertEqual(text, "chrI\t0\t10\nchrI\t10\t20\nchrII\t5\t15\n")
+
+    def test_segmentation(self):
+        # Test that the blocks streamed per chromosome add up to the segmentation
+        frames = []
+        result = segmentation.segment("tests/data/S288C_CBF1.qbed", "PELT", p0=0.05, callback=frames.append)
+        self.assertEqual(len(frames), 17)
+        pd.testing.assert_frame_equal(
+            pd.concat(frames, ignore_index=True).astype({0: str}), result.df.astype({0: str})
+        )
+
+    def test_normalization(self):
+        frames = []
+        self.assertIsNone(
+            normalization.normalize(
+                BedTool("tests/data/S288C_CBF1.qbed"),
+                BedTool("tests/data/S288C_CBF1.blocks"),
+                10 ** 6,
+                None,
+                callback=frames.append,
+            )
+        )
+        self.assertEqual(len(frames), 17)
+        streamed = pd.concat(frames)
+        self.assertEqual(len(streamed), 1408)
+        self.assertEqual(streamed["normCount"].iloc[0], 861.7222956281956)
+
+
+if __name__ == "__main__":
+    unittest.main()